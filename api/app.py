@@ -1,14 +1,17 @@
 """A module that contains the API implementation."""
 
+import base64
 import datetime
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Iterator, Literal, Annotated
 
 from fastapi.responses import FileResponse
 import uvicorn
-from fastapi import Depends, FastAPI, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
@@ -21,22 +24,43 @@ from api.viz.timelines import create_timeline_figure
 
 import api.nge_shim.models as shim_models
 import api.nge_shim.utils as shim_utils
+from api.concept_index import (
+    ConceptIndex,
+    load_concept_index,
+    make_concept_index_key,
+)
 from api.models import (
     ConceptsQuery,
     Evidence,
     EvidenceQuery,
     UmlsConcept,
-    UmlsConceptParser,
+    concept_mentions,
 )
-from api.queries import aact, civic, ggponc, pubmed, versions
-from api.utils import get_previous_guideline_versions
+from api.queries import (
+    aact,
+    civic,
+    evidence_concept,
+    ggponc,
+    guideline_evidence,
+    pubmed,
+    versions,
+)
+from api.queries.utils import count_rows
+from api.result_cache import create_result_cache, make_key, make_versions_key
+from api.shared import create_concept_parser, prepare_shared_artifacts
 
 from integration.config import load_config, parse_config_list
 from integration.db import get_engine
+from integration.denormalization import make_source_versions_key
+from integration.orm.evidence_concept import EVIDENCE_CONCEPT_VERSION_SOURCE
+from integration.orm.guideline_evidence import (
+    MATERIALIZATION_VERSION_SOURCE,
+    MATERIALIZED_SOURCES,
+)
+from integration.orm.versions import Version
 from integration.umls.parser import MetaThesaurusParser
 from integration.umls.relationship_mapping import RelationshipMapper
 
-from cachetools import LRUCache, cached
 
 from api.utils import get_previous_guideline_versions
 
@@ -50,7 +74,25 @@ logger = logging.getLogger(__name__)
 # TODO make configurable
 debug = False
 
-cache = LRUCache(maxsize=1024)
+# number of IDs per query when loading evidence
+LOAD_CHUNK_SIZE = 5000
+
+# number of candidates per query when searching evidence that is not materialized
+SEARCH_PAGE_SIZE = 500
+
+# number of CUIs from which they are staged in a temporary table instead of listed
+STAGE_CUIS_MIN = 1000
+
+# /trialsearch filters that the query constructors evaluate in the DB
+DB_FILTERS = [
+    "sample_range_min",
+    "sample_range_max",
+    "year_range_min",
+    "year_range_max",
+    "significant_results",
+    "results_available",
+    "strict_rct_filter",
+]
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -66,35 +108,72 @@ async def lifespan(app: FastAPI):
         max_overflow=db_config.getint("max_overflow"),
     )
     app.state.session = sessionmaker(bind=app.state.engine)
+    umls_parser = MetaThesaurusParser(**app.state.config["MetaThesaurusParser"])
     with app.state.session() as s:
-        umls_parser = MetaThesaurusParser(**app.state.config["MetaThesaurusParser"])
-        app.state.concept_parser = UmlsConceptParser(
-            umls_parser=umls_parser,
-            cache_dir="cache/",
-            cui_to_cpg_map_population=ggponc.get_population_to_guideline_mapping(s),
-            cui_to_cpg_map_intervention=ggponc.get_intervention_to_guideline_mapping(s),
-            cui_to_cpg_map_intervention_recommended=ggponc.get_intervention_to_guideline_mapping(
-                s, recommended_only=True
-            ),
-        )
-        app.state.relationship_mapper = RelationshipMapper(
-            umls_parser=umls_parser, **app.state.config["RelationshipMapper"]
+        app.state.concept_parser = create_concept_parser(
+            app.state.config, s, umls_parser
         )
-    # load UMLS dataframe cached properties
-    app.state.concept_parser.umls_parser.df_mrconso
-    app.state.concept_parser.umls_parser.df_mrsty
+    app.state.relationship_mapper = RelationshipMapper(
+        umls_parser=umls_parser, **app.state.config["RelationshipMapper"]
+    )
+    # memory-map the compiled UMLS artifact and graphs (compiled on first start)
+    app.state.concept_parser.umls_parser.artifact
+    app.state.relationship_mapper.graph_broad2narrow
     # set default sources
     app.state.default_sources = ["pubmed", "clinicaltrials", "civic"]
     with open(app.state.config["GGPONC"]["topic_yaml_path"], "r") as fh:
         app.state.topic_config = yaml.safe_load(fh)
     # set source to query constructor / parser mapping
     app.state.source_query_parser_map = {
-        "pubmed": (pubmed.get_evidence_by_population, Evidence.from_pubmed_trial),
-        "clinicaltrials": (aact.get_evidence_by_population, Evidence.from_aact_trial),
-        "civic": (civic.get_evidence_by_population, Evidence.from_civic_evidence),
+        "pubmed": (
+            pubmed.get_evidence_ids_by_population,
+            pubmed.get_evidence_by_ids,
+            Evidence.from_pubmed_trial,
+        ),
+        "clinicaltrials": (
+            aact.get_evidence_ids_by_population,
+            aact.get_evidence_by_ids,
+            Evidence.from_aact_trial,
+        ),
+        "civic": (
+            civic.get_evidence_ids_by_population,
+            civic.get_evidence_by_ids,
+            Evidence.from_civic_evidence,
+        ),
+    }
+    # set source to filtered query constructor mapping for /trialsearch
+    app.state.source_search_query_map = {
+        "pubmed": pubmed.get_filtered_evidence_ids,
+        "clinicaltrials": aact.get_filtered_evidence_ids,
+        "civic": civic.get_filtered_evidence_ids,
     }
+    # set source to concept index query mapping
+    app.state.source_index_query_map = {
+        "pubmed": pubmed.get_evidence_ids_from_index,
+        "clinicaltrials": aact.get_evidence_ids_from_index,
+        "civic": civic.get_evidence_ids_from_index,
+    }
+    server_config = app.state.config["Server"]
+    app.state.concept_index = None
+    if server_config.getboolean("concept_index"):
+        with app.state.session() as s:
+            app.state.concept_index = load_concept_index(s, server_config["shared_dir"])
+    app.state.source_executor = ThreadPoolExecutor(
+        max_workers=server_config.getint("source_workers"),
+        thread_name_prefix="source",
+    )
+    cache_config = app.state.config["ResultCache"]
+    app.state.result_cache = create_result_cache(
+        cache_config["backend"],
+        max_bytes=cache_config.getint("max_bytes"),
+        ttl=cache_config.getfloat("ttl"),
+        path=cache_config.get("path"),
+        touch_interval=cache_config.getfloat("touch_interval"),
+    )
     yield
-    app.state.concept_parser.cache.close()
+    app.state.result_cache.close()
+    app.state.source_executor.shutdown()
+    app.state.concept_parser.close()
 
 
 def prepare_session() -> Iterator[Session]:
@@ -113,6 +192,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 app.add_middleware(GZipMiddleware, minimum_size=100000)
@@ -180,6 +260,18 @@ def get_evidence_by_population(
     query_api: EvidenceQuery, session: Session = Depends(prepare_session)
 ) -> list[Evidence]:
     """Return evidence filtered by population CUIs."""
+    return [e for _, _, e in get_evidence_with_ids(query_api, session)]
+
+
+def get_evidence_with_ids(
+    query_api: EvidenceQuery, session: Session
+) -> list[tuple[str, int, Evidence]]:
+    """Return the evidence filtered by population CUIs with its source and DB ID.
+
+    The sources and the guideline PMIDs are fetched concurrently by the source executor,
+    each with a session of its own. The executor is shared by all requests, which bounds
+    their number of concurrent source queries by [Server] source_workers.
+    """
     logger.info(f"HTTP POST Query received: {query_api.model_dump()}")
     query_api = set_query_defaults(query_api)
     population_cuis = parse_population_cuis_from_query(query_api, session)
@@ -187,56 +279,234 @@ def get_evidence_by_population(
     intervention_names = parse_intervention_names_from_query(query_api, session)
     sources = app.state.default_sources if not query_api.sources else query_api.sources
 
-    evidence = []
-    guideline_id = query_api.guideline_id
+    version_rows = _get_version_rows(session)
+    app.state.result_cache.validate(make_versions_key(version_rows))
+    executor = app.state.source_executor
+    trials_futures = [
+        executor.submit(
+            _run_in_session,
+            _get_source_trials,
+            source,
+            population_cuis,
+            intervention_cuis,
+            intervention_names,
+            version_rows,
+        )
+        for source in sources
+    ]
+    guideline_pmids_futures = {
+        source: executor.submit(
+            _run_in_session, _get_guideline_pmids, query_api.guideline_id
+        )
+        for source in sources
+        if _marks_guideline_pmids(source, query_api)
+    }
+    # merge in the order of the sources
+    trials_by_source = [
+        (
+            source,
+            trials_future.result(),
+            guideline_pmids_futures[source].result()
+            if source in guideline_pmids_futures
+            else set(),
+        )
+        for source, trials_future in zip(sources, trials_futures)
+    ]
+    return _build_evidence(trials_by_source, query_api, population_cuis)
 
-    for source in sources:
-        
-        trials = _get_evidence_by_population(source, population_cuis, intervention_cuis, intervention_names, session)
-        _, evidence_parser = app.state.source_query_parser_map[source]
-
-        guideline_pmids = {}
-        if (
-            source == "pubmed" and guideline_id
-        ):  # TODO: should work for all kinds of queries by population
-            guideline_pmids = _get_guideline_pmids(guideline_id, session)
-        
-        for t in trials:
-            e = evidence_parser(t, app.state.concept_parser, query_api)
-            if type(e.pm_id) == int and e.pm_id in guideline_pmids:
-                e.citing_guidelines.append(guideline_id)
-            if apply_filter(e, query_api):
-                evidence.append(e)
-        _fill_evidence_metadata(evidence, population_cuis)
+
+def _run_in_session(fn, *args):
+    """Return the result of fn called with the arguments and a session of its own.
+
+    This allows running fn in a worker thread.
+    """
+    with app.state.session() as session:
+        return fn(*args, session)
+
+
+def _get_source_trials(
+    source, population_cuis, intervention_cuis, intervention_names, version_rows, session
+) -> list:
+    """Return the ORM instances of the source matching the query, newest first."""
+    ids = _get_evidence_ids_by_population(
+        [source],
+        population_cuis,
+        intervention_cuis,
+        intervention_names,
+        version_rows,
+        session,
+    )[source]
+    _, load_query_constructor, _ = app.state.source_query_parser_map[source]
+    trials = _load_by_ids(load_query_constructor, ids, session)
+    logger.info(f"{source} - Retrieved {len(trials)} trials from DB")
+    return trials
+
+
+def _build_evidence(
+    trials_by_source, query_api, population_cuis
+) -> list[tuple[str, int, Evidence]]:
+    """Parse the ORM instances of all sources to evidence with its source and DB ID."""
+    # resolve the UMLS concepts of all sources in one batch
+    app.state.concept_parser.prefetch(
+        concept_mentions(t) for _, trials, _ in trials_by_source for t in trials
+    )
+    evidence = []
+    for source, trials, guideline_pmids in trials_by_source:
+        evidence.extend(
+            (source, t.id, e)
+            for t, e in _parse_evidence(
+                source, trials, query_api, population_cuis, guideline_pmids
+            )
+        )
         logger.info(f"{source} - Parsed trials to API Evidence Items")
 
     logger.info(f"Retrieved a total of {len(evidence)} evidence items")
     return evidence
 
-@cached(cache, key=lambda args, _: args[0])
+
+def _marks_guideline_pmids(source, query_api) -> bool:
+    """Return True if the evidence of the source is marked as cited by the queried guideline."""
+    # TODO: should work for all kinds of queries by population
+    return source == "pubmed" and bool(query_api.guideline_id)
+
+
+def _get_source_guideline_pmids(source, query_api, session) -> set[int]:
+    """Return the PMIDs cited by the queried guideline, if they are marked for the source."""
+    if _marks_guideline_pmids(source, query_api):
+        return _get_guideline_pmids(query_api.guideline_id, session)
+    return set()
+
+
+def _parse_evidence(source, trials, query_api, population_cuis, guideline_pmids):
+    """Parse ORM instances of the source to pairs of instance and Evidence that pass the filters.
+
+    Evidence with one of the guideline PMIDs is marked as cited by the queried guideline.
+    """
+    _, _, evidence_parser = app.state.source_query_parser_map[source]
+    guideline_id = query_api.guideline_id
+
+    parsed = []
+    for t in trials:
+        e = evidence_parser(t, app.state.concept_parser, query_api)
+        if type(e.pm_id) == int and e.pm_id in guideline_pmids:
+            e.citing_guidelines.append(guideline_id)
+        if apply_filter(e, query_api):
+            parsed.append((t, e))
+    _fill_evidence_metadata([e for _, e in parsed], population_cuis)
+    return parsed
+
 def _get_guideline_pmids(guideline_id, session):
-    query_cited_ids = ggponc.get_cited_pmids(guideline_id)
-    guideline_pmids = set(session.scalars(query_cited_ids).unique().all())
-    return guideline_pmids
+    key = make_key("guideline_pmids", guideline_id)
+    guideline_pmids = app.state.result_cache.get(key)
+    if guideline_pmids is None:
+        query_cited_ids = ggponc.get_cited_pmids(guideline_id)
+        guideline_pmids = list(session.scalars(query_cited_ids).unique().all())
+        app.state.result_cache.set(key, guideline_pmids)
+    return set(guideline_pmids)
+
+def _get_evidence_ids_by_population(
+    sources, population_cuis, intervention_cuis, intervention_names, version_rows, session
+) -> dict[str, list[int]]:
+    """Return the IDs of the matching evidence of each source, newest first.
+
+    The IDs are taken from the result cache, else from the concept index, else from the DB.
+    """
+    concept_index = _current_concept_index(version_rows)
+    match_args = None
+    ids_by_source = {}
+    for source in sources:
+        key = make_key(
+            "evidence",
+            source,
+            sorted(population_cuis),
+            sorted(intervention_cuis or []),
+            sorted(intervention_names or []),
+        )
+        ids = app.state.result_cache.get(key)
+        if ids is None and concept_index is not None:
+            ids = app.state.source_index_query_map[source](
+                concept_index, population_cuis, intervention_cuis, intervention_names
+            )
+            if ids is not None:
+                logger.info(f"{source} - Retrieved evidence from concept index")
+                app.state.result_cache.set(key, ids)
+        if ids is None:
+            logger.info(f"{source} - Retrieving evidence")
+            if match_args is None:
+                match_args = _match_args(
+                    population_cuis,
+                    intervention_cuis,
+                    intervention_names,
+                    version_rows,
+                    session,
+                )
+            id_query_constructor, _, _ = app.state.source_query_parser_map[source]
+            query_db = id_query_constructor(**match_args)
+            ids = list(dict.fromkeys(session.scalars(query_db).all()))
+            app.state.result_cache.set(key, ids)
+        ids_by_source[source] = ids
+    return ids_by_source
+
+def _get_version_rows(session: Session) -> list[Version]:
+    """Return the version rows of all sources, which each request reads only once."""
+    return list(session.scalars(versions.get_versions()))
+
+
+def _current_concept_index(version_rows: list[Version]) -> ConceptIndex | None:
+    """Return the concept index if it was built from the current evidence concepts."""
+    concept_index = app.state.concept_index
+    if (
+        concept_index is None
+        or make_concept_index_key(version_rows) != concept_index.key
+    ):
+        return None
+    return concept_index
 
-def _evidence_cache_key(*args, **kwargs):
-    # Convert each list argument to a tuple and hash the rest directly
-    source, population_cuis, intervention_cuis, intervention_names, session = args
-    return (source, tuple(population_cuis), tuple(intervention_cuis), tuple(intervention_names))
+def _evidence_concepts_current(version_rows: list[Version]) -> bool:
+    """Return True if the denormalized evidence concepts were built from the current sources."""
+    version = next(
+        (v for v in version_rows if v.source == EVIDENCE_CONCEPT_VERSION_SOURCE), None
+    )
+    return version is not None and version.version == make_source_versions_key(
+        version_rows
+    )
 
-@cached(cache, key=_evidence_cache_key)
-def _get_evidence_by_population(source, population_cuis, intervention_cuis, intervention_names, session):
-    query_constructor, _ = app.state.source_query_parser_map[source]
 
-    logger.info(f"{source} - Retrieving evidence")
-    query_db = query_constructor(
+def _match_args(
+    population_cuis, intervention_cuis, intervention_names, version_rows, session
+) -> dict:
+    """Return the arguments of the query constructors for matching evidence.
+
+    If the denormalized evidence concepts are current, evidence is matched through them,
+    and large sets of CUIs are staged in a temporary table.
+    """
+    match_args = dict(
         population_cuis=population_cuis,
         intervention_cuis=intervention_cuis,
         intervention_names=intervention_names,
     )
-    trials = session.scalars(query_db).unique().all()
-    logger.info(f"{source} - Retrieved {len(trials)} trials from DB")
-    return trials
+    if not _evidence_concepts_current(version_rows):
+        return match_args
+    for key, role in [
+        ("population_cuis", "population"),
+        ("intervention_cuis", "intervention"),
+    ]:
+        if match_args[key] and len(match_args[key]) >= STAGE_CUIS_MIN:
+            match_args[key] = evidence_concept.stage_cuis(session, role, match_args[key])
+    match_args["use_evidence_concepts"] = True
+    return match_args
+
+
+def _load_by_ids(load_query_constructor, ids, session, lean=False):
+    """Load the ORM instances with the IDs in chunks, keeping the order of the IDs.
+
+    In lean mode, only what list responses show is loaded.
+    """
+    loaded = {}
+    for i in range(0, len(ids), LOAD_CHUNK_SIZE):
+        query_db = load_query_constructor(ids[i : i + LOAD_CHUNK_SIZE], lean=lean)
+        loaded.update((t.id, t) for t in session.scalars(query_db).unique().all())
+    return [loaded[i] for i in ids if i in loaded]
 
 def _fill_evidence_metadata(evidence: list[Evidence], population_cuis: list[str]):
     population_cuis_set = set(population_cuis)
@@ -259,12 +529,9 @@ def apply_filter(evidence: Evidence, query_api: EvidenceQuery) -> bool:
 @app.get("/guidelines", response_model=list[str])
 def get_supported_guidelines() -> list[str]:
     """Return a list of supported guidelines."""
-    return list(
-        set().union(*app.state.concept_parser.cui_to_cpg_map_population.values())
-    )
+    return list(app.state.concept_parser.cui_to_cpg_map_population.all_labels())
 
 
-@cached(cache, key=lambda _:'Interventions')
 @app.get("/interventions", response_model=list[shim_models.InterventionItem])
 def get_interventions(session: Session = Depends(prepare_session)):
     """Return a list of all interventions."""
@@ -280,7 +547,9 @@ def get_interventions(session: Session = Depends(prepare_session)):
             shim_models.InterventionItem(
                 cui=c,
                 umls_term=term,
-                guideline_ids=app.state.concept_parser.cui_to_cpg_map_intervention[c],
+                guideline_ids=app.state.concept_parser.cui_to_cpg_map_intervention.get(
+                    c, set()
+                ),
             )
         )
     return sorted(
@@ -355,7 +624,7 @@ def get_timeline(
 def get_evidence_grouped_df(
     query_api: EvidenceQuery, include_unfinished_trials, session: Session
 ) -> list[Evidence]:
-    evidence = get_evidence_by_population(query_api, session)
+    evidence = [e for _, _, e in get_evidence_with_ids(query_api, session)]
     # Find additional references by tracing NCT references
     nct_ids = {e.nct_id for e in evidence if e.nct_id}
     references = {nct_id for e in evidence for nct_id in e.referenced_nct_ids}
@@ -363,6 +632,7 @@ def get_evidence_grouped_df(
     query_ids = aact.get_trials_by_ids(new_refs)
     trials = session.scalars(query_ids).unique().all()
     logger.info(f"Retrieved additional {len(trials)} trials through references from DB")
+    app.state.concept_parser.prefetch(concept_mentions(t) for t in trials)
     evidence.extend(
         [
             Evidence.from_aact_trial(t, app.state.concept_parser, query_api)
@@ -449,6 +719,7 @@ def get_meta(session: Session = Depends(prepare_session)):
 
 @app.get("/trialsearch")
 def get_trials(
+    response: Response,
     topic: str | None = None,
     sample_range_min: int | None = None,
     sample_range_max: int | None = None,
@@ -469,15 +740,18 @@ def get_trials(
         "pubmed",
     ],
     strict_rct_filter: bool | None = True,
+    cursor: str | None = None,
     session: Session = Depends(prepare_session),
 ):
-    """Return a list of trials in the NGE Browser format."""
+    """Return a page of at most max_results trials in the NGE Browser format.
+
+    The X-Next-Cursor header holds the cursor of the next page, if any, the X-Total-Count
+    header the number of all matching trials, if it can be counted in the DB.
+    """
     evidence_query = EvidenceQuery(
         guideline_id=topic, sources=sources, limit=max_results
     )
-    evidence_retrieved = get_evidence_by_population(evidence_query, session=session)
-    evidence_filtered = shim_utils.apply_trialsearch_filters(
-        evidence=evidence_retrieved,
+    filters = dict(
         max_results=max_results,
         sample_range_min=sample_range_min,
         sample_range_max=sample_range_max,
@@ -494,11 +768,227 @@ def get_trials(
         has_not_recommended_intervention=has_not_recommended_intervention,
         strict_rct_filter=strict_rct_filter,
     )
+    sources = sources or app.state.default_sources
+    after = _decode_cursor(cursor, sources) if cursor else None
+    version_rows = _get_version_rows(session)
+    app.state.result_cache.validate(make_versions_key(version_rows))
+    if (
+        topic
+        and set(sources) <= set(MATERIALIZED_SOURCES)
+        and _is_materialized(topic, version_rows, session)
+    ):
+        evidence_filtered, total, next_after = _get_materialized_evidence(
+            evidence_query, filters, after, session
+        )
+    else:
+        evidence_filtered, total, next_after = _search_evidence(
+            evidence_query, filters, after, version_rows, session
+        )
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    if next_after is not None:
+        response.headers["X-Next-Cursor"] = _encode_cursor(next_after)
     return [
         shim_utils.parse_evidence_to_trial(e, topic_id=topic) for e in evidence_filtered
     ]
 
 
+def _encode_cursor(after: tuple[str, datetime.date | None, int]) -> str:
+    """Encode the (source, date, ID) keyset of the last item of a page as cursor."""
+    source, date, id_ = after
+    payload = [source, date.isoformat() if date is not None else None, id_]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_cursor(
+    cursor: str, sources: list[str]
+) -> tuple[str, datetime.date | None, int]:
+    """Decode a cursor to the (source, date, ID) keyset of the last item of the previous page."""
+    try:
+        source, date, id_ = json.loads(base64.urlsafe_b64decode(cursor))
+        if source not in sources:
+            raise ValueError(f"Source {source} is not searched")
+        date = datetime.datetime.fromisoformat(date) if date is not None else None
+        return source, date, int(id_)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def get_materialization_versions_key(version_rows: list[Version]) -> str:
+    """Return the key of the versions of all sources the materialization is built from."""
+    return make_versions_key(
+        version_rows,
+        exclude=[MATERIALIZATION_VERSION_SOURCE, EVIDENCE_CONCEPT_VERSION_SOURCE],
+    )
+
+
+def _is_materialized(
+    guideline_id: str, version_rows: list[Version], session: Session
+) -> bool:
+    """Return True if the evidence of the guideline is materialized for the current DB."""
+    version = next(
+        (v for v in version_rows if v.source == MATERIALIZATION_VERSION_SOURCE), None
+    )
+    if version is None:
+        return False
+    if version.version != get_materialization_versions_key(version_rows):
+        return False
+    return guideline_id in set(
+        session.scalars(guideline_evidence.get_materialized_guidelines()).all()
+    )
+
+
+def _get_materialized_evidence(
+    query_api: EvidenceQuery, filters: dict, after, session: Session
+) -> tuple[list[Evidence], int, tuple | None]:
+    """Return a page of the materialized evidence of the guideline that passes the filters.
+
+    All filters are evaluated in the DB, so the total number of matches is returned along
+    with the keyset of the last item of the page if more follow.
+    """
+    query_api = set_query_defaults(query_api)
+    sources = app.state.default_sources if not query_api.sources else query_api.sources
+    max_results = filters["max_results"]
+    query_filters = {**filters, "max_results": None}
+    query_db = guideline_evidence.get_filtered_evidence(
+        query_api.guideline_id, sources, **query_filters, after=after
+    )
+    if max_results is not None:
+        query_db = query_db.limit(max_results + 1)
+    rows = session.execute(query_db).all()
+    total = session.scalar(
+        count_rows(
+            guideline_evidence.get_filtered_evidence(
+                query_api.guideline_id, sources, **query_filters
+            )
+        )
+    )
+    next_after = None
+    if max_results is not None and len(rows) > max_results:
+        rows = rows[:max_results]
+        if rows:
+            next_after = (rows[-1].source, rows[-1].date, rows[-1].evidence_id)
+    logger.info(f"Retrieved {len(rows)} of {total} materialized evidence items")
+    population_cuis = parse_population_cuis_from_query(query_api, session)
+    trials_by_source = []
+    for source in sources:
+        _, load_query_constructor, _ = app.state.source_query_parser_map[source]
+        ids = [r.evidence_id for r in rows if r.source == source]
+        trials_by_source.append(
+            (source, _load_by_ids(load_query_constructor, ids, session, lean=True))
+        )
+    app.state.concept_parser.prefetch(
+        concept_mentions(t) for _, trials in trials_by_source for t in trials
+    )
+    evidence = [
+        e
+        for source, trials in trials_by_source
+        for _, e in _parse_evidence(
+            source,
+            trials,
+            query_api,
+            population_cuis,
+            _get_source_guideline_pmids(source, query_api, session),
+        )
+    ]
+    return evidence, total, next_after
+
+
+def _filtered_in_db(query_api: EvidenceQuery, filters: dict, sources: list[str]) -> bool:
+    """Return True if the query constructors evaluate all filters.
+
+    Only then can the matches be counted in the DB.
+    """
+    return not (
+        filters["phase"] is not None
+        or filters["exclude_children"]
+        or filters["has_unknown_intervention"]
+        or filters["has_known_intervention"]
+        or filters["has_recommended_intervention"]
+        or filters["has_not_recommended_intervention"]
+        or (
+            "pubmed" in sources
+            and (query_api.filter_reviews or query_api.filter_protocols)
+        )
+    )
+
+
+def _search_evidence(
+    query_api: EvidenceQuery,
+    filters: dict,
+    after,
+    version_rows: list[Version],
+    session: Session,
+) -> tuple[list[Evidence], int | None, tuple | None]:
+    """Return a page of the evidence that passes the filters, searching the sources in the DB.
+
+    Candidates are fetched newest first in pages of SEARCH_PAGE_SIZE with the filters the
+    DB can evaluate, the remaining filters are applied to the parsed evidence. The total
+    number of matches is only returned if it can be counted in the DB.
+    """
+    query_api = set_query_defaults(query_api)
+    population_cuis = parse_population_cuis_from_query(query_api, session)
+    intervention_cuis = parse_intervention_cuis_from_query(query_api, session)
+    intervention_names = parse_intervention_names_from_query(query_api, session)
+    sources = app.state.default_sources if not query_api.sources else query_api.sources
+    max_results = filters["max_results"]
+    db_filters = {k: filters[k] for k in DB_FILTERS}
+    parsed_filters = {**filters, "max_results": None}
+    match_args = _match_args(
+        population_cuis, intervention_cuis, intervention_names, version_rows, session
+    )
+
+    total = None
+    if _filtered_in_db(query_api, filters, sources):
+        total = sum(
+            session.scalar(
+                count_rows(
+                    app.state.source_search_query_map[source](
+                        **match_args, **db_filters
+                    )
+                )
+            )
+            for source in sources
+        )
+
+    evidence: list[Evidence] = []
+    last = None
+    first_source = sources.index(after[0]) if after is not None else 0
+    for source in sources[first_source:]:
+        search_query_constructor = app.state.source_search_query_map[source]
+        _, load_query_constructor, _ = app.state.source_query_parser_map[source]
+        guideline_pmids = _get_source_guideline_pmids(source, query_api, session)
+        source_after = after[1:] if after is not None and after[0] == source else None
+        while True:
+            query_db = search_query_constructor(
+                **match_args,
+                **db_filters,
+                after=source_after,
+            ).limit(SEARCH_PAGE_SIZE)
+            rows = session.execute(query_db).all()
+            dates = {r.id: r.date for r in rows}
+            trials = _load_by_ids(
+                load_query_constructor, list(dates), session, lean=True
+            )
+            app.state.concept_parser.prefetch(concept_mentions(t) for t in trials)
+            for t, e in _parse_evidence(
+                source, trials, query_api, population_cuis, guideline_pmids
+            ):
+                if not shim_utils.apply_trialsearch_filters([e], **parsed_filters):
+                    continue
+                if max_results is not None and len(evidence) >= max_results:
+                    logger.info(f"Retrieved a page of {len(evidence)} evidence items")
+                    return evidence, total, last
+                evidence.append(e)
+                last = (source, dates[t.id], t.id)
+            if len(rows) < SEARCH_PAGE_SIZE:
+                break
+            source_after = (rows[-1].date, rows[-1].id)
+        logger.info(f"{source} - Searched trials")
+    logger.info(f"Retrieved the last page of {len(evidence)} evidence items")
+    return evidence, total, None
+
+
 @app.get("/details")
 def get_details(
     topic: str | None = None,
@@ -551,8 +1041,23 @@ def get_details(
 
 
 def main() -> None:
-    """Run the API."""
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    """Run the API.
+
+    The shared lookup structures are built once up front, so that the worker processes
+    only memory-map them.
+    """
+    config = load_config()
+    server_config = config["Server"]
+    workers = server_config.getint("workers")
+    host, port = server_config["host"], server_config.getint("port")
+    engine = get_engine(config["DB"]["url"])
+    with sessionmaker(bind=engine)() as session:
+        prepare_shared_artifacts(config, session)
+    engine.dispose()
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+    else:
+        uvicorn.run("api.app:app", host=host, port=port, workers=workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+"""A module containing an in-process inverted index from CUIs to the evidence mentioning them."""
+
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from api.queries import aact, civic, pubmed
+from api.result_cache import make_versions_key
+from integration.denormalization import make_source_versions_key
+from integration.orm.evidence_concept import (
+    EVIDENCE_CONCEPT_VERSION_SOURCE,
+    EvidenceConcept,
+)
+from integration.orm.versions import Version
+
+logger = logging.getLogger(__name__)
+
+POSTING_LIST_ARRAYS = ("cuis", "offsets", "ids")
+EVIDENCE_ORDER_ARRAYS = ("sorted_ids", "ranks")
+
+# the roles of the denormalized evidence concepts indexed per source
+INDEXED_ROLES = {
+    "pubmed": ["population", "intervention", "mesh"],
+    "clinicaltrials": ["population", "intervention"],
+    "civic": ["population"],
+}
+
+
+def _evidence_ids_newest_first(source: str):
+    """Return a Select statement of the IDs of all evidence of the source, newest first."""
+    return {
+        "pubmed": pubmed.get_evidence_ids,
+        "clinicaltrials": aact.get_evidence_ids,
+        "civic": civic.get_evidence_ids,
+    }[source]()
+
+
+def _fetch_array(session: Session, query, n_columns: int, batch_size: int) -> np.ndarray:
+    """Return the integer rows of the query as array of shape (n_rows, n_columns)."""
+    chunks = [
+        np.array(rows, dtype=np.int64).reshape(-1, n_columns)
+        for rows in session.execute(query).partitions(batch_size)
+    ]
+    return np.concatenate(chunks) if chunks else np.empty((0, n_columns), np.int64)
+
+
+class PostingLists:
+    """Sorted int32 arrays of evidence IDs per CUI, stored as flat arrays.
+
+    The evidence of cuis[i] is ids[offsets[i]:offsets[i + 1]]. Loaded lists are
+    memory-mapped, so all worker processes share a single copy through the page cache.
+    """
+
+    def __init__(self, cuis: np.ndarray, offsets: np.ndarray, ids: np.ndarray) -> None:
+        """Create posting lists from their arrays."""
+        self.cuis = cuis
+        self.offsets = offsets
+        self.ids = ids
+
+    @classmethod
+    def from_pairs(cls, pairs: np.ndarray) -> "PostingLists":
+        """Compile posting lists from an array of (CUI, evidence ID) rows."""
+        pairs = np.unique(pairs, axis=0) if len(pairs) else pairs
+        cuis, starts = np.unique(pairs[:, 0], return_index=True)
+        offsets = np.append(starts, len(pairs)).astype(np.int64)
+        return cls(cuis.astype(np.int32), offsets, pairs[:, 1].astype(np.int32))
+
+    def save(self, path: Path) -> None:
+        """Save the posting lists to the directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name in POSTING_LIST_ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, path: Path) -> "PostingLists":
+        """Memory-map posting lists saved to the directory."""
+        return cls(
+            *[np.load(path / f"{name}.npy", mmap_mode="r") for name in POSTING_LIST_ARRAYS]
+        )
+
+    def union(self, cui_ints: list[int]) -> np.ndarray:
+        """Return the sorted IDs of the evidence mentioning any of the CUIs."""
+        keys = np.unique(np.asarray(cui_ints, dtype=np.int32))
+        positions = np.searchsorted(self.cuis, keys)
+        found = positions < len(self.cuis)
+        found[found] = self.cuis[positions[found]] == keys[found]
+        lists = [
+            self.ids[self.offsets[i] : self.offsets[i + 1]] for i in positions[found]
+        ]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(lists))
+
+
+class EvidenceOrder:
+    """The rank of every piece of evidence of a source in the newest first order.
+
+    The rank of sorted_ids[i] is ranks[i].
+    """
+
+    def __init__(self, sorted_ids: np.ndarray, ranks: np.ndarray) -> None:
+        """Create the order from its arrays."""
+        self.sorted_ids = sorted_ids
+        self.ranks = ranks
+
+    @classmethod
+    def from_ids(cls, ids: np.ndarray) -> "EvidenceOrder":
+        """Compile the order from the IDs of all evidence, newest first."""
+        permutation = np.argsort(ids, kind="stable")
+        return cls(ids[permutation].astype(np.int32), permutation.astype(np.int32))
+
+    def save(self, path: Path) -> None:
+        """Save the order to the directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name in EVIDENCE_ORDER_ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, path: Path) -> "EvidenceOrder":
+        """Memory-map an order saved to the directory."""
+        return cls(
+            *[np.load(path / f"{name}.npy", mmap_mode="r") for name in EVIDENCE_ORDER_ARRAYS]
+        )
+
+    def sort(self, ids: np.ndarray) -> list[int]:
+        """Return the IDs of existing evidence, newest first."""
+        positions = np.searchsorted(self.sorted_ids, ids)
+        found = positions < len(self.sorted_ids)
+        found[found] = self.sorted_ids[positions[found]] == ids[found]
+        positions = positions[found]
+        return ids[found][np.argsort(self.ranks[positions], kind="stable")].tolist()
+
+
+class ConceptIndex:
+    """Posting lists per source and role of the denormalized evidence concepts.
+
+    Queries by population and intervention are answered without accessing the DB. The
+    index is built for one version of the evidence concepts, given by key.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        posting_lists: dict[tuple[str, str], PostingLists],
+        orders: dict[str, EvidenceOrder],
+    ) -> None:
+        """Create an index from its posting lists and evidence orders."""
+        self.key = key
+        self.posting_lists = posting_lists
+        self.orders = orders
+
+    @classmethod
+    def build(cls, session: Session, key: str, batch_size: int = 100000) -> "ConceptIndex":
+        """Build the index from the denormalized evidence concepts in the DB."""
+        posting_lists = {}
+        for source, roles in INDEXED_ROLES.items():
+            for role in roles:
+                query = select(EvidenceConcept.cui_int, EvidenceConcept.trial_id).where(
+                    EvidenceConcept.source == source, EvidenceConcept.role == role
+                )
+                posting_lists[(source, role)] = PostingLists.from_pairs(
+                    _fetch_array(session, query, 2, batch_size)
+                )
+        orders = {
+            source: EvidenceOrder.from_ids(
+                _fetch_array(session, _evidence_ids_newest_first(source), 1, batch_size)[:, 0]
+            )
+            for source in INDEXED_ROLES
+        }
+        return cls(key, posting_lists, orders)
+
+    def save(self, path: Path) -> None:
+        """Save the index to the directory."""
+        for (source, role), lists in self.posting_lists.items():
+            lists.save(path / source / role)
+        for source, order in self.orders.items():
+            order.save(path / source / "order")
+
+    @classmethod
+    def load(cls, path: Path, key: str) -> "ConceptIndex":
+        """Memory-map an index saved to the directory."""
+        posting_lists = {
+            (source, role): PostingLists.load(path / source / role)
+            for source, roles in INDEXED_ROLES.items()
+            for role in roles
+        }
+        orders = {
+            source: EvidenceOrder.load(path / source / "order") for source in INDEXED_ROLES
+        }
+        return cls(key, posting_lists, orders)
+
+    def union(self, source: str, roles: list[str], cui_ints: list[int]) -> np.ndarray:
+        """Return the sorted IDs of the evidence mentioning one of the CUIs in one of the roles."""
+        lists = [self.posting_lists[(source, role)].union(cui_ints) for role in roles]
+        return np.unique(np.concatenate(lists))
+
+    def match(
+        self,
+        source: str,
+        population_roles: list[str],
+        population_cuis: list[int],
+        intervention_roles: list[str] | None = None,
+        intervention_cuis: list[int] | None = None,
+    ) -> list[int]:
+        """Return the IDs of the evidence matching the population and interventions, newest first.
+
+        The interventions are only matched if given.
+        """
+        ids = self.union(source, population_roles, population_cuis)
+        if intervention_roles and intervention_cuis:
+            ids = np.intersect1d(
+                ids,
+                self.union(source, intervention_roles, intervention_cuis),
+                assume_unique=True,
+            )
+        return self.orders[source].sort(ids)
+
+
+def get_concept_index_key(session: Session) -> str | None:
+    """Return the key of the evidence concepts, if they were built from the current sources."""
+    return make_concept_index_key(list(session.scalars(select(Version))))
+
+
+def make_concept_index_key(version_rows: list[Version]) -> str | None:
+    """Return the concept index key of already read version rows, see get_concept_index_key."""
+    version = next(
+        (v for v in version_rows if v.source == EVIDENCE_CONCEPT_VERSION_SOURCE), None
+    )
+    if version is None or version.version != make_source_versions_key(version_rows):
+        return None
+    return make_versions_key(version_rows, [EVIDENCE_CONCEPT_VERSION_SOURCE])
+
+
+def load_concept_index(session: Session, cache_dir: str | Path) -> ConceptIndex | None:
+    """Return the memory-mapped concept index, building it from the DB if needed.
+
+    The index is stored per version of the evidence concepts, so the first start after they
+    are denormalized again rebuilds it. If they are missing or outdated, there is no index. The
+    directory is renamed into place atomically, so concurrent workers never read a
+    partially written index.
+    """
+    key = get_concept_index_key(session)
+    if key is None:
+        logger.info("Evidence concepts are not current, not using a concept index")
+        return None
+    path = Path(cache_dir) / f"concept_index_{key}"
+    if not path.exists():
+        logger.info(f"Building concept index at {path}")
+        tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        ConceptIndex.build(session, key).save(tmp_path)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another worker finished first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    return ConceptIndex.load(path, key)
@@ -0,0 +1,186 @@
+"""A module containing a size-bounded on-disk store of parsed UMLS concepts for all workers."""
+
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from sqlalchemy.orm import Session
+
+from api.queries import aact, civic, pubmed
+
+if TYPE_CHECKING:
+    from api.models import UmlsConceptParser
+
+logger = logging.getLogger(__name__)
+
+# stay below SQLite's limit of host parameters per statement
+SQLITE_MAX_PARAMS = 500
+
+
+class ConceptStore:
+    """A key-value store of serialized concepts in a SQLite database in WAL mode.
+
+    Every key is a row, so writes only touch the concepts that changed, and any number of
+    worker processes can read while one of them writes. The store holds at most maxsize
+    concepts and evicts the least recently used ones. Access times are only refreshed if
+    they are older than touch_interval seconds, so most reads do not write. It is cleared
+    whenever it is opened with a different namespace, e.g. after a UMLS or GGPONC update.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        namespace: str,
+        maxsize: int = 200000,
+        timeout: float = 30.0,
+        touch_interval: float = 60.0,
+    ) -> None:
+        """Open the store, clearing it if it was written for another namespace."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._create_schema()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self) -> None:
+        """Create the tables and clear them if the namespace changed."""
+        connection = self._connection
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS concept "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_concept_last_access ON concept (last_access)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE name = 'namespace'"
+            ).fetchone()
+            if row is None or row[0] != self.namespace:
+                logger.info(f"Clearing concept store {self.path} for {self.namespace}")
+                connection.execute("DELETE FROM concept")
+                connection.execute(
+                    "REPLACE INTO meta (name, value) VALUES ('namespace', ?)",
+                    (self.namespace,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, str]:
+        """Return the stored values of all keys that are present and mark them as used."""
+        keys = list(keys)
+        result: dict[str, str] = {}
+        stale_keys = []
+        stale_before = time.time() - self.touch_interval
+        for i in range(0, len(keys), SQLITE_MAX_PARAMS):
+            chunk = keys[i : i + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            for key, value, last_access in self._connection.execute(
+                "SELECT key, value, last_access FROM concept "
+                f"WHERE key IN ({placeholders})",
+                chunk,
+            ):
+                result[key] = value
+                if last_access < stale_before:
+                    stale_keys.append(key)
+        if stale_keys:
+            self._touch(stale_keys)
+        return result
+
+    def get(self, key: str) -> str | None:
+        """Return the stored value of the key, if present."""
+        return self.get_many([key]).get(key)
+
+    def _touch(self, keys: list[str]) -> None:
+        """Update the last access time of the keys."""
+        now = time.time()
+        for i in range(0, len(keys), SQLITE_MAX_PARAMS):
+            chunk = keys[i : i + SQLITE_MAX_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            self._connection.execute(
+                f"UPDATE concept SET last_access = ? WHERE key IN ({placeholders})",
+                [now, *chunk],
+            )
+
+    def put_many(self, items: dict[str, str]) -> None:
+        """Store all values within one transaction, evicting the least recently used if full."""
+        if not items:
+            return
+        now = time.time()
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "REPLACE INTO concept (key, value, last_access) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+            (size,) = connection.execute("SELECT count(*) FROM concept").fetchone()
+            if size > self.maxsize:
+                connection.execute(
+                    "DELETE FROM concept WHERE key IN "
+                    "(SELECT key FROM concept ORDER BY last_access LIMIT ?)",
+                    (size - self.maxsize,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        """Return the number of stored concepts."""
+        return self._connection.execute("SELECT count(*) FROM concept").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def warm_up(
+    concept_parser: "UmlsConceptParser", session: Session, batch_size: int = 10000
+) -> int:
+    """Parse and store the concepts of all distinct CUIs in the DB, return their number."""
+    n_mentions = 0
+    for query in [
+        civic.get_concept_mentions(),
+        pubmed.get_concept_mentions(),
+        aact.get_concept_mentions(),
+    ]:
+        for rows in session.execute(query).partitions(batch_size):
+            mentions: dict[str, list[tuple[str, str | None]]] = {
+                "population": [],
+                "intervention": [],
+            }
+            for row in rows:
+                mentions[row.kind].append((row.cui, row.text))
+            concept_parser.prefetch([mentions])
+            n_mentions += len(rows)
+    logger.info(f"Warmed up the concept store with {n_mentions} concept mentions")
+    return n_mentions
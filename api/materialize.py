@@ -0,0 +1,121 @@
+"""A module for materializing the evidence of every guideline for /trialsearch to filter."""
+
+import asyncio
+import datetime
+import logging
+from collections import defaultdict
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from api.app import (
+    app,
+    get_evidence_with_ids,
+    get_materialization_versions_key,
+    get_supported_guidelines,
+    lifespan,
+)
+from api.models import Evidence, EvidenceQuery
+from api.queries import versions
+from integration.orm.guideline_evidence import (
+    MATERIALIZATION_VERSION_SOURCE,
+    MATERIALIZED_SOURCES,
+    GuidelineEvidence,
+    create_metadata,
+)
+from integration.orm.versions import Version
+
+logger = logging.getLogger(__name__)
+
+def _phase_mask(phases: list[int]) -> int:
+    """Return the potential phases as a bitmask with bit n set for phase n."""
+    return sum(1 << p for p in set(phases) if p is not None and 0 <= p < 31)
+
+
+def _year(date: datetime.date | None) -> int | None:
+    """Return the year of the date, if any."""
+    return date.year if date is not None else None
+
+
+def evidence_to_row(
+    guideline_id: str, source: str, position: int, evidence_id: int, e: Evidence
+) -> dict:
+    """Return the filterable attributes of the evidence as a row of nge_guideline_evidence."""
+    return {
+        "guideline_id": guideline_id,
+        "source": source,
+        "position": position,
+        "evidence_id": evidence_id,
+        "sort_date": e.publication_date,
+        "sample_size": e.sample_size,
+        "publication_year": _year(e.publication_date),
+        "start_year": _year(e.date_start),
+        "phases": _phase_mask(e.phases_all),
+        "is_rct": e.is_rct,
+        "results_available": e.results_available,
+        "has_significant_finding": e.has_significant_finding,
+        "has_pediatric_population": e.has_pediatric_population,
+        "has_unknown_intervention": e.has_unknown_intervention,
+        "has_known_intervention": e.has_known_intervention,
+        "has_not_recommended_intervention": e.has_not_recommended_intervention,
+        "has_recommended_intervention": e.has_recommended_intervention,
+    }
+
+
+def materialize_guideline_evidence(session: Session, guideline_ids: list[str]) -> int:
+    """Replace the materialized evidence with that of the guidelines and return its size.
+
+    The materialization is tagged with the versions of all sources, so it is ignored as soon
+    as one of them is reloaded. Its version row is removed before the table is replaced, so
+    it is also ignored while being rebuilt.
+    """
+    versions_key = get_materialization_versions_key(
+        list(session.scalars(versions.get_versions()))
+    )
+    rows = []
+    for guideline_id in guideline_ids:
+        query_api = EvidenceQuery(guideline_id=guideline_id, sources=MATERIALIZED_SOURCES)
+        positions: dict[str, int] = defaultdict(int)
+        for source, evidence_id, e in get_evidence_with_ids(query_api, session):
+            rows.append(
+                evidence_to_row(guideline_id, source, positions[source], evidence_id, e)
+            )
+            positions[source] += 1
+        logger.info(f"Materialized {sum(positions.values())} evidence items for {guideline_id}")
+    # invalidate the materialization first, so that requests fall back to searching the
+    # evidence while the table is recreated to pick up schema changes and refilled
+    session.execute(
+        delete(Version).where(Version.source == MATERIALIZATION_VERSION_SOURCE)
+    )
+    session.commit()
+    create_metadata(session.get_bind(), drop_existing=True)
+    if rows:
+        session.execute(insert(GuidelineEvidence), rows)
+    session.merge(
+        Version(
+            source=MATERIALIZATION_VERSION_SOURCE,
+            version=versions_key,
+            import_date=datetime.datetime.now(),
+        )
+    )
+    session.commit()
+    return len(rows)
+
+
+async def _materialize() -> None:
+    """Set up the API state and materialize the evidence of all supported guidelines."""
+    async with lifespan(app):
+        with app.state.session() as session:
+            n_rows = materialize_guideline_evidence(
+                session, sorted(get_supported_guidelines())
+            )
+    logger.info(f"Materialized {n_rows} evidence items in total")
+
+
+def main() -> None:
+    """Materialize the evidence of all supported guidelines."""
+    asyncio.run(_materialize())
+
+
+if __name__ == "__main__":
+    main()
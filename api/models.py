@@ -2,14 +2,14 @@
 
 import datetime
 import re
-from pathlib import Path
-from typing import Literal, Type, TypeVar
+from collections.abc import Mapping
+from typing import Iterable, Literal, Type, TypeVar
 
 import pydantic
-from cachetools import LFUCache
+from cachetools import LRUCache
 from pydantic import BaseModel, Field
-from shelved_cache import PersistentCache
 
+from api.concept_store import ConceptStore
 from integration.orm import aact, civic, pubmed
 from integration.umls.parser import MetaThesaurusParser
 import json
@@ -67,6 +67,55 @@ def is_review(trial):
     return False
 
 
+ConceptMentions = dict[str, list[tuple[str, str | None]]]
+
+
+def civic_concept_mentions(evidence: civic.Evidence) -> ConceptMentions:
+    """Return the (CUI, text) pairs of the concepts of a CIViC evidence item by kind."""
+    population = []
+    if evidence.disease_cui:
+        population.append((evidence.disease_cui, evidence.disease_display_name))
+    population += [(p.cui, p.name) for p in evidence.phenotypes if p.cui]
+    return {
+        "population": population,
+        "intervention": [(t.cui, t.name) for t in evidence.therapies if t.cui],
+    }
+
+
+def pubmed_concept_mentions(trial: pubmed.Trial) -> ConceptMentions:
+    """Return the (CUI, text) pairs of the concepts of a PubMed trial by kind."""
+    return {
+        "population": [
+            (m.cui, m.mesh_term) for m in trial.mesh_terms or [] if m.cui
+        ]
+        + [(p.cui, p.mention) for p in trial.umls_population or [] if p.cui],
+        "intervention": [
+            (i.cui, i.mention) for i in trial.umls_interventions or [] if i.cui
+        ],
+    }
+
+
+def aact_concept_mentions(trial: aact.Trial) -> ConceptMentions:
+    """Return the (CUI, text) pairs of the concepts of a ClinicalTrials.gov trial by kind."""
+    return {
+        "population": [(c.cui, c.mesh_term) for c in trial.mesh_conditions if c.cui],
+        "intervention": [
+            (i.cui, i.mesh_term) for i in trial.mesh_interventions if i.cui
+        ],
+    }
+
+
+def concept_mentions(
+    trial: civic.Evidence | pubmed.Trial | aact.Trial,
+) -> ConceptMentions:
+    """Return the (CUI, text) pairs of the concepts of any source's ORM instance by kind."""
+    if isinstance(trial, civic.Evidence):
+        return civic_concept_mentions(trial)
+    if isinstance(trial, pubmed.Trial):
+        return pubmed_concept_mentions(trial)
+    return aact_concept_mentions(trial)
+
+
 def parse_phase_to_int(phase_numeral_string: str) -> int | None:
     """Parse the phase information from the string and return it as an integer."""
     roman_numerals = {"i": 1, "ii": 2, "iii": 3, "iv": 4}
@@ -213,33 +262,56 @@ class UmlsConceptParser:
     def __init__(
         self,
         umls_parser: MetaThesaurusParser,
-        cache_dir: str | Path,
-        cui_to_cpg_map_population: dict[str, set[str]],
-        cui_to_cpg_map_intervention: dict[str, set[str]],
-        cui_to_cpg_map_intervention_recommended: dict[str, set[str]] = {},
+        concept_store: ConceptStore,
+        cui_to_cpg_map_population: Mapping[str, set[str]],
+        cui_to_cpg_map_intervention: Mapping[str, set[str]],
+        cui_to_cpg_map_intervention_recommended: Mapping[str, set[str]] = {},
+        memory_cache_size: int = 20000,
     ) -> None:
-        """Initialize the UmlsConceptParser."""
+        """Initialize the UmlsConceptParser.
+
+        Parsed concepts are kept in a small in-process LRU cache in front of the concept
+        store, which is shared with all other worker processes.
+        """
         self.umls_parser = umls_parser
         self.cui_to_cpg_map_population = cui_to_cpg_map_population
         self.cui_to_cpg_map_intervention = cui_to_cpg_map_intervention
         self.cui_to_cpg_map_intervention_recommended = (
             cui_to_cpg_map_intervention_recommended
         )
-        self.cache_dir = Path(cache_dir)
-        self.cache_path = self.cache_dir / "persistent_umls_concepts.cache"
-        self._create_cache_dir()
-        self.cache = PersistentCache(LFUCache, str(self.cache_path), maxsize=200000)
+        self.concept_store = concept_store
+        self.cache: LRUCache = LRUCache(maxsize=memory_cache_size)
 
-    def _create_cache_dir(self):
-        """Create the cache directory if it does not exist."""
-        if not self.cache_dir.exists():
-            self.cache_dir.mkdir()
+    def close(self) -> None:
+        """Close the concept store."""
+        self.concept_store.close()
 
-    def _generate_cache_key(self, cui: str, kind: str, guideline_id: str | None) -> str:
+    def _generate_cache_key(self, cui: str, kind: str) -> str:
         """Generate a unique cache key."""
-        if guideline_id is None:
-            return f"{cui}-{kind}"
-        return f"{cui}-{kind}-{guideline_id}"
+        return f"{cui}-{kind}"
+
+    def _get_cached_concepts(self, cache_keys: Iterable[str]) -> dict[str, UmlsConcept]:
+        """Return the cached concepts, reading those not in memory from the concept store."""
+        concepts = {}
+        not_in_memory = []
+        for cache_key in cache_keys:
+            concept = self.cache.get(cache_key)
+            if concept is None:
+                not_in_memory.append(cache_key)
+            else:
+                concepts[cache_key] = concept
+        if not_in_memory:
+            for cache_key, value in self.concept_store.get_many(not_in_memory).items():
+                concept = UmlsConcept.model_validate_json(value)
+                self.cache[cache_key] = concepts[cache_key] = concept
+        return concepts
+
+    def _cache_concepts(self, concepts: dict[str, UmlsConcept]) -> None:
+        """Add new concepts to the memory cache and the concept store."""
+        self.cache.update(concepts)
+        self.concept_store.put_many(
+            {cache_key: concept.model_dump_json() for cache_key, concept in concepts.items()}
+        )
 
     def _parse_concept(
         self,
@@ -249,44 +321,75 @@ class UmlsConceptParser:
         query: EvidenceQuery,
     ) -> UmlsConcept:
         """Parse a UMLS concept and return a UmlsConcept instance."""
-        cache_key = self._generate_cache_key(cui, kind, query.guideline_id)
-
-        lookup_table = self._get_lookup_table(kind)
-        if cache_key not in lookup_table:
-            concept = self._create_new_concept(cui, text, kind, query)
-            lookup_table[cache_key] = concept
-        return lookup_table[cache_key]
-
-    def _get_lookup_table(self, kind: Literal["intervention", "population"]):
-        """Return the lookup table for the given kind."""
-        if kind == "intervention":
-            return self.cache.setdefault("intervention", {})
-        else:
-            return self.cache.setdefault("population", {})
+        cache_key = self._generate_cache_key(cui, kind)
+
+        concept = self._get_cached_concepts([cache_key]).get(cache_key)
+        if concept is None:
+            concept = self._create_new_concept(
+                cui,
+                text,
+                kind,
+                text_umls=self.umls_parser.get_umls_text(cui),
+                semantic_types=self.umls_parser.get_semantic_types(cui),
+            )
+            self._cache_concepts({cache_key: concept})
+        return self._apply_concept_flags(concept, kind, query)
+
+    def prefetch(self, mentions: Iterable[ConceptMentions]) -> None:
+        """Create all uncached concepts mentioned by a response with one batch of UMLS lookups.
+
+        Mentions have to be passed in the order the concepts are parsed afterwards, so that
+        each concept keeps the text of its first mention.
+        """
+        mentioned: dict[str, tuple[str, str | None, str]] = {}
+        for trial_mentions in mentions:
+            for kind, items in trial_mentions.items():
+                for cui, text in items:
+                    mentioned.setdefault(
+                        self._generate_cache_key(cui, kind), (cui, text, kind)
+                    )
+        cached = self._get_cached_concepts(mentioned)
+        missing = {k: v for k, v in mentioned.items() if k not in cached}
+        if not missing:
+            return
+        cuis = {cui for cui, _, _ in missing.values()}
+        texts_umls = self.umls_parser.get_umls_texts(cuis)
+        semantic_types = self.umls_parser.get_semantic_types_many(cuis)
+        self._cache_concepts(
+            {
+                cache_key: self._create_new_concept(
+                    cui,
+                    text,
+                    kind,
+                    text_umls=texts_umls.get(cui),
+                    semantic_types=semantic_types.get(cui, []),
+                )
+                for cache_key, (cui, text, kind) in missing.items()
+            }
+        )
 
     def _create_new_concept(
         self,
         cui: str,
         text: str | None,
         kind: Literal["intervention", "population"],
-        query: EvidenceQuery,
+        text_umls: str | None,
+        semantic_types: list[dict[str, str]],
     ):
-        """Create a new UmlsConcept instance."""
-        concept = UmlsConcept(
+        """Create a new UmlsConcept instance without any query-dependent flags."""
+        return UmlsConcept(
             cui=cui,
             text=text,
-            text_umls=self.umls_parser.get_umls_text(cui),
+            text_umls=text_umls,
             matching_cpgs=list(self._get_cui_to_cpg_map(kind).get(cui, set())),
             matching_cpgs_recommended=list(
                 self._get_cui_to_cpg_map(kind, recommended_only=True).get(cui, set())
             ),
             semantic_types=[
                 SemanticType(tui=t["TUI"], tree_number=t["STN"], name=t["STY"])
-                for t in self.umls_parser.get_semantic_types(cui)
+                for t in semantic_types
             ],
         )
-        self._set_concept_flags(concept, kind, query)
-        return concept
 
     def _get_cui_to_cpg_map(
         self,
@@ -303,52 +406,59 @@ class UmlsConceptParser:
             )
         return cui_to_cpg_map
 
-    def _set_concept_flags(
+    def _apply_concept_flags(
         self,
         concept: UmlsConcept,
         kind: Literal["intervention", "population"],
         query: EvidenceQuery,
-    ) -> None:
-        self._set_flag_hidden_by_filter(concept, kind, query)
-        self._set_flag_known(concept, kind, query)
-        self._set_flag_recommended(concept, kind, query)
+    ) -> UmlsConcept:
+        """Return the cached concept with the flags of the query, copying it only if they differ."""
+        flags = {
+            "is_hidden_by_filter": self._get_flag_hidden_by_filter(concept, kind, query),
+            "is_known": self._get_flag_known(concept, kind, query),
+            "is_recommended": self._get_flag_recommended(concept, kind, query),
+        }
+        if all(getattr(concept, flag) == value for flag, value in flags.items()):
+            return concept
+        return concept.model_copy(update=flags)
 
-    def _set_flag_known(
+    def _get_flag_known(
         self,
         concept: UmlsConcept,
         kind: Literal["intervention", "population"],
         query: EvidenceQuery,
-    ) -> None:
+    ) -> bool | None:
         if kind != "intervention" or query.guideline_id is None:
-            return
-        concept.is_known = concept.occurs_in_guideline(query.guideline_id)
+            return None
+        return concept.occurs_in_guideline(query.guideline_id)
 
-    def _set_flag_recommended(
+    def _get_flag_recommended(
         self,
         concept: UmlsConcept,
         kind: Literal["intervention", "population"],
         query: EvidenceQuery,
-    ) -> None:
+    ) -> bool | None:
         if kind != "intervention" or query.guideline_id is None:
-            return
-        concept.is_recommended = concept.occurs_in_guideline(
+            return None
+        return concept.occurs_in_guideline(
             query.guideline_id, in_recommendations=True
         )
 
-    def _set_flag_hidden_by_filter(
+    def _get_flag_hidden_by_filter(
         self,
         concept: UmlsConcept,
         kind: Literal["intervention", "population"],
         query: EvidenceQuery,
-    ) -> None:
+    ) -> bool:
         if kind == "intervention" and query.filter_stns_interventions:
-            concept.is_hidden_by_filter = not concept.has_matching_semantic_type(
+            return not concept.has_matching_semantic_type(
                 query.filter_stns_interventions
             ) or (concept.cui in query.ignore_cuis_interventions)
         if kind == "population" and query.filter_stns_population:
-            concept.is_hidden_by_filter = not concept.has_matching_semantic_type(
+            return not concept.has_matching_semantic_type(
                 query.filter_stns_population
             )
+        return False
 
     def parse_intervention(
         self, cui: str, text: str | None, query: EvidenceQuery
@@ -620,29 +730,14 @@ class Evidence(BaseModel):
         query: EvidenceQuery,
     ) -> T:
         """Parse a civic Source ORM instance into an Evidence response model."""
-        concepts_population = set()
-        if evidence.disease_cui:
-            concepts_population.add(
-                concept_parser.parse_population(
-                    cui=evidence.disease_cui,
-                    text=evidence.disease_display_name,
-                    query=query,
-                )
-            )
-        concepts_population.update(
-            concept_parser.parse_population(
-                cui=phenotype.cui, text=phenotype.name, query=query
-            )
-            for phenotype in evidence.phenotypes
-            if phenotype.cui
-        )
-
+        mentions = civic_concept_mentions(evidence)
+        concepts_population = {
+            concept_parser.parse_population(cui=cui, text=text, query=query)
+            for cui, text in mentions["population"]
+        }
         concepts_intervention = {
-            concept_parser.parse_intervention(
-                cui=therapy.cui, text=therapy.name, query=query
-            )
-            for therapy in evidence.therapies
-            if therapy.cui
+            concept_parser.parse_intervention(cui=cui, text=text, query=query)
+            for cui, text in mentions["intervention"]
         }
 
         # phase, phase_int = extract_highest_phase(
@@ -696,40 +791,15 @@ class Evidence(BaseModel):
         query: EvidenceQuery,
     ) -> T:
         """Parse a Pubmed Trial ORM instance into an Evidence response model."""
-        concepts_population = set()
-        if trial.mesh_terms:
-            concepts_population = {
-                concept_parser.parse_population(
-                    cui=mesh_term.cui,
-                    text=mesh_term.mesh_term,
-                    query=query,
-                )
-                for mesh_term in trial.mesh_terms
-                if mesh_term.cui
-            }
-
-        if trial.umls_population:
-            concepts_population.update(
-                concept_parser.parse_population(
-                    cui=population.cui,
-                    text=population.mention,
-                    query=query,
-                )
-                for population in trial.umls_population
-                if population.cui
-            )
-
-        concepts_intervention = set()
-        if trial.umls_interventions:
-            concepts_intervention = {
-                concept_parser.parse_intervention(
-                    cui=intervention.cui,
-                    text=intervention.mention,
-                    query=query,
-                )
-                for intervention in trial.umls_interventions
-                if intervention.cui
-            }
+        mentions = pubmed_concept_mentions(trial)
+        concepts_population = {
+            concept_parser.parse_population(cui=cui, text=text, query=query)
+            for cui, text in mentions["population"]
+        }
+        concepts_intervention = {
+            concept_parser.parse_intervention(cui=cui, text=text, query=query)
+            for cui, text in mentions["intervention"]
+        }
 
         publication_types: list[str] = []
         mesh_terms: list[str] = []
@@ -807,23 +877,14 @@ class Evidence(BaseModel):
         query: EvidenceQuery,
     ) -> T:
         """Parse a aact Trial ORM instance into an Evidence response model."""
+        mentions = aact_concept_mentions(trial)
         concepts_population = {
-            concept_parser.parse_population(
-                cui=population.cui,
-                text=population.mesh_term,
-                query=query,
-            )
-            for population in trial.mesh_conditions
-            if population.cui
+            concept_parser.parse_population(cui=cui, text=text, query=query)
+            for cui, text in mentions["population"]
         }
         concepts_intervention = {
-            concept_parser.parse_intervention(
-                cui=intervention.cui,
-                text=intervention.mesh_term,
-                query=query,
-            )
-            for intervention in trial.mesh_interventions
-            if intervention.cui
+            concept_parser.parse_intervention(cui=cui, text=text, query=query)
+            for cui, text in mentions["intervention"]
         }
 
         phase_items = ([trial.phase] if trial.phase else []) + [
@@ -862,9 +923,13 @@ class Evidence(BaseModel):
             phase_int=max(phases_all) if phases_all else None,
             phases_all=phases_all,
             results_available=(
-                any([len(outcome.analyses) > 0 for outcome in trial.outcomes])
-                if trial.outcomes
-                else False
+                trial.results_available
+                if trial.results_available is not None
+                else (
+                    any([len(outcome.analyses) > 0 for outcome in trial.outcomes])
+                    if trial.outcomes
+                    else False
+                )
             ),
             date_last_update=trial.date_last_update,
             date_start=trial.date_start,
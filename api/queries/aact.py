@@ -1,22 +1,92 @@
 """A module for retrieving evidence from AACT."""
 
-from sqlalchemy import Select, desc, func, join, select, and_, or_
-from sqlalchemy.orm import selectinload
+import datetime
+from typing import TYPE_CHECKING
 
+from sqlalchemy import CompoundSelect, Select, exists, func, select, union, union_all
+from sqlalchemy.orm import noload, selectinload, with_expression
+
+from api.queries import evidence_concept
+from api.queries.utils import (
+    apply_keyset,
+    apply_sample_size_filter,
+    order_newest_first,
+    select_concept_mentions,
+    year_in_range,
+)
 from integration.orm import aact
 
+if TYPE_CHECKING:
+    from api.concept_index import ConceptIndex
 
-from sqlalchemy import CompoundSelect, Select, desc, func, or_, and_, select, union, join
-from sqlalchemy.orm import aliased, selectinload
+def _has_results():
+    """Return a condition that is true if an outcome of the trial has analyses."""
+    return (
+        exists()
+        .where(aact.Outcome.trial_id == aact.Trial.id)
+        .where(aact.OutcomeAnalyses.outcome_id == aact.Outcome.id)
+    )
 
-from integration.orm import pubmed, aact
 
-def get_evidence_by_population(
+def _evidence_load_options(lean: bool = False) -> list:
+    """Return the loader options for all relationships needed to build evidence.
+
+    results_available is computed in the DB instead of loading all outcome analyses. In
+    lean mode, the relationships that list responses do not show are not loaded.
+    """
+    load = noload if lean else selectinload
+    return [
+        with_expression(aact.Trial.results_available, _has_results()),
+        selectinload(aact.Trial.mesh_conditions),
+        selectinload(aact.Trial.mesh_interventions),
+        load(aact.Trial.references),
+        load(aact.Trial.eligibilities),
+        load(aact.Trial.outcomes),
+        selectinload(aact.Trial.flags),
+    ]
+
+
+def _matching_trials_by_concepts(
+    population_cuis: list[str] | Select,
+    intervention_cuis: list[str] | Select | None = None,
+    intervention_names: list[str] | None = None,
+):
+    """Return a subquery of the IDs of the trials matching the query by their evidence concepts."""
+    population_ids = evidence_concept.select_trial_ids(
+        "clinicaltrials", ["population"], population_cuis
+    )
+    if not evidence_concept.has_cuis(intervention_cuis):
+        return population_ids.distinct().subquery()
+    intervention_ids = evidence_concept.select_trial_ids(
+        "clinicaltrials", ["intervention"], intervention_cuis
+    )
+    if intervention_names:
+        intervention_ids = union(
+            intervention_ids,
+            select(aact.Intervention.trial_id).where(
+                aact.Intervention.intervention.in_(intervention_names)
+            ),
+        )
+    return (
+        population_ids.where(
+            population_ids.selected_columns.trial_id.in_(intervention_ids)
+        )
+        .distinct()
+        .subquery()
+    )
+
+
+def _matching_trials(
     population_cuis: list[str],
     intervention_cuis: list[str] | None = None,
     intervention_names: list[str] | None = None,
-) -> Select:
-    """Return a list of Trials connected to the provided evidence CUI."""
+    use_evidence_concepts: bool = False,
+):
+    """Return a subquery of the IDs of all trials matching the population and interventions."""
+    if use_evidence_concepts:
+        return _matching_trials_by_concepts(
+            population_cuis, intervention_cuis, intervention_names
+        )
     population_subq = select(aact.MeshCondition.trial_id).where(aact.MeshCondition.cui.in_(population_cuis))
     
     if not intervention_cuis:
@@ -35,26 +105,140 @@ def get_evidence_by_population(
             ).subquery()
         population_subq = population_subq.subquery()
         join_clause = select(population_subq.c.trial_id).join(intervention_subq, population_subq.c.trial_id == intervention_subq.c.trial_id).distinct().subquery()
-    
+    return join_clause
+
+
+def get_evidence_ids_by_population(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    use_evidence_concepts: bool = False,
+) -> Select:
+    """Return the IDs of the Trials connected to the provided evidence CUI, newest first.
+
+    With use_evidence_concepts, the trials are matched through the denormalized evidence
+    concepts, whose CUIs may also be staged.
+    """
+    join_clause = _matching_trials(
+        population_cuis, intervention_cuis, intervention_names, use_evidence_concepts
+    )
+    return (
+        select(aact.Trial.id)
+        .join(join_clause, aact.Trial.id == join_clause.c.trial_id)
+        .order_by(
+            *order_newest_first(aact.Trial.date_results_first_posted, aact.Trial.id)
+        )
+    )
+
+
+def get_evidence_ids() -> Select:
+    """Return the IDs of all Trials, newest first."""
+    return select(aact.Trial.id).order_by(
+        *order_newest_first(aact.Trial.date_results_first_posted, aact.Trial.id)
+    )
+
+
+def get_evidence_ids_from_index(
+    index: "ConceptIndex",
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+) -> list[int] | None:
+    """Return the IDs of the Trials connected to the evidence CUI from the index, newest first.
+
+    Intervention names are not indexed, so queries matching them return None.
+    """
+    if intervention_cuis and intervention_names:
+        return None
+    return index.match(
+        "clinicaltrials",
+        ["population"],
+        evidence_concept.cuis_to_ints(population_cuis),
+        ["intervention"],
+        evidence_concept.cuis_to_ints(intervention_cuis or []),
+    )
+
+
+def get_filtered_evidence_ids(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    sample_range_min: int | None = None,
+    sample_range_max: int | None = None,
+    year_range_min: int | None = None,
+    year_range_max: int | None = None,
+    significant_results: bool | None = None,
+    results_available: bool | None = None,
+    strict_rct_filter: bool | None = True,
+    after: tuple[datetime.date | None, int] | None = None,
+    use_evidence_concepts: bool = False,
+) -> Select:
+    """Return (ID, date) of the matching Trials passing the /trialsearch filters, newest first.
+
+    Only the filters that can be evaluated in the DB are applied, strict_rct_filter does
+    not apply to AACT. If given, only the Trials after the (date, ID) keyset are returned.
+    """
+    query = get_evidence_ids_by_population(
+        population_cuis, intervention_cuis, intervention_names, use_evidence_concepts
+    ).add_columns(aact.Trial.date_results_first_posted.label("date"))
+    query = apply_sample_size_filter(
+        query, sample_range_min, sample_range_max, aact.Trial.enrollment
+    )
+    for date_col in [aact.Trial.date_results_first_posted, aact.Trial.date_start]:
+        year_condition = year_in_range(date_col, year_range_min, year_range_max)
+        if year_condition is not None:
+            query = query.where(year_condition)
+    if results_available:
+        query = query.where(_has_results())
+    if significant_results:
+        query = query.where(
+            exists().where(
+                aact.Flags.source_id == aact.Trial.id,
+                aact.Flags.has_significant_finding.is_(True),
+            )
+        )
+    return apply_keyset(
+        query, aact.Trial.date_results_first_posted, aact.Trial.id, after
+    )
+
+
+def get_evidence_by_ids(ids: list[int], lean: bool = False) -> Select:
+    """Return the Trials with the provided IDs with everything needed to build evidence.
+
+    In lean mode, references, eligibilities and outcomes are not loaded.
+    """
+    return (
+        select(aact.Trial)
+        .where(aact.Trial.id.in_(ids))
+        .options(*_evidence_load_options(lean))
+    )
+
+
+def get_evidence_by_population(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+) -> Select:
+    """Return a list of Trials connected to the provided evidence CUI."""
+    join_clause = _matching_trials(population_cuis, intervention_cuis, intervention_names)
     query = (
         select(aact.Trial)
         .join(join_clause, aact.Trial.id == join_clause.c.trial_id)
-        .order_by(desc(aact.Trial.date_results_first_posted))
-        .options(
-            selectinload(aact.Trial.mesh_conditions),
-            selectinload(aact.Trial.mesh_interventions),
-            selectinload(aact.Trial.references),
-            selectinload(aact.Trial.eligibilities),
-            selectinload(aact.Trial.outcomes).selectinload(aact.Outcome.analyses),
-            selectinload(aact.Trial.flags),
+        .order_by(
+            *order_newest_first(aact.Trial.date_results_first_posted, aact.Trial.id)
         )
+        .options(*_evidence_load_options())
     )
     return query
 
 
 def get_trials_by_ids(nct_ids: list[str]) -> Select:
     """Return a list of Trials for the provided NCT IDs."""
-    query = select(aact.Trial).where(aact.Trial.nct_id.in_(nct_ids))
+    query = (
+        select(aact.Trial)
+        .where(aact.Trial.nct_id.in_(nct_ids))
+        .options(with_expression(aact.Trial.results_available, _has_results()))
+    )
     return query
 
 
@@ -93,3 +277,15 @@ def get_year_max() -> Select:
         .where(aact.Trial.date_results_first_posted.isnot(None))
     )
     return query
+
+
+def get_concept_mentions() -> CompoundSelect:
+    """Return (kind, CUI, text) tuples for all distinct CUIs in the AACT database."""
+    return union_all(
+        select_concept_mentions(
+            "population", aact.MeshCondition.cui, aact.MeshCondition.mesh_term
+        ),
+        select_concept_mentions(
+            "intervention", aact.MeshIntervention.cui, aact.MeshIntervention.mesh_term
+        ),
+    )
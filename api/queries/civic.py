@@ -1,15 +1,43 @@
 """A module for retrieving evidence from Civic."""
 
-from sqlalchemy import Select, desc, func, select, union
-from sqlalchemy.orm import aliased, selectinload
+import datetime
+from typing import TYPE_CHECKING
 
+from sqlalchemy import CompoundSelect, Select, exists, func, select, union, union_all
+from sqlalchemy.orm import aliased, defer, noload, selectinload
+
+from api.queries import evidence_concept
+from api.queries.utils import (
+    apply_keyset,
+    order_newest_first,
+    select_concept_mentions,
+    year_in_range,
+)
 from integration.orm import civic
 
-def get_evidence_by_population(population_cuis: list[str], 
-                               # TODO : filter by intervention not yet implemented
-                               intervention_cuis: list[str] | None = None,
-                               intervention_names: list[str] | None = None) -> Select:
-    """Return a list of Sources with matching CUI in either diseases or phenotype."""
+if TYPE_CHECKING:
+    from api.concept_index import ConceptIndex
+
+def _evidence_load_options(lean: bool = False) -> list:
+    """Return the loader options for all relationships needed to build evidence.
+
+    The description is never loaded. In lean mode, the clinical trials of the sources are
+    not loaded either.
+    """
+    load = noload if lean else selectinload
+    return [
+        defer(civic.Evidence.description),
+        selectinload(civic.Evidence.source).options(
+            load(civic.Source.clinical_trials),
+            selectinload(civic.Source.flags),
+        ),
+        selectinload(civic.Evidence.phenotypes),
+        selectinload(civic.Evidence.therapies),
+    ]
+
+
+def _matching_evidence(population_cuis: list[str]):
+    """Return a union of the IDs of all evidence with matching disease or phenotype."""
     # define subqueries for matching population
     evidence_with_matching_disease = aliased(
         civic.Evidence,
@@ -22,27 +50,119 @@ def get_evidence_by_population(population_cuis: list[str],
         .where(civic.Phenotype.cui.in_(population_cuis))
         .subquery(),
     )
+    return union(
+        select(evidence_with_matching_disease.id),
+        select(evidence_with_matching_phenotype.id),
+    )
+
+
+def get_evidence_ids_by_population(population_cuis: list[str],
+                                   # TODO : filter by intervention not yet implemented
+                                   intervention_cuis: list[str] | None = None,
+                                   intervention_names: list[str] | None = None,
+                                   use_evidence_concepts: bool = False) -> Select:
+    """Return the IDs of the evidence with matching CUI in diseases or phenotypes, newest first.
+
+    With use_evidence_concepts, the evidence is matched through the denormalized evidence
+    concepts, whose CUIs may also be staged.
+    """
+    matching_evidence = (
+        evidence_concept.select_trial_ids("civic", ["population"], population_cuis)
+        if use_evidence_concepts
+        else _matching_evidence(population_cuis)
+    )
+    return (
+        select(civic.Evidence.id)
+        .join(civic.Source)
+        .where(civic.Evidence.id.in_(matching_evidence))
+        .order_by(*order_newest_first(civic.Source.date_publication, civic.Evidence.id))
+    )
+
+
+def get_evidence_ids() -> Select:
+    """Return the IDs of all evidence, newest first."""
+    return (
+        select(civic.Evidence.id)
+        .join(civic.Source)
+        .order_by(*order_newest_first(civic.Source.date_publication, civic.Evidence.id))
+    )
+
+
+def get_evidence_ids_from_index(index: "ConceptIndex",
+                                population_cuis: list[str],
+                                # TODO : filter by intervention not yet implemented
+                                intervention_cuis: list[str] | None = None,
+                                intervention_names: list[str] | None = None) -> list[int]:
+    """Return the IDs of the evidence with matching CUI in diseases or phenotypes, newest first.
+
+    The evidence is looked up in the concept index.
+    """
+    return index.match("civic", ["population"], evidence_concept.cuis_to_ints(population_cuis))
+
+
+def get_filtered_evidence_ids(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    sample_range_min: int | None = None,
+    sample_range_max: int | None = None,
+    year_range_min: int | None = None,
+    year_range_max: int | None = None,
+    significant_results: bool | None = None,
+    results_available: bool | None = None,
+    strict_rct_filter: bool | None = True,
+    after: tuple[datetime.date | None, int] | None = None,
+    use_evidence_concepts: bool = False,
+) -> Select:
+    """Return (ID, date) of the matching evidence passing the /trialsearch filters, newest first.
+
+    Civic evidence has no sample size, so only the year and significance filters apply.
+    If given, only the evidence after the (date, ID) keyset is returned.
+    """
+    query = get_evidence_ids_by_population(
+        population_cuis, intervention_cuis, intervention_names, use_evidence_concepts
+    ).add_columns(civic.Source.date_publication.label("date"))
+    year_condition = year_in_range(
+        civic.Source.date_publication, year_range_min, year_range_max
+    )
+    if year_condition is not None:
+        query = query.where(year_condition)
+    if significant_results:
+        query = query.where(
+            exists().where(
+                civic.Flags.source_id == civic.Evidence.source_id,
+                civic.Flags.has_significant_finding.is_(True),
+            )
+        )
+    return apply_keyset(
+        query, civic.Source.date_publication, civic.Evidence.id, after
+    )
+
+
+def get_evidence_by_ids(ids: list[int], lean: bool = False) -> Select:
+    """Return the evidence with the provided IDs with everything needed to build API evidence.
+
+    In lean mode, the clinical trials of the sources are not loaded.
+    """
+    return (
+        select(civic.Evidence)
+        .where(civic.Evidence.id.in_(ids))
+        .options(*_evidence_load_options(lean))
+    )
 
+
+def get_evidence_by_population(population_cuis: list[str], 
+                               # TODO : filter by intervention not yet implemented
+                               intervention_cuis: list[str] | None = None,
+                               intervention_names: list[str] | None = None) -> Select:
+    """Return a list of Sources with matching CUI in either diseases or phenotype."""
     # combine subqueries
     query = (
         select(civic.Evidence)
         .join(civic.Source)
-        .where(
-            civic.Evidence.id.in_(
-                union(
-                    select(evidence_with_matching_disease.id),
-                    select(evidence_with_matching_phenotype.id),
-                )
-            )
-        )
-        .options(
-            selectinload(civic.Evidence.source).selectinload(
-                civic.Source.clinical_trials
-            ),
-            selectinload(civic.Evidence.phenotypes),
-            selectinload(civic.Evidence.therapies),
-        )
-        .order_by(desc(civic.Source.date_publication))
+        .where(civic.Evidence.id.in_(_matching_evidence(population_cuis)))
+        .options(*_evidence_load_options())
+        .order_by(*order_newest_first(civic.Source.date_publication, civic.Evidence.id))
     )
 
     return query
@@ -69,3 +189,14 @@ def get_year_max() -> Select:
         .where(civic.Source.date_publication.isnot(None))
     )
     return query
+
+
+def get_concept_mentions() -> CompoundSelect:
+    """Return (kind, CUI, text) tuples for all distinct CUIs in the Civic database."""
+    return union_all(
+        select_concept_mentions(
+            "population", civic.Evidence.disease_cui, civic.Evidence.disease_display_name
+        ),
+        select_concept_mentions("population", civic.Phenotype.cui, civic.Phenotype.name),
+        select_concept_mentions("intervention", civic.Therapy.cui, civic.Therapy.name),
+    )
@@ -0,0 +1,67 @@
+"""A module for matching evidence through the denormalized evidence concepts."""
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Select,
+    Table,
+    delete,
+    insert,
+    select,
+)
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.schema import CreateTable
+
+from integration.orm.evidence_concept import EvidenceConcept
+
+# per-connection tables holding large sets of query CUIs, one per role, as MySQL cannot
+# reference a temporary table more than once within a statement
+QUERY_CUI_TABLES = {
+    role: Table(
+        f"nge_query_cui_{role}",
+        MetaData(),
+        Column("cui_int", Integer, primary_key=True, autoincrement=False),
+        prefixes=["TEMPORARY"],
+    )
+    for role in ["population", "intervention"]
+}
+
+
+def cuis_to_ints(cuis: list[str]) -> list[int]:
+    """Return the CUIs of the form C1234567 as integers, skipping all others."""
+    return list(
+        {int(c[1:]) for c in cuis if len(c) == 8 and c[0] == "C" and c[1:].isdigit()}
+    )
+
+
+def stage_cuis(session: Session, role: str, cuis: list[str]) -> Select:
+    """Store the CUIs in the temporary query CUI table of the role and return a Select of them.
+
+    The table lives as long as the connection of the session, so the staged CUIs can be
+    used by any number of queries within the session.
+    """
+    table = QUERY_CUI_TABLES[role]
+    session.execute(CreateTable(table, if_not_exists=True))
+    session.execute(delete(table))
+    cui_ints = cuis_to_ints(cuis)
+    if cui_ints:
+        session.execute(insert(table), [{"cui_int": i} for i in cui_ints])
+    return select(table.c.cui_int)
+
+
+def select_trial_ids(source: str, roles: list[str], cuis: list[str] | Select) -> Select:
+    """Return the IDs of the evidence of the source mentioning one of the CUIs in one of the roles.
+
+    The CUIs are either a list or a Select statement of staged CUIs.
+    """
+    ec = aliased(EvidenceConcept)
+    cui_ints = cuis if isinstance(cuis, Select) else cuis_to_ints(cuis)
+    return select(ec.trial_id.label("trial_id")).where(
+        ec.source == source, ec.role.in_(roles), ec.cui_int.in_(cui_ints)
+    )
+
+
+def has_cuis(cuis: list[str] | Select | None) -> bool:
+    """Return True if CUIs are given, staged CUIs always count as given."""
+    return isinstance(cuis, Select) or bool(cuis)
@@ -0,0 +1,111 @@
+"""A module for retrieving evidence materialized per guideline."""
+
+import datetime
+
+from sqlalchemy import Select, and_, case, or_, select
+
+from api.queries.utils import after_keyset, order_newest_first
+from integration.orm.guideline_evidence import GuidelineEvidence
+
+
+def get_materialized_guidelines() -> Select:
+    """Return the IDs of all guidelines with materialized evidence."""
+    return select(GuidelineEvidence.guideline_id).distinct()
+
+
+def _year_in_range(year_col, year_range_min: int | None, year_range_max: int | None):
+    """Return a condition that is true if the year is unknown or within the range."""
+    conditions = []
+    if year_range_min is not None:
+        conditions.append(year_col >= year_range_min)
+    if year_range_max is not None:
+        conditions.append(year_col <= year_range_max)
+    if not conditions:
+        return None
+    return or_(year_col.is_(None), and_(*conditions))
+
+
+def get_filtered_evidence(
+    guideline_id: str,
+    sources: list[str],
+    sample_range_min: int | None = None,
+    sample_range_max: int | None = None,
+    year_range_min: int | None = None,
+    year_range_max: int | None = None,
+    max_results: int | None = None,
+    has_unknown_intervention: bool | None = None,
+    has_known_intervention: bool | None = None,
+    has_not_recommended_intervention: bool | None = None,
+    has_recommended_intervention: bool | None = None,
+    exclude_children: bool = False,
+    phase: list[int] | None = None,
+    significant_results: bool | None = None,
+    results_available: bool | None = None,
+    strict_rct_filter: bool | None = True,
+    after: tuple[str, datetime.date | None, int] | None = None,
+) -> Select:
+    """Return (source, evidence ID, date) of the materialized evidence passing the filters.
+
+    The filters mirror api.nge_shim.utils.apply_trialsearch_filters, rows are returned in
+    the order of the sources and then newest first within each source. If given, only the
+    rows after the (source, date, ID) keyset are returned.
+    """
+    ge = GuidelineEvidence
+    query = select(ge.source, ge.evidence_id, ge.sort_date.label("date")).where(
+        ge.guideline_id == guideline_id, ge.source.in_(sources)
+    )
+    if strict_rct_filter:
+        query = query.where(or_(ge.source != "pubmed", ge.is_rct.is_(True)))
+    if sample_range_min is not None:
+        query = query.where(
+            or_(ge.sample_size.is_(None), ge.sample_size >= sample_range_min)
+        )
+    if sample_range_max is not None:
+        query = query.where(
+            or_(ge.sample_size.is_(None), ge.sample_size <= sample_range_max)
+        )
+    if results_available:
+        query = query.where(
+            or_(ge.source != "clinicaltrials", ge.results_available.is_(True))
+        )
+    for year_col in [ge.publication_year, ge.start_year]:
+        year_condition = _year_in_range(year_col, year_range_min, year_range_max)
+        if year_condition is not None:
+            query = query.where(year_condition)
+    if phase is not None:
+        phase_mask = sum(1 << p for p in set(phase) if 0 <= p < 31)
+        phase_conditions = [ge.phases.op("&")(phase_mask) != 0]
+        if -1 in phase:
+            # no phase between 1 and 4
+            phase_conditions.append(ge.phases.op("&")(0b11110) == 0)
+        query = query.where(or_(*phase_conditions))
+    if exclude_children:
+        query = query.where(ge.has_pediatric_population.is_(False))
+    if has_unknown_intervention:
+        query = query.where(ge.has_unknown_intervention.is_(True))
+    if has_known_intervention:
+        query = query.where(ge.has_known_intervention.is_(True))
+    if has_not_recommended_intervention:
+        query = query.where(ge.has_not_recommended_intervention.is_(True))
+    if has_recommended_intervention:
+        query = query.where(ge.has_recommended_intervention.is_(True))
+    if significant_results:
+        query = query.where(ge.has_significant_finding.is_(True))
+    source_order = case({s: i for i, s in enumerate(sources)}, value=ge.source)
+    if after is not None:
+        after_source, after_date, after_id = after
+        query = query.where(
+            or_(
+                source_order > sources.index(after_source),
+                and_(
+                    ge.source == after_source,
+                    after_keyset(ge.sort_date, ge.evidence_id, (after_date, after_id)),
+                ),
+            )
+        )
+    query = query.order_by(
+        source_order, *order_newest_first(ge.sort_date, ge.evidence_id)
+    )
+    if max_results is not None:
+        query = query.limit(max_results)
+    return query
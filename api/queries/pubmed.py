@@ -1,17 +1,97 @@
 """A module for retrieving evidence from annotated Pubmed evidence."""
 
-from sqlalchemy import CompoundSelect, Select, desc, func, or_, and_, select, union
-from sqlalchemy.orm import aliased, selectinload
+import datetime
+from typing import TYPE_CHECKING
 
+from sqlalchemy import (
+    ColumnElement,
+    CompoundSelect,
+    Select,
+    exists,
+    func,
+    or_,
+    select,
+    union,
+    union_all,
+)
+from sqlalchemy.orm import aliased, defer, noload, selectinload
+
+from api.queries import evidence_concept
+from api.queries.utils import (
+    apply_keyset,
+    apply_sample_size_filter,
+    order_newest_first,
+    select_concept_mentions,
+    year_in_range,
+)
 from integration.orm import pubmed
 
-def get_evidence_by_population(
+if TYPE_CHECKING:
+    from api.concept_index import ConceptIndex
+
+def _evidence_load_options(lean: bool = False) -> list:
+    """Return the loader options for all relationships needed to build evidence.
+
+    The formatted abstract is never loaded. In lean mode, the relationships that list
+    responses do not show are not loaded either.
+    """
+    load = noload if lean else selectinload
+    return [
+        defer(pubmed.Trial.abstract_formatted),
+        selectinload(pubmed.Trial.umls_population),
+        selectinload(pubmed.Trial.umls_interventions),
+        selectinload(pubmed.Trial.publication_types),
+        selectinload(pubmed.Trial.mesh_terms),
+        load(pubmed.Trial.references),
+        load(pubmed.Trial.outcomes),
+        selectinload(pubmed.Trial.flags),
+    ]
+
+
+def _matching_trials_by_concepts(
+    population_cuis: list[str] | Select,
+    intervention_cuis: list[str] | Select | None = None,
+    intervention_names: list[str] | None = None,
+    consider_mesh_terms: bool = True,
+):
+    """Return a subquery of the IDs of the trials matching the query by their evidence concepts."""
+    population_roles = ["population", "mesh"] if consider_mesh_terms else ["population"]
+    population_ids = evidence_concept.select_trial_ids(
+        "pubmed", population_roles, population_cuis
+    )
+    if not evidence_concept.has_cuis(intervention_cuis):
+        return population_ids.distinct().subquery()
+    intervention_ids = evidence_concept.select_trial_ids(
+        "pubmed", ["intervention", "mesh"], intervention_cuis
+    )
+    if intervention_names:
+        intervention_ids = union(
+            intervention_ids,
+            select(pubmed.Intervention.trial_id).where(
+                pubmed.Intervention.intervention.in_(intervention_names)
+            ),
+        )
+    return (
+        population_ids.where(
+            population_ids.selected_columns.trial_id.in_(intervention_ids)
+        )
+        .distinct()
+        .subquery()
+    )
+
+
+def _matching_trials(
     population_cuis: list[str],
     intervention_cuis: list[str] | None = None,
     intervention_names: list[str] | None = None,
     consider_mesh_terms: bool = True,
-) -> Select:
-    """Return a list of Trials connected to the provided population CUI."""
+    use_evidence_concepts: bool = False,
+):
+    """Return a subquery of the IDs of all trials matching the population and interventions."""
+    if use_evidence_concepts:
+        return _matching_trials_by_concepts(
+            population_cuis, intervention_cuis, intervention_names, consider_mesh_terms
+        )
     subquery_mesh_terms = select(pubmed.MeshTerm.trial_id).where(
         pubmed.MeshTerm.cui.in_(population_cuis)
     )
@@ -45,19 +125,153 @@ def get_evidence_by_population(
             ).subquery()
         population_subq = population_clause.subquery()
         join_clause = select(population_subq.c.trial_id).join(intervention_subq, population_subq.c.trial_id == intervention_subq.c.trial_id).distinct().subquery()
+    return join_clause
+
+
+def get_evidence_ids_by_population(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    consider_mesh_terms: bool = True,
+    use_evidence_concepts: bool = False,
+) -> Select:
+    """Return the IDs of the Trials connected to the provided population CUI, newest first.
+
+    With use_evidence_concepts, the trials are matched through the denormalized evidence
+    concepts, whose CUIs may also be staged.
+    """
+    join_clause = _matching_trials(
+        population_cuis,
+        intervention_cuis,
+        intervention_names,
+        consider_mesh_terms,
+        use_evidence_concepts,
+    )
+    return (
+        select(pubmed.Trial.id)
+        .join(join_clause, pubmed.Trial.id == join_clause.c.trial_id)
+        .order_by(*order_newest_first(pubmed.Trial.publication_date, pubmed.Trial.id))
+    )
+
+
+def get_evidence_ids() -> Select:
+    """Return the IDs of all Trials, newest first."""
+    return select(pubmed.Trial.id).order_by(
+        *order_newest_first(pubmed.Trial.publication_date, pubmed.Trial.id)
+    )
+
+
+def get_evidence_ids_from_index(
+    index: "ConceptIndex",
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    consider_mesh_terms: bool = True,
+) -> list[int] | None:
+    """Return the IDs of the Trials connected to the population CUI from the index, newest first.
+
+    Intervention names are not indexed, so queries matching them return None.
+    """
+    if intervention_cuis and intervention_names:
+        return None
+    return index.match(
+        "pubmed",
+        ["population", "mesh"] if consider_mesh_terms else ["population"],
+        evidence_concept.cuis_to_ints(population_cuis),
+        ["intervention", "mesh"],
+        evidence_concept.cuis_to_ints(intervention_cuis or []),
+    )
+
+
+def _is_rct() -> ColumnElement[bool]:
+    """Return a condition that is true if a publication type or MeSH term marks the trial as RCT."""
+    term = "randomized controlled trial"
+    return or_(
+        exists().where(
+            pubmed.PublicationType.trial_id == pubmed.Trial.id,
+            func.lower(pubmed.PublicationType.publication_type).contains(term),
+        ),
+        exists().where(
+            pubmed.MeshTerm.trial_id == pubmed.Trial.id,
+            func.lower(pubmed.MeshTerm.mesh_term).contains(term),
+        ),
+    )
+
+
+def get_filtered_evidence_ids(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    sample_range_min: int | None = None,
+    sample_range_max: int | None = None,
+    year_range_min: int | None = None,
+    year_range_max: int | None = None,
+    significant_results: bool | None = None,
+    results_available: bool | None = None,
+    strict_rct_filter: bool | None = True,
+    after: tuple[datetime.date | None, int] | None = None,
+    consider_mesh_terms: bool = True,
+    use_evidence_concepts: bool = False,
+) -> Select:
+    """Return (ID, date) of the matching Trials passing the /trialsearch filters, newest first.
+
+    Only the filters that can be evaluated in the DB are applied, results_available does
+    not apply to Pubmed. If given, only the Trials after the (date, ID) keyset are returned.
+    """
+    query = get_evidence_ids_by_population(
+        population_cuis,
+        intervention_cuis,
+        intervention_names,
+        consider_mesh_terms,
+        use_evidence_concepts,
+    ).add_columns(pubmed.Trial.publication_date.label("date"))
+    if strict_rct_filter:
+        query = query.where(_is_rct())
+    query = apply_sample_size_filter(
+        query, sample_range_min, sample_range_max, pubmed.Trial.num_randomized
+    )
+    year_condition = year_in_range(
+        pubmed.Trial.publication_date, year_range_min, year_range_max
+    )
+    if year_condition is not None:
+        query = query.where(year_condition)
+    if significant_results:
+        query = query.where(
+            exists().where(
+                pubmed.Flags.source_id == pubmed.Trial.id,
+                pubmed.Flags.has_significant_finding.is_(True),
+            )
+        )
+    return apply_keyset(query, pubmed.Trial.publication_date, pubmed.Trial.id, after)
+
+
+def get_evidence_by_ids(ids: list[int], lean: bool = False) -> Select:
+    """Return the Trials with the provided IDs with everything needed to build evidence.
+
+    In lean mode, references and outcomes are not loaded.
+    """
+    return (
+        select(pubmed.Trial)
+        .where(pubmed.Trial.id.in_(ids))
+        .options(*_evidence_load_options(lean))
+    )
+
+
+def get_evidence_by_population(
+    population_cuis: list[str],
+    intervention_cuis: list[str] | None = None,
+    intervention_names: list[str] | None = None,
+    consider_mesh_terms: bool = True,
+) -> Select:
+    """Return a list of Trials connected to the provided population CUI."""
+    join_clause = _matching_trials(
+        population_cuis, intervention_cuis, intervention_names, consider_mesh_terms
+    )
     query = (
         select(pubmed.Trial)
         .join(join_clause, pubmed.Trial.id == join_clause.c.trial_id)
-        .order_by(desc(pubmed.Trial.publication_date))
-        .options(
-            selectinload(pubmed.Trial.umls_population),
-            selectinload(pubmed.Trial.umls_interventions),
-            selectinload(pubmed.Trial.publication_types),
-            selectinload(pubmed.Trial.mesh_terms),
-            selectinload(pubmed.Trial.references),
-            selectinload(pubmed.Trial.outcomes),
-            selectinload(pubmed.Trial.flags),
-        )
+        .order_by(*order_newest_first(pubmed.Trial.publication_date, pubmed.Trial.id))
+        .options(*_evidence_load_options())
     )
     return query
 
@@ -130,3 +344,20 @@ def get_year_max() -> Select:
         .where(pubmed.Trial.publication_date.isnot(None))
     )
     return query
+
+
+def get_concept_mentions() -> CompoundSelect:
+    """Return (kind, CUI, text) tuples for all distinct CUIs in the Pubmed database."""
+    return union_all(
+        select_concept_mentions(
+            "population", pubmed.MeshTerm.cui, pubmed.MeshTerm.mesh_term
+        ),
+        select_concept_mentions(
+            "population", pubmed.UmlsPopulation.cui, pubmed.UmlsPopulation.mention
+        ),
+        select_concept_mentions(
+            "intervention",
+            pubmed.UmlsIntervention.cui,
+            pubmed.UmlsIntervention.mention,
+        ),
+    )
@@ -2,7 +2,17 @@
 
 import datetime
 
-from sqlalchemy import DateTime, Integer, Select
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    Select,
+    and_,
+    desc,
+    func,
+    literal,
+    or_,
+    select,
+)
 from sqlalchemy.orm import InstrumentedAttribute
 
 
@@ -34,3 +44,102 @@ def apply_year_filter(
             elif isinstance(year_col.type, Integer):
                 query = query.where(year_col <= year_max)
     return query
+
+
+def select_concept_mentions(
+    kind: str, cui_col: InstrumentedAttribute, text_col: InstrumentedAttribute
+) -> Select:
+    """Return a Select statement of (kind, CUI, text) with one representative text per CUI."""
+    return (
+        select(
+            literal(kind).label("kind"),
+            cui_col.label("cui"),
+            func.min(text_col).label("text"),
+        )
+        .where(cui_col.isnot(None))
+        .group_by(cui_col)
+    )
+
+
+def _as_column_value(value: datetime.date, col: InstrumentedAttribute) -> datetime.date:
+    """Return the date or datetime as the type stored in the column."""
+    if isinstance(col.type, DateTime):
+        if not isinstance(value, datetime.datetime):
+            return datetime.datetime.combine(value, datetime.time())
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def year_in_range(
+    date_col: InstrumentedAttribute, year_min: int | None, year_max: int | None
+):
+    """Return a condition that is true if the date is unknown or its year within the range."""
+    conditions = []
+    if year_min is not None and year_min > datetime.MINYEAR:
+        conditions.append(
+            date_col >= _as_column_value(datetime.date(year_min, 1, 1), date_col)
+        )
+    if year_max is not None and year_max < datetime.MAXYEAR:
+        conditions.append(
+            date_col < _as_column_value(datetime.date(year_max + 1, 1, 1), date_col)
+        )
+    if not conditions:
+        return None
+    return or_(date_col.is_(None), and_(*conditions))
+
+
+def apply_sample_size_filter(
+    query: Select,
+    size_min: int | None,
+    size_max: int | None,
+    size_col: InstrumentedAttribute,
+) -> Select:
+    """Return a Select statement keeping rows with unknown sample size or one within the range."""
+    if size_min is not None:
+        query = query.where(or_(size_col.is_(None), size_col >= size_min))
+    if size_max is not None:
+        query = query.where(or_(size_col.is_(None), size_col <= size_max))
+    return query
+
+
+def order_newest_first(
+    date_col: InstrumentedAttribute, id_col: InstrumentedAttribute
+) -> list:
+    """Return the ORDER BY clauses for newest first, undated last, and ties by descending ID."""
+    return [date_col.is_(None), desc(date_col), desc(id_col)]
+
+
+def after_keyset(
+    date_col: InstrumentedAttribute,
+    id_col: InstrumentedAttribute,
+    after: tuple[datetime.date | None, int],
+):
+    """Return a condition that is true for rows following (date, ID) when ordered newest first."""
+    date, id_ = after
+    if date is None:
+        return and_(date_col.is_(None), id_col < id_)
+    date = _as_column_value(date, date_col)
+    return or_(
+        date_col < date,
+        and_(date_col == date, id_col < id_),
+        date_col.is_(None),
+    )
+
+
+def apply_keyset(
+    query: Select,
+    date_col: InstrumentedAttribute,
+    id_col: InstrumentedAttribute,
+    after: tuple[datetime.date | None, int] | None,
+) -> Select:
+    """Return a Select statement of the rows following (date, ID) when ordered newest first."""
+    if after is None:
+        return query
+    return query.where(after_keyset(date_col, id_col, after))
+
+
+def count_rows(query: Select) -> Select:
+    """Return a Select statement of the number of rows of the query."""
+    return select(func.count()).select_from(query.order_by(None).subquery())
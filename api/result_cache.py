@@ -0,0 +1,270 @@
+"""A module containing caches for the IDs of evidence matching a query."""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+
+from api.queries import versions
+from integration.orm.versions import Version
+
+logger = logging.getLogger(__name__)
+
+
+def get_versions_key(
+    session: Session, sources: list[str] | None = None, exclude: list[str] | None = None
+) -> str:
+    """Return a key that changes whenever one of the sources (default: any) is (re)loaded."""
+    return make_versions_key(
+        list(session.scalars(versions.get_versions())), sources, exclude
+    )
+
+
+def make_versions_key(
+    version_rows: list[Version],
+    sources: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> str:
+    """Return the versions key of already read version rows, see get_versions_key."""
+    exclude = exclude or []
+    rows = sorted(
+        (v.source, v.version, str(v.import_date))
+        for v in version_rows
+        if (sources is None or v.source in sources) and v.source not in exclude
+    )
+    return hashlib.sha1(json.dumps(rows).encode()).hexdigest()[:12]
+
+
+def make_key(*parts) -> str:
+    """Return a cache key for the JSON-serializable parts, e.g. source, CUIs and filters."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _encode(ids: list[int]) -> bytes:
+    """Serialize a list of integer IDs."""
+    return np.asarray(ids, dtype=np.int64).tobytes()
+
+
+def _decode(value: bytes) -> list[int]:
+    """Deserialize a list of integer IDs."""
+    return np.frombuffer(value, dtype=np.int64).tolist()
+
+
+class ResultCache(ABC):
+    """An abstract base class for caches of serialized ID lists.
+
+    A cache is cleared whenever the DB versions change.
+    """
+
+    def get(self, key: str) -> list[int] | None:
+        """Return the cached IDs for the key, if present and not expired."""
+        value = self._get(key)
+        return None if value is None else _decode(value)
+
+    def set(self, key: str, ids: list[int]) -> None:
+        """Cache the IDs for the key."""
+        self._set(key, _encode(ids))
+
+    @abstractmethod
+    def validate(self, versions_key: str) -> None:
+        """Clear the cache if it holds results for other versions of the DB."""
+        pass
+
+    def close(self) -> None:
+        """Release the resources held by the cache."""
+
+    @abstractmethod
+    def _get(self, key: str) -> bytes | None:
+        """Return the serialized IDs for the key, if present and not expired."""
+        pass
+
+    @abstractmethod
+    def _set(self, key: str, value: bytes) -> None:
+        """Cache the serialized IDs for the key."""
+        pass
+
+
+class MemoryResultCache(ResultCache):
+    """A result cache within the process, bounded by the total size of the cached values."""
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        """Create an empty cache."""
+        self.cache: TTLCache = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=len)
+        self.versions_key: str | None = None
+        self.lock = threading.Lock()
+
+    def validate(self, versions_key: str) -> None:
+        """Clear the cache if it holds results for other versions of the DB."""
+        with self.lock:
+            if versions_key != self.versions_key:
+                self.cache.clear()
+                self.versions_key = versions_key
+
+    def _get(self, key: str) -> bytes | None:
+        with self.lock:
+            return self.cache.get(key)
+
+    def _set(self, key: str, value: bytes) -> None:
+        if len(value) > self.cache.maxsize:
+            return
+        with self.lock:
+            self.cache[key] = value
+
+
+class SqliteResultCache(ResultCache):
+    """A result cache in a SQLite file in WAL mode that all worker processes share.
+
+    Entries expire after ttl seconds, the least recently used ones are evicted once the
+    cached values exceed max_bytes. Access times are only refreshed if they are older than
+    touch_interval seconds, so most hits do not write.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_bytes: int,
+        ttl: float,
+        timeout: float = 30.0,
+        touch_interval: float = 60.0,
+    ) -> None:
+        """Open the cache file, creating it if needed."""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS result (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_result_last_access ON result (last_access)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # each connection is only used by its thread, but closed by the one calling close
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def validate(self, versions_key: str) -> None:
+        """Clear the cache if it holds results for other versions of the DB."""
+        connection = self._connection
+        row = connection.execute(
+            "SELECT value FROM meta WHERE name = 'versions'"
+        ).fetchone()
+        if row is not None and row[0] == versions_key:
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE name = 'versions'"
+            ).fetchone()
+            if row is None or row[0] != versions_key:
+                logger.info(f"Clearing result cache {self.path} for versions {versions_key}")
+                connection.execute("DELETE FROM result")
+                connection.execute(
+                    "REPLACE INTO meta (name, value) VALUES ('versions', ?)",
+                    (versions_key,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _get(self, key: str) -> bytes | None:
+        now = time.time()
+        connection = self._connection
+        row = connection.execute(
+            "SELECT value, last_access FROM result WHERE key = ? AND created > ?",
+            (key, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        value, last_access = row
+        if last_access < now - self.touch_interval:
+            connection.execute(
+                "UPDATE result SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return value
+
+    def _set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM result WHERE created <= ?", (now - self.ttl,))
+            connection.execute(
+                "REPLACE INTO result (key, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            (total,) = connection.execute(
+                "SELECT coalesce(sum(size), 0) FROM result"
+            ).fetchone()
+            while total > self.max_bytes:
+                key_evicted, size = connection.execute(
+                    "SELECT key, size FROM result ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                connection.execute("DELETE FROM result WHERE key = ?", (key_evicted,))
+                total -= size
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        """Close the connections of all threads."""
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+def create_result_cache(
+    backend: str,
+    max_bytes: int,
+    ttl: float,
+    path: str | Path | None = None,
+    touch_interval: float = 60.0,
+) -> ResultCache:
+    """Return a result cache with the given backend ("memory" or "sqlite")."""
+    if backend == "memory":
+        return MemoryResultCache(max_bytes, ttl)
+    if backend == "sqlite":
+        if path is None:
+            raise ValueError("The sqlite result cache requires a path")
+        return SqliteResultCache(path, max_bytes, ttl, touch_interval=touch_interval)
+    raise ValueError(f"Unknown result cache backend {backend}")
@@ -0,0 +1,171 @@
+"""A module containing read-only lookup structures shared by all API worker processes."""
+
+import json
+import logging
+import os
+import shutil
+from collections.abc import Iterator, Mapping
+from configparser import ConfigParser
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from api.concept_index import load_concept_index
+from api.concept_store import ConceptStore, warm_up
+from api.models import UmlsConceptParser
+from api.queries import ggponc
+from api.result_cache import get_versions_key
+from integration.umls.parser import MetaThesaurusParser
+from integration.umls.relationship_mapping import RelationshipMapper
+
+logger = logging.getLogger(__name__)
+
+CUI_SET_MAP_ARRAYS = ("cuis", "offsets", "label_idx")
+CUI_SET_MAP_LABELS_FILE = "labels.json"
+CPG_MAP_NAMES = ("population", "intervention", "intervention_recommended")
+
+
+class CuiSetMap(Mapping[str, set[str]]):
+    """A read-only mapping of CUIs to sets of labels (e.g. GGPONC IDs) backed by flat arrays.
+
+    The labels of cuis[i] are labels[label_idx[offsets[i]:offsets[i + 1]]]. Loaded maps are
+    memory-mapped, so all worker processes share a single copy through the page cache.
+    """
+
+    def __init__(
+        self,
+        cuis: np.ndarray,
+        offsets: np.ndarray,
+        label_idx: np.ndarray,
+        labels: list[str],
+    ) -> None:
+        """Create a map from its arrays."""
+        self.cuis = cuis
+        self.offsets = offsets
+        self.label_idx = label_idx
+        self.labels = labels
+
+    @classmethod
+    def from_dict(cls, mapping: Mapping[str | None, set[str]]) -> "CuiSetMap":
+        """Compile a map from a dictionary, dropping the None key."""
+        items = sorted((k, v) for k, v in mapping.items() if k is not None)
+        labels = sorted(set().union(*(v for _, v in items)))
+        positions = {label: i for i, label in enumerate(labels)}
+        offsets = np.zeros(len(items) + 1, dtype=np.int64)
+        np.cumsum([len(v) for _, v in items], out=offsets[1:])
+        label_idx = np.array(
+            [positions[label] for _, v in items for label in sorted(v)],
+            dtype=np.int32,
+        )
+        cuis = np.array([k for k, _ in items], dtype="S")
+        return cls(cuis, offsets, label_idx, labels)
+
+    def save(self, path: Path) -> None:
+        """Save the map to the directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name in CUI_SET_MAP_ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        with open(path / CUI_SET_MAP_LABELS_FILE, "w") as fh:
+            json.dump(self.labels, fh)
+
+    @classmethod
+    def load(cls, path: Path) -> "CuiSetMap":
+        """Memory-map a map saved to the directory."""
+        arrays = [
+            np.load(path / f"{name}.npy", mmap_mode="r") for name in CUI_SET_MAP_ARRAYS
+        ]
+        with open(path / CUI_SET_MAP_LABELS_FILE, "r") as fh:
+            labels = json.load(fh)
+        return cls(*arrays, labels=labels)
+
+    def __getitem__(self, cui: str) -> set[str]:
+        """Return the labels of the CUI."""
+        if not isinstance(cui, str):
+            raise KeyError(cui)
+        key = cui.encode("ascii", errors="replace")
+        i = int(np.searchsorted(self.cuis, key))
+        if i == len(self.cuis) or self.cuis[i] != key:
+            raise KeyError(cui)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return {self.labels[j] for j in self.label_idx[start:end]}
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the CUIs."""
+        return (cui.decode("ascii") for cui in self.cuis)
+
+    def __len__(self) -> int:
+        """Return the number of CUIs."""
+        return len(self.cuis)
+
+    def all_labels(self) -> set[str]:
+        """Return the union of the labels of all CUIs."""
+        return {self.labels[j] for j in np.unique(self.label_idx)}
+
+
+def load_cpg_maps(session: Session, cache_dir: str | Path) -> dict[str, CuiSetMap]:
+    """Return the memory-mapped CUI->CPG maps, building them from the DB if needed.
+
+    The maps are stored per GGPONC version, so a reload of GGPONC invalidates them.
+    The directory is renamed into place atomically, so concurrent workers never read
+    a partially written map.
+    """
+    ggponc_key = get_versions_key(session, ["ggponc"])
+    path = Path(cache_dir) / f"cpg_maps_{ggponc_key}"
+    if not path.exists():
+        logger.info(f"Building CUI->CPG maps at {path}")
+        mappings = {
+            "population": ggponc.get_population_to_guideline_mapping(session),
+            "intervention": ggponc.get_intervention_to_guideline_mapping(session),
+            "intervention_recommended": ggponc.get_intervention_to_guideline_mapping(
+                session, recommended_only=True
+            ),
+        }
+        tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        for name, mapping in mappings.items():
+            CuiSetMap.from_dict(mapping).save(tmp_path / name)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another worker finished first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    return {name: CuiSetMap.load(path / name) for name in CPG_MAP_NAMES}
+
+
+def create_concept_parser(
+    config: ConfigParser, session: Session, umls_parser: MetaThesaurusParser
+) -> UmlsConceptParser:
+    """Return a concept parser on the shared CUI->CPG maps and concept store."""
+    server_config = config["Server"]
+    cpg_maps = load_cpg_maps(session, server_config["shared_dir"])
+    ggponc_key = get_versions_key(session, ["ggponc"])
+    concept_store = ConceptStore(
+        server_config["concept_store"],
+        namespace=f"{umls_parser.version}-{ggponc_key}",
+        maxsize=server_config.getint("concept_store_size"),
+        touch_interval=server_config.getfloat("concept_store_touch_interval"),
+    )
+    return UmlsConceptParser(
+        umls_parser=umls_parser,
+        concept_store=concept_store,
+        cui_to_cpg_map_population=cpg_maps["population"],
+        cui_to_cpg_map_intervention=cpg_maps["intervention"],
+        cui_to_cpg_map_intervention_recommended=cpg_maps["intervention_recommended"],
+    )
+
+
+def prepare_shared_artifacts(config: ConfigParser, session: Session) -> None:
+    """Build all shared lookup structures once, before worker processes are started."""
+    umls_parser = MetaThesaurusParser(**config["MetaThesaurusParser"])
+    umls_parser.artifact
+    relationship_mapper = RelationshipMapper(
+        umls_parser=umls_parser, **config["RelationshipMapper"]
+    )
+    relationship_mapper.graph_broad2narrow
+    relationship_mapper.graph_narrow2broad
+    concept_parser = create_concept_parser(config, session, umls_parser)
+    if config["Server"].getboolean("concept_index"):
+        load_concept_index(session, config["Server"]["shared_dir"])
+    if config["Server"].getboolean("warm_up_concepts"):
+        warm_up(concept_parser, session)
+    concept_parser.close()
@@ -0,0 +1,63 @@
+"""A module containing helpers for bulk-loading rows through SQLAlchemy Core."""
+
+import pandas as pd
+from sqlalchemy import Table, func, insert, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.engine import Connection
+
+
+def next_primary_key(connection: Connection, table: Table) -> int:
+    """Return the first unused value of the table's integer primary key."""
+    max_id = connection.execute(select(func.max(table.c.id))).scalar()
+    return (max_id or 0) + 1
+
+
+def frame_to_records(df: pd.DataFrame) -> list[dict]:
+    """Convert a DataFrame to a list of row dicts with missing values set to None."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def insert_frame(
+    connection: Connection, table: Table, df: pd.DataFrame, chunk_size: int = 10000
+) -> None:
+    """Insert the rows of a DataFrame into the table using executemany INSERTs.
+
+    Only columns that exist in the table are written.
+    """
+    if df.empty:
+        return
+    columns = [c.name for c in table.columns if c.name in df.columns]
+    records = frame_to_records(df[columns])
+    for start in range(0, len(records), chunk_size):
+        connection.execute(insert(table), records[start : start + chunk_size])
+
+
+def upsert_frame(
+    connection: Connection, table: Table, df: pd.DataFrame, chunk_size: int = 10000
+) -> None:
+    """Insert the rows of a DataFrame, updating rows that already exist with the same primary key.
+
+    Uses `INSERT ... ON DUPLICATE KEY UPDATE` on MySQL and `INSERT ... ON CONFLICT` on SQLite.
+    """
+    if df.empty:
+        return
+    columns = [c.name for c in table.columns if c.name in df.columns]
+    update_columns = [c for c in columns if c not in table.primary_key.columns]
+    if connection.dialect.name == "mysql":
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            {c: stmt.inserted[c] for c in update_columns}
+        )
+    elif connection.dialect.name == "sqlite":
+        stmt = sqlite.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    else:
+        raise NotImplementedError(
+            f"Upserts are not implemented for dialect {connection.dialect.name}"
+        )
+    records = frame_to_records(df[columns])
+    for start in range(0, len(records), chunk_size):
+        connection.execute(stmt, records[start : start + chunk_size])
@@ -29,3 +29,10 @@ def parse_config_list(cfg_value: str | list[str]) -> list[str]:
     elif isinstance(cfg_value, list):
         out = cfg_value
     return out
+
+
+def parse_config_bool(cfg_value: str | bool) -> bool:
+    """Parse a boolean field string from the config file to a Python bool."""
+    if isinstance(cfg_value, bool):
+        return cfg_value
+    return cfg_value.strip().lower() in ("true", "yes", "1", "on")
@@ -0,0 +1,143 @@
+"""Module for denormalizing the concepts of all evidence into one table for fast matching."""
+
+import datetime
+import hashlib
+import json
+import logging
+
+from sqlalchemy import (
+    CompoundSelect,
+    Engine,
+    Integer,
+    Select,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    union,
+)
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+from integration.orm import aact, civic, pubmed
+from integration.orm.evidence_concept import (
+    EVIDENCE_CONCEPT_VERSION_SOURCE,
+    EvidenceConcept,
+    create_metadata,
+)
+from integration.orm.versions import Version
+
+logger = logging.getLogger(__name__)
+
+# the sources whose concepts are denormalized
+EVIDENCE_CONCEPT_SOURCES = ["civic", "clinicaltrials", "pubmed"]
+
+
+def get_source_versions_key(session: Session) -> str:
+    """Return a key that changes whenever one of the denormalized sources is (re)loaded."""
+    return make_source_versions_key(list(session.scalars(select(Version))))
+
+
+def make_source_versions_key(version_rows: list[Version]) -> str:
+    """Return the source versions key of already read version rows."""
+    rows = sorted(
+        (v.source, v.version, str(v.import_date))
+        for v in version_rows
+        if v.source in EVIDENCE_CONCEPT_SOURCES
+    )
+    return hashlib.sha1(json.dumps(rows).encode()).hexdigest()[:12]
+
+
+def _select_concepts(
+    source: str,
+    role: str,
+    trial_id_col: InstrumentedAttribute,
+    cui_col: InstrumentedAttribute,
+) -> Select:
+    """Return a Select statement of the distinct concepts of the role as evidence_concept rows."""
+    return (
+        select(
+            literal(source),
+            literal(role),
+            cast(func.substr(cui_col, 2), Integer),
+            trial_id_col,
+        )
+        .where(cui_col.like("C%"), func.length(cui_col) == 8)
+        .distinct()
+    )
+
+
+def _concept_selects() -> list[Select | CompoundSelect]:
+    """Return the Select statements of the concepts of all sources and roles."""
+    return [
+        _select_concepts(
+            "pubmed", "population", pubmed.UmlsPopulation.trial_id, pubmed.UmlsPopulation.cui
+        ),
+        _select_concepts(
+            "pubmed",
+            "intervention",
+            pubmed.UmlsIntervention.trial_id,
+            pubmed.UmlsIntervention.cui,
+        ),
+        _select_concepts("pubmed", "mesh", pubmed.MeshTerm.trial_id, pubmed.MeshTerm.cui),
+        _select_concepts(
+            "clinicaltrials",
+            "population",
+            aact.MeshCondition.trial_id,
+            aact.MeshCondition.cui,
+        ),
+        _select_concepts(
+            "clinicaltrials",
+            "intervention",
+            aact.MeshIntervention.trial_id,
+            aact.MeshIntervention.cui,
+        ),
+        union(
+            _select_concepts(
+                "civic", "population", civic.Evidence.id, civic.Evidence.disease_cui
+            ),
+            _select_concepts(
+                "civic", "population", civic.Phenotype.evidence_id, civic.Phenotype.cui
+            ),
+        ),
+        _select_concepts(
+            "civic", "intervention", civic.Therapy.evidence_id, civic.Therapy.cui
+        ),
+    ]
+
+
+class EvidenceConceptBuilder:
+    """Denormalize the concepts of all evidence into the nge_evidence_concept table."""
+
+    def __init__(self, engine: Engine):
+        """Initialize the builder."""
+        self.engine = engine
+
+    def build(self) -> None:
+        """Rebuild the table and tag it with the versions of the sources it was built from.
+
+        The version row is removed before the table is dropped, so the API does not use the
+        evidence concepts while they are rebuilt.
+        """
+        logger.info("Denormalizing evidence concepts...")
+        with Session(self.engine) as session:
+            session.execute(
+                delete(Version).where(Version.source == EVIDENCE_CONCEPT_VERSION_SOURCE)
+            )
+            session.commit()
+        create_metadata(self.engine, drop_existing=True)
+        columns = ["source", "role", "cui_int", "trial_id"]
+        with Session(self.engine) as session:
+            for query in _concept_selects():
+                session.execute(insert(EvidenceConcept).from_select(columns, query))
+            session.merge(
+                Version(
+                    source=EVIDENCE_CONCEPT_VERSION_SOURCE,
+                    version=get_source_versions_key(session),
+                    import_date=datetime.datetime.now(),
+                )
+            )
+            session.commit()
+            n_rows = session.scalar(select(func.count()).select_from(EvidenceConcept))
+        logger.info(f"Denormalized {n_rows} evidence concepts.")
@@ -5,8 +5,10 @@ import sys
 
 from integration.config import load_config
 from integration.db import get_engine
+from integration.denormalization import EvidenceConceptBuilder
 from integration.erd import create_erd
 from integration.flagging import SignificanceFlagger
+from integration.sources import Source
 from integration.sources.aact import Aact
 from integration.sources.civic import Civic
 from integration.sources.ggponc import Ggponc
@@ -15,6 +17,7 @@ from integration.sources.ggponc_literature import GgponcLiterature
 from integration.umls.normalization import Normalizer
 from integration.umls.parser import MetaThesaurusParser
 from integration.umls.relationship_mapping import RelationshipMapper
+from integration.staging import STAGING_SCHEMA
 import argparse
 from pathlib import Path
 
@@ -26,15 +29,29 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 VALID_SOURCES = [
+    "closure",
     "ggponc",
     "civic",
     "pubmed",
     "pubmed_update",
     "aact",
+    "aact_update",
     "literature",
     "flags",
+    "evidence_concepts",
 ]
 
+# sources whose reload requires denormalizing the evidence concepts again
+DENORMALIZED_SOURCES = ["civic", "pubmed", "pubmed_update", "aact", "aact_update"]
+
+
+def reload_source(source: Source, staged: bool, staging_schema: str) -> None:
+    """Fully reload a source, either in place or through a staging schema."""
+    if staged:
+        source.parse_staged(staging_schema)
+    else:
+        source.parse(drop_existing=True)
+
 
 def main() -> None:
     """Run the complete data integration logic."""
@@ -50,6 +67,12 @@ def main() -> None:
         help=f"Valid sources are {VALID_SOURCES} or 'all' to download all sources.",
     )
     parser.add_argument("--file", type=str, help="Update file path")
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help="Load full reloads into a staging schema and swap them in when done, "
+        "keeping the live tables available during the load.",
+    )
 
     args = parser.parse_args()
     sources = args.sources
@@ -64,6 +87,7 @@ def main() -> None:
 
     cfg = load_config("config.ini")
     engine = get_engine(cfg["DB"]["url"])
+    staging_schema = cfg["DB"].get("staging_schema", STAGING_SCHEMA)
 
     umls_parser = MetaThesaurusParser(**cfg["MetaThesaurusParser"])
     norm = Normalizer(umls_parser=umls_parser, **cfg["Normalizer"])
@@ -71,33 +95,41 @@ def main() -> None:
         umls_parser=umls_parser, **cfg["RelationshipMapper"]
     )
 
+    if "closure" in sources:
+        relationship_mapper.build_closure_index()
+
     if "ggponc" in sources:
         gg = Ggponc(
             **cfg["GGPONC"], relationship_mapper=relationship_mapper, engine=engine
         )
         gg.download()
-        gg.parse(drop_existing=True)
+        reload_source(gg, args.staged, staging_schema)
 
     if "civic" in sources:
         cv = Civic(normalizer=norm, engine=engine)
         cv.download()
-        cv.parse(drop_existing=True)
+        reload_source(cv, args.staged, staging_schema)
 
     if "pubmed" in sources:
         pm = Pubmed(**cfg["Pubmed"], normalizer=norm, engine=engine)
         pm.download()
-        pm.parse(drop_existing=True)
+        reload_source(pm, args.staged, staging_schema)
 
     if "pubmed_update" in sources:
         pm = Pubmed(**cfg["Pubmed"], normalizer=norm, engine=engine)
         assert file is not None, "Please provide a file path for the update"
         pm.downloaded_files = [Path(file)]
-        pm.parse(drop_existing=False)
+        pm.update()
 
     if "aact" in sources:
         ct = Aact(**cfg["AACT"], normalizer=norm, engine=engine)
         ct.download()
-        ct.parse(drop_existing=True)
+        reload_source(ct, args.staged, staging_schema)
+
+    if "aact_update" in sources:
+        ct = Aact(**cfg["AACT"], normalizer=norm, engine=engine)
+        ct.download()
+        ct.refresh()
 
     if "literature" in sources:
         lit = GgponcLiterature(**cfg["GGPONC"], engine=engine)
@@ -110,6 +142,12 @@ def main() -> None:
         flagger.flag_civic()
         flagger.flag_pubmed()
 
+    # denormalize the concepts of all evidence after loading any of them
+    if "evidence_concepts" in sources or any(
+        s in sources for s in DENORMALIZED_SOURCES
+    ):
+        EvidenceConceptBuilder(engine=engine).build()
+
     # create the Entity-Relation Diagram
     # create_erd("erd.png", engine=engine)
 
@@ -5,7 +5,7 @@ from typing import Optional
 
 from sqlalchemy import ForeignKey, String, Text
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, query_expression, relationship
 
 from integration.orm.base import Base
 
@@ -76,6 +76,9 @@ class Trial(Base):
         back_populates="trial"
     )
 
+    # True if an outcome has analyses, only loaded by queries that request it
+    results_available: Mapped[Optional[bool]] = query_expression()
+
 
 class Reference(Base):
     """ORM class that represents references to Pubmed."""
@@ -250,22 +253,22 @@ class Flags(Base):
     )
 
 
+TABLES = [
+    Trial.__table__,
+    Reference.__table__,
+    MeshCondition.__table__,
+    MeshIntervention.__table__,
+    Eligibility.__table__,
+    Condition.__table__,
+    Intervention.__table__,
+    Outcome.__table__,
+    OutcomeAnalyses.__table__,
+    Flags.__table__,
+]
+
+
 def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
     """Create the schema defined by the classes in this module."""
     if drop_existing:
-        Base.metadata.drop_all(
-            engine,
-            tables=[
-                Trial.__table__,
-                Reference.__table__,
-                MeshCondition.__table__,
-                MeshIntervention.__table__,
-                Eligibility.__table__,
-                Condition.__table__,
-                Intervention.__table__,
-                Outcome.__table__,
-                OutcomeAnalyses.__table__,
-                Flags.__table__,
-            ],
-        )
+        Base.metadata.drop_all(engine, tables=TABLES)
     Base.metadata.create_all(engine)
@@ -0,0 +1,33 @@
+"""A module for modeling the change log of incremental source updates."""
+
+import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapped, mapped_column
+
+from integration.orm.base import Base
+
+
+class Change(Base):
+    """ORM class that records a record inserted, updated or deleted by an incremental update."""
+
+    __tablename__ = "nge_change"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    source: Mapped[str] = mapped_column(String(100), index=True)
+    record_id: Mapped[str] = mapped_column(String(512), index=True)
+    change_type: Mapped[str] = mapped_column(String(16))
+    version: Mapped[str] = mapped_column(String(512))
+    changed_at: Mapped[datetime.datetime] = mapped_column(DateTime(), index=True)
+
+
+TABLES = [
+    Change.__table__,
+]
+
+
+def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
+    """Create the schema defined by the classes in this module."""
+    if drop_existing:
+        Base.metadata.drop_all(engine, tables=TABLES)
+    Base.metadata.create_all(engine)
@@ -170,19 +170,19 @@ class Flags(Base):
     )
 
 
+TABLES = [
+    Assertion.__table__,
+    Therapy.__table__,
+    Phenotype.__table__,
+    Evidence.__table__,
+    Source.__table__,
+    ClinicalTrial.__table__,
+    Flags.__table__,
+]
+
+
 def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
     """Create the schema defined by the classes in this module."""
     if drop_existing:
-        Base.metadata.drop_all(
-            engine,
-            tables=[
-                Assertion.__table__,
-                Therapy.__table__,
-                Phenotype.__table__,
-                Evidence.__table__,
-                Source.__table__,
-                ClinicalTrial.__table__,
-                Flags.__table__,
-            ],
-        )
+        Base.metadata.drop_all(engine, tables=TABLES)
     Base.metadata.create_all(engine)
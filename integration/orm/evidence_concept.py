@@ -0,0 +1,42 @@
+"""A module for modeling the concepts of all evidence denormalized into one table."""
+
+from sqlalchemy import Index, String
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapped, mapped_column
+
+from integration.orm.base import Base
+
+# name of the nge_version row recording the source versions the table was built from
+EVIDENCE_CONCEPT_VERSION_SOURCE = "evidence_concept"
+
+
+class EvidenceConcept(Base):
+    """ORM class that represents a concept mentioned by a piece of evidence.
+
+    cui_int is the CUI without its leading C as integer. The primary key covers the lookup
+    of the evidence by source, role and CUI.
+    """
+
+    __tablename__ = "nge_evidence_concept"
+    source: Mapped[str] = mapped_column(String(32), primary_key=True)
+    role: Mapped[str] = mapped_column(String(16), primary_key=True)
+    cui_int: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    trial_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+
+    __table_args__ = (
+        Index(
+            "ix_nge_evidence_concept_trial", "source", "trial_id", "role", "cui_int"
+        ),
+    )
+
+
+TABLES = [
+    EvidenceConcept.__table__,
+]
+
+
+def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
+    """Create the schema defined by the classes in this module."""
+    if drop_existing:
+        Base.metadata.drop_all(engine, tables=TABLES)
+    Base.metadata.create_all(engine)
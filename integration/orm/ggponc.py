@@ -138,18 +138,18 @@ class SubPopulation(Base):
     ] = relationship(back_populates="sub_populations")
 
 
+TABLES = [
+    Guideline.__table__,
+    TextBlock.__table__,
+    Entity.__table__,
+    SuperConcept.__table__,
+    Population.__table__,
+    SubPopulation.__table__,
+]
+
+
 def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
     """Create the schema defined by the classes in this module."""
     if drop_existing:
-        Base.metadata.drop_all(
-            engine,
-            tables=[
-                Guideline.__table__,
-                TextBlock.__table__,
-                Entity.__table__,
-                SuperConcept.__table__,
-                Population.__table__,
-                SubPopulation.__table__,
-            ],
-        )
+        Base.metadata.drop_all(engine, tables=TABLES)
     Base.metadata.create_all(engine)
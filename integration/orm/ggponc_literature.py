@@ -14,13 +14,14 @@ class GgponcLiteratureReference(Base):
     title: Mapped[str] = mapped_column(Text())
     pm_id: Mapped[int] = mapped_column(nullable=True)
 
+
+TABLES = [
+    GgponcLiteratureReference.__table__,
+]
+
+
 def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
     """Create the schema defined by the classes in this module."""
     if drop_existing:
-        Base.metadata.drop_all(
-            engine,
-            tables=[
-                GgponcLiteratureReference.__table__,
-            ],
-        )
+        Base.metadata.drop_all(engine, tables=TABLES)
     Base.metadata.create_all(engine)
\ No newline at end of file
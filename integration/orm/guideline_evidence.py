@@ -0,0 +1,67 @@
+"""A module for modeling evidence materialized per guideline for fast filtering."""
+
+import datetime
+from typing import Optional
+
+from sqlalchemy import Index, String
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapped, mapped_column
+
+from integration.orm.base import Base
+
+# name of the nge_version row recording the source versions the materialization was built from
+MATERIALIZATION_VERSION_SOURCE = "guideline_evidence"
+# the sources whose evidence is materialized, i.e., those /trialsearch searches by default
+MATERIALIZED_SOURCES = ["civic", "clinicaltrials", "pubmed"]
+
+
+class GuidelineEvidence(Base):
+    """ORM class that represents evidence found for a guideline with its filterable attributes.
+
+    Rows are ordered by position within each guideline and source, i.e., newest sort_date
+    first and then by descending evidence_id. phases is a bitmask of the potential study
+    phases (bit n set for phase n).
+    """
+
+    __tablename__ = "nge_guideline_evidence"
+    guideline_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    source: Mapped[str] = mapped_column(String(32), primary_key=True)
+    position: Mapped[int] = mapped_column(primary_key=True)
+    evidence_id: Mapped[int] = mapped_column()
+    sort_date: Mapped[Optional[datetime.date]] = mapped_column(nullable=True)
+
+    sample_size: Mapped[Optional[int]] = mapped_column(nullable=True)
+    publication_year: Mapped[Optional[int]] = mapped_column(nullable=True)
+    start_year: Mapped[Optional[int]] = mapped_column(nullable=True)
+    phases: Mapped[int] = mapped_column(default=0)
+    is_rct: Mapped[Optional[bool]] = mapped_column(nullable=True)
+    results_available: Mapped[Optional[bool]] = mapped_column(nullable=True)
+    has_significant_finding: Mapped[Optional[bool]] = mapped_column(nullable=True)
+    has_pediatric_population: Mapped[bool] = mapped_column()
+    has_unknown_intervention: Mapped[bool] = mapped_column()
+    has_known_intervention: Mapped[bool] = mapped_column()
+    has_not_recommended_intervention: Mapped[bool] = mapped_column()
+    has_recommended_intervention: Mapped[bool] = mapped_column()
+
+    __table_args__ = (
+        Index("ix_nge_guideline_evidence_year", "guideline_id", "publication_year"),
+        Index(
+            "ix_nge_guideline_evidence_keyset",
+            "guideline_id",
+            "source",
+            "sort_date",
+            "evidence_id",
+        ),
+    )
+
+
+TABLES = [
+    GuidelineEvidence.__table__,
+]
+
+
+def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
+    """Create the schema defined by the classes in this module."""
+    if drop_existing:
+        Base.metadata.drop_all(engine, tables=TABLES)
+    Base.metadata.create_all(engine)
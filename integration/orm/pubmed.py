@@ -3,7 +3,7 @@
 import datetime
 from typing import Optional
 
-from sqlalchemy import ForeignKey, String, Text, Integer
+from sqlalchemy import ForeignKey, String, Text, Integer, inspect, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -26,6 +26,7 @@ class Trial(Base):
     num_randomized: Mapped[Optional[int]]
     journal: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
     ftp_fn: Mapped[str] = mapped_column(String(512))
+    content_hash: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
 
     publication_types: Mapped[
         Optional[list["integration.orm.pubmed.PublicationType"]]  # noqa: F821
@@ -287,24 +288,45 @@ class Flags(Base):
     )
 
 
+TABLES = [
+    Trial.__table__,
+    Doi.__table__,
+    PublicationType.__table__,
+    Reference.__table__,
+    Population.__table__,
+    Intervention.__table__,
+    Outcome.__table__,
+    MeshTerm.__table__,
+    UmlsPopulation.__table__,
+    UmlsIntervention.__table__,
+    UmlsOutcome.__table__,
+    Flags.__table__,
+]
+
+
 def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
     """Create the schema defined by the classes in this module."""
     if drop_existing:
-        Base.metadata.drop_all(
-            engine,
-            tables=[
-                Trial.__table__,
-                Doi.__table__,
-                PublicationType.__table__,
-                Reference.__table__,
-                Population.__table__,
-                Intervention.__table__,
-                Outcome.__table__,
-                MeshTerm.__table__,
-                UmlsPopulation.__table__,
-                UmlsIntervention.__table__,
-                UmlsOutcome.__table__,
-                Flags.__table__,
-            ],
-        )
+        Base.metadata.drop_all(engine, tables=TABLES)
     Base.metadata.create_all(engine)
+    _add_content_hash_column(engine)
+
+
+def _add_content_hash_column(engine: Engine) -> None:
+    """Add the content_hash column to a pm_trial table created before it existed.
+
+    The trials loaded before have no hash, so the next update rewrites each of them once.
+    """
+    column = Trial.__table__.c.content_hash
+    existing = {c["name"] for c in inspect(engine).get_columns(Trial.__tablename__)}
+    if column.name in existing:
+        return
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                f"ALTER TABLE {preparer.quote(Trial.__tablename__)} "
+                f"ADD COLUMN {preparer.quote(column.name)} "
+                f"{column.type.compile(dialect=engine.dialect)}"
+            )
+        )
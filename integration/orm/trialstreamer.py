@@ -163,20 +163,20 @@ class Flags(Base):
     )
 
 
+TABLES = [
+    Trial.__table__,
+    Population.__table__,
+    Intervention.__table__,
+    Outcome.__table__,
+    MeshPopulation.__table__,
+    MeshIntervention.__table__,
+    MeshOutcome.__table__,
+    Flags.__table__,
+]
+
+
 def create_metadata(engine: Engine, drop_existing: bool = False) -> None:
     """Create the schema defined by the classes in this module."""
     if drop_existing:
-        Base.metadata.drop_all(
-            engine,
-            tables=[
-                Trial.__table__,
-                Population.__table__,
-                Intervention.__table__,
-                Outcome.__table__,
-                MeshPopulation.__table__,
-                MeshIntervention.__table__,
-                MeshOutcome.__table__,
-                Flags.__table__,
-            ],
-        )
+        Base.metadata.drop_all(engine, tables=TABLES)
     Base.metadata.create_all(engine)
@@ -1,11 +1,12 @@
 """A module for parsing DB dumps from AACT."""
 
-from collections import OrderedDict
 from pathlib import Path
-from typing import Callable, Iterator
+from typing import Callable, Iterable, Iterator
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from tqdm.auto import tqdm
 
 from integration.orm.aact import (
@@ -23,6 +24,17 @@ from integration.orm.aact import (
 from integration.parsers import Parser, utils
 from integration.umls.normalization import Normalizer
 
+AACT_SUBTABLE_KEYS = {
+    "references": "nct_id",
+    "eligibilities": "nct_id",
+    "conditions": "nct_id",
+    "interventions": "nct_id",
+    "mesh_conditions": "nct_id",
+    "mesh_interventions": "nct_id",
+    "outcome_analyses": "outcome_id",
+    "outcomes": "nct_id",
+}
+
 AACT_REQUIRED_FILES = {
     "studies": "studies.txt",
     "summaries": "brief_summaries.txt",
@@ -60,6 +72,96 @@ AACT_REQUIRED_STUDY_COLS = [
     "results_first_posted_date_type",
 ]
 
+AACT_STUDY_DATE_COLS = [
+    "start_date",
+    "completion_date",
+    "last_update_posted_date",
+    "results_first_posted_date",
+]
+
+# pandas dtypes for the columns read from each file, None keeps the inferred dtype;
+# low-cardinality columns are categoricals and free text is stored in Arrow buffers
+_CATEGORY = "category"
+_TEXT = "string[pyarrow]"
+# read with the inferred dtype and coerced to float64, non-numeric values become NaN
+_NUMERIC = "numeric"
+
+AACT_FILE_COLUMNS: dict[str, dict[str, str | None]] = {
+    "studies": {
+        "nct_id": None,
+        "brief_title": _TEXT,
+        "official_title": _TEXT,
+        "study_type": _CATEGORY,
+        "acronym": _TEXT,
+        "overall_status": _CATEGORY,
+        "why_stopped": _TEXT,
+        "enrollment": None,
+        "enrollment_type": _CATEGORY,
+        "phase": _CATEGORY,
+        "number_of_groups": None,
+        "number_of_arms": None,
+        "start_date": None,
+        "start_date_type": _CATEGORY,
+        "completion_date": None,
+        "completion_date_type": _CATEGORY,
+        "last_update_posted_date": None,
+        "last_update_posted_date_type": _CATEGORY,
+        "results_first_posted_date": None,
+        "results_first_posted_date_type": _CATEGORY,
+    },
+    "summaries": {"nct_id": None, "description": _TEXT},
+    "descriptions": {"nct_id": None, "description": _TEXT},
+    "eligibilities": {
+        "nct_id": None,
+        "gender": _CATEGORY,
+        "minimum_age": _CATEGORY,
+        "maximum_age": _CATEGORY,
+        "healthy_volunteers": _CATEGORY,
+        "population": _TEXT,
+        "criteria": _TEXT,
+    },
+    "conditions": {"nct_id": None, "name": _TEXT},
+    "interventions": {
+        "nct_id": None,
+        "intervention_type": _CATEGORY,
+        "name": _TEXT,
+        "description": _TEXT,
+    },
+    "outcomes": {
+        "id": None,
+        "nct_id": None,
+        "outcome_type": _CATEGORY,
+        "title": _TEXT,
+        "description": _TEXT,
+        "time_frame": _TEXT,
+        "population": _TEXT,
+    },
+    "outcome_analyses": {
+        "nct_id": None,
+        "outcome_id": None,
+        "param_type": _CATEGORY,
+        "param_value": _NUMERIC,
+        "p_value": _NUMERIC,
+        "p_value_modifier": _CATEGORY,
+        "ci_n_sides": _CATEGORY,
+        "ci_percent": _NUMERIC,
+        "ci_lower_limit": _NUMERIC,
+        "ci_upper_limit": _NUMERIC,
+        "method": _CATEGORY,
+    },
+    "mesh_conditions": {
+        "nct_id": None,
+        "downcase_mesh_term": _CATEGORY,
+        "mesh_type": _CATEGORY,
+    },
+    "mesh_interventions": {
+        "nct_id": None,
+        "downcase_mesh_term": _CATEGORY,
+        "mesh_type": _CATEGORY,
+    },
+    "references": {"nct_id": None, "pmid": None, "reference_type": _CATEGORY},
+}
+
 aact_orm_type = (
     Reference
     | Eligibility
@@ -71,13 +173,33 @@ aact_orm_type = (
     | MeshIntervention
 )
 
-aact_lookup_dict_type = dict[
-    str, dict[str, list[aact_orm_type] | dict[int, list[aact_orm_type]]]
-]
+
+class SubtableLookup:
+    """Records of a subtable grouped by a key column, stored as slices of a sorted list."""
+
+    def __init__(self, df: pd.DataFrame, key: str) -> None:
+        """Sort the subtable by key once and precompute the offsets of each group."""
+        df = df.dropna(subset=key).sort_values(key, kind="stable")
+        keys = df[key].to_numpy()
+        unique_keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        self.records: list[dict] = df.to_dict("records")
+        self.offsets: dict = dict(
+            zip(unique_keys.tolist(), zip(starts.tolist(), ends.tolist()))
+        )
+
+    def get(self, key) -> list[dict]:
+        """Return the records belonging to the key."""
+        start, end = self.offsets.get(key, (0, 0))
+        return self.records[start:end]
 
 
 class AactParser(Parser):
-    """A class for parsing the AACT dump into Trial objects."""
+    """A class for parsing the AACT dump into Trial objects.
+
+    Every file is sorted by NCT ID and spilled to a memory-mapped Arrow file, so studies
+    can be processed in chunks that only materialize the subtable rows of their NCT IDs.
+    """
 
     def __init__(
         self,
@@ -85,6 +207,10 @@ class AactParser(Parser):
         normalizer: Normalizer,
         required_files: dict[str, str] = AACT_REQUIRED_FILES,
         required_cols: list[str] = AACT_REQUIRED_STUDY_COLS,
+        file_columns: dict[str, dict[str, str | None]] = AACT_FILE_COLUMNS,
+        csv_engine: str = "c",
+        chunk_size: int = 10000,
+        arrow_dir: Path | None = None,
     ) -> None:
         """Create a new TrialParser instance."""
         self.normalizer = normalizer
@@ -92,7 +218,23 @@ class AactParser(Parser):
             required_files, downloaded_files
         )
         self.required_cols = required_cols
-        self.data: dict[str, pd.DataFrame] = {}
+        self.file_columns = file_columns
+        self.csv_engine = csv_engine
+        self.chunk_size = chunk_size
+        self.arrow_dir = arrow_dir or self.required_files["studies"].parent / "arrow"
+        self.tables: dict[str, pa.Table] = {}
+        self.table_keys: dict[str, np.ndarray] = {}
+        self.subtable_parsers: dict[str, Callable[[dict], aact_orm_type]] = {
+            "references": self._parse_references,
+            "eligibilities": self._parse_eligibilities,
+            "conditions": self._parse_condition,
+            "interventions": self._parse_intervention,
+            "mesh_conditions": self._parse_mesh_conditions,
+            "mesh_interventions": self._parse_mesh_interventions,
+            "outcome_analyses": self._parse_outcome_analyses,
+            "outcomes": self._parse_outcome,
+        }
+        self.lookup_dict: dict[str, SubtableLookup] = {}
         self._read_data_from_files()
 
     @staticmethod
@@ -110,103 +252,100 @@ class AactParser(Parser):
                 raise FileNotFoundError()
         return mapped_files
 
-    @staticmethod
-    def _txt_to_df(txt_file: Path, **kwargs) -> pd.DataFrame:
+    def _txt_to_df(self, txt_file: Path, **kwargs) -> pd.DataFrame:
         """Parse an AACT txt file to a pandas DataFrame."""
-        return pd.read_csv(txt_file, sep="|", low_memory=False, **kwargs)
-
-    def _merge_studies_summaries_descriptions(self) -> None:
-        """Merge summaries and descriptions into the studies table."""
-        df = self.data["studies"].merge(self.data["summaries"], on="nct_id", how="left")
-        self.data["studies"] = df.merge(
-            self.data["descriptions"], on="nct_id", how="left"
+        if self.csv_engine == "pyarrow":
+            # the pyarrow engine reads in parallel and does not support low_memory
+            return pd.read_csv(txt_file, sep="|", engine="pyarrow", **kwargs)
+        return pd.read_csv(
+            txt_file, sep="|", engine=self.csv_engine, low_memory=False, **kwargs
         )
-        self.data.pop("summaries")
-        self.data.pop("descriptions")
 
-    def _cast_to_none(self) -> None:
-        """Ensure all missing values are identified by None."""
-        for name, df in self.data.items():
-            self.data[name] = df.replace([np.nan, pd.NaT, ""], None)
+    def _read_file(self, name: str, path: Path) -> pd.DataFrame:
+        """Read only the required columns of an AACT file with compact dtypes."""
+        columns = self.file_columns[name]
+        if name == "studies":
+            columns = {col: columns.get(col) for col in self.required_cols}
+        dtypes = {
+            col: dtype
+            for col, dtype in columns.items()
+            if dtype is not None and dtype != _NUMERIC
+        }
+        df = self._txt_to_df(path, usecols=list(columns), dtype=dtypes)
+        for col, dtype in columns.items():
+            if dtype == _NUMERIC and col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        # dates are converted after reading, parse_dates mangles nulls with the pyarrow engine
+        for col in AACT_STUDY_DATE_COLS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col])
+        return df
+
+    def _spill_to_arrow(self, name: str, df: pd.DataFrame) -> None:
+        """Write a frame sorted by NCT ID to an Arrow file and memory-map it back."""
+        df = df.dropna(subset="nct_id").sort_values("nct_id", kind="stable")
+        table_path = self.arrow_dir / f"{name}.arrow"
+        keys_path = self.arrow_dir / f"{name}.nct_id.npy"
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(str(table_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        np.save(keys_path, df["nct_id"].to_numpy().astype("S"))
+        del df, table
+        self.tables[name] = pa.ipc.open_file(pa.memory_map(str(table_path))).read_all()
+        self.table_keys[name] = np.load(keys_path, mmap_mode="r")
 
     def _read_data_from_files(self) -> None:
-        """Parse the required files to pandas DataFrames."""
+        """Parse the required files to sorted, memory-mapped Arrow tables."""
+        self.arrow_dir.mkdir(parents=True, exist_ok=True)
         for name, path in tqdm(
-            self.required_files.items(), desc="Parsing data to memory..."
+            self.required_files.items(), desc="Parsing data to Arrow..."
         ):
             tqdm.write(f"Parsing {name} from {path.name}")
-            if name == "studies":
-                self.data[name] = self._txt_to_df(
-                    path,
-                    parse_dates=[
-                        "start_date",
-                        "completion_date",
-                        "last_update_posted_date",
-                        "results_first_posted_date",
-                    ],
-                    usecols=self.required_cols,
-                )
-            elif name == "references":
+            df = self._read_file(name, path)
+            if name == "references":
                 # drop references without PubmedID
-                self.data[name] = self._txt_to_df(path).dropna(subset="pmid")
+                df = df.dropna(subset="pmid")
             elif name == "summaries":
-                self.data[name] = self._txt_to_df(
-                    path, usecols=["nct_id", "description"]
-                ).rename(columns={"description": "summary"})
-            elif name == "descriptions":
-                self.data[name] = self._txt_to_df(
-                    path, usecols=["nct_id", "description"]
-                )
-            else:
-                self.data[name] = self._txt_to_df(path)
-        self._merge_studies_summaries_descriptions()
-        self._cast_to_none()
+                df = df.rename(columns={"description": "summary"})
+            self._spill_to_arrow(name, df)
 
-    @staticmethod
-    def _get_orm_objects(df: pd.DataFrame, parser: Callable) -> list[aact_orm_type]:
-        """Return either an empty list or parse the dataframe into a list of Objects."""
-        objects = []
-        if not df.empty:
-            objects = df.apply(parser, axis=1).to_list()
-        return objects
-
-    def _build_subtable_lookup_dict(self) -> None:
-        """Build lookup tables (key: nct_id) for the subtables."""
-        self.lookup_dict: aact_lookup_dict_type = {}
-        subtable_to_parser_mapping = OrderedDict(
-            [
-                ("references", self._parse_references),
-                ("eligibilities", self._parse_eligibilities),
-                ("conditions", self._parse_condition),
-                ("interventions", self._parse_intervention),
-                ("mesh_conditions", self._parse_mesh_conditions),
-                ("mesh_interventions", self._parse_mesh_interventions),
-                ("outcome_analyses", self._parse_outcome_analyses),
-                (
-                    "outcomes",
-                    self._parse_outcome,
-                ),  # outcomes must be parsed after outcome_analyses
-            ]
-        )
-        for subtable, parser in subtable_to_parser_mapping.items():
-            self.lookup_dict[subtable] = {}
-            for nct_id, group in tqdm(
-                self.data[subtable].groupby("nct_id"),
-                desc=f"Parsing {subtable} to ORM objects",
-            ):
-                nct_id = str(nct_id)
-                if subtable == "outcome_analyses":
-                    self.lookup_dict[subtable][nct_id] = {}
-                    for outcome_id, group in group.groupby("outcome_id"):
-                        self.lookup_dict[subtable][nct_id][  # type: ignore
-                            outcome_id
-                        ] = self._get_orm_objects(group, parser)
-                else:
-                    self.lookup_dict[subtable][nct_id] = self._get_orm_objects(
-                        group, parser
-                    )
-
-    def _row_to_trial(self, row: pd.Series) -> Trial:
+    def _slice_nct_ids(self, name: str, nct_ids: np.ndarray) -> pd.DataFrame:
+        """Return the rows of a table with one of the NCT IDs.
+
+        Only the rows of the requested IDs are materialized, so a chunk of IDs scattered
+        across the dump, e.g., the changed studies of a refresh, stays small as well.
+        """
+        keys = self.table_keys[name]
+        nct_ids = np.unique(nct_ids.astype(keys.dtype))
+        starts = np.searchsorted(keys, nct_ids, side="left")
+        lengths = np.searchsorted(keys, nct_ids, side="right") - starts
+        # the positions of all rows, i.e., the concatenated ranges [start, start + length)
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        return self.tables[name].take(positions).to_pandas()
+
+    def _join_chunk(self, studies: pd.DataFrame) -> pd.DataFrame:
+        """Join summaries and descriptions into a chunk of studies and index its subtables."""
+        nct_ids = studies["nct_id"].to_numpy()
+        for name in ("summaries", "descriptions"):
+            text = self._slice_nct_ids(name, nct_ids)
+            studies = studies.merge(text, on="nct_id", how="left")
+        self.lookup_dict = {
+            subtable: SubtableLookup(self._slice_nct_ids(subtable, nct_ids), key)
+            for subtable, key in AACT_SUBTABLE_KEYS.items()
+        }
+        return studies
+
+    def _get_orm_objects(self, subtable: str, key) -> list[aact_orm_type]:
+        """Parse the subtable records belonging to the key into ORM objects."""
+        parser = self.subtable_parsers[subtable]
+        return [
+            parser(utils.normalize_nulls(record))
+            for record in self.lookup_dict[subtable].get(key)
+        ]
+
+    def _row_to_trial(self, row: dict) -> Trial:
         """Parse row content into a Trial."""
         nct_id = row["nct_id"]
         return Trial(
@@ -234,23 +373,23 @@ class AactParser(Parser):
             date_results_first_posted=row["results_first_posted_date"],
             date_results_first_posted_type=row["results_first_posted_date_type"],
             # relations
-            references=self.lookup_dict["references"].get(nct_id, []),
-            eligibilities=self.lookup_dict["eligibilities"].get(nct_id, []),
-            conditions=self.lookup_dict["conditions"].get(nct_id, []),
-            interventions=self.lookup_dict["interventions"].get(nct_id, []),
-            mesh_conditions=self.lookup_dict["mesh_conditions"].get(nct_id, []),
-            mesh_interventions=self.lookup_dict["mesh_interventions"].get(nct_id, []),
-            outcomes=self.lookup_dict["outcomes"].get(nct_id, []),
+            references=self._get_orm_objects("references", nct_id),
+            eligibilities=self._get_orm_objects("eligibilities", nct_id),
+            conditions=self._get_orm_objects("conditions", nct_id),
+            interventions=self._get_orm_objects("interventions", nct_id),
+            mesh_conditions=self._get_orm_objects("mesh_conditions", nct_id),
+            mesh_interventions=self._get_orm_objects("mesh_interventions", nct_id),
+            outcomes=self._get_orm_objects("outcomes", nct_id),
             flags=Flags(),
         )
 
     @staticmethod
-    def _parse_references(row: pd.Series) -> Reference | None:
+    def _parse_references(row: dict) -> Reference | None:
         """Parse row contents into References."""
         return Reference(pm_id=row["pmid"], reference_type=row["reference_type"])
 
     @staticmethod
-    def _parse_eligibilities(row: pd.Series) -> Eligibility:
+    def _parse_eligibilities(row: dict) -> Eligibility:
         """Parse row contents into Eligibilities."""
         return Eligibility(
             gender=row["gender"],
@@ -262,12 +401,12 @@ class AactParser(Parser):
         )
 
     @staticmethod
-    def _parse_condition(row: pd.Series) -> Condition:
+    def _parse_condition(row: dict) -> Condition:
         """Parse row content into a Condition."""
         return Condition(condition=row["name"])
 
     @staticmethod
-    def _parse_intervention(row: pd.Series) -> Intervention:
+    def _parse_intervention(row: dict) -> Intervention:
         """Parse row contents into an Intervention."""
         return Intervention(
             intervention_type=row["intervention_type"],
@@ -275,7 +414,7 @@ class AactParser(Parser):
             description=row["description"],
         )
 
-    def _parse_mesh_conditions(self, row: pd.Series) -> MeshCondition:
+    def _parse_mesh_conditions(self, row: dict) -> MeshCondition:
         """Parse row contents into a MeshCondition."""
         mesh_term = row["downcase_mesh_term"]
         return MeshCondition(
@@ -284,7 +423,7 @@ class AactParser(Parser):
             cui=self.normalizer.mesh_term_to_cui(mesh_term),
         )
 
-    def _parse_mesh_interventions(self, row: pd.Series) -> MeshIntervention:
+    def _parse_mesh_interventions(self, row: dict) -> MeshIntervention:
         """Parse row contents into a MeshCondition."""
         mesh_term = row["downcase_mesh_term"]
         return MeshIntervention(
@@ -293,9 +432,8 @@ class AactParser(Parser):
             cui=self.normalizer.mesh_term_to_cui(mesh_term),
         )
 
-    def _parse_outcome(self, row: pd.Series) -> Outcome:
+    def _parse_outcome(self, row: dict) -> Outcome:
         """Parse row contents into an Outcome."""
-        nct_id = row["nct_id"]
         outcome_id = row["id"]
         return Outcome(
             outcome_type=row["outcome_type"],
@@ -303,35 +441,68 @@ class AactParser(Parser):
             description=row["description"],
             time_frame=row["time_frame"],
             population=row["population"],
-            analyses=self.lookup_dict["outcome_analyses"]
-            .get(nct_id, {})
-            .get(outcome_id, []),  # type: ignore
+            analyses=self._get_orm_objects("outcome_analyses", outcome_id),
         )
 
     @staticmethod
-    def _parse_outcome_analyses(row: pd.Series) -> OutcomeAnalyses:
+    def _parse_outcome_analyses(row: dict) -> OutcomeAnalyses:
         """Parse row contents into OutcomeAnalyses."""
         return OutcomeAnalyses(
             param_type=row["param_type"],
-            param_value=utils.str_to_num(row["param_value"], "float"),
-            p_value=utils.str_to_num(row["p_value"], "float"),
+            param_value=row["param_value"],
+            p_value=row["p_value"],
             p_value_modifier=row["p_value_modifier"],
             ci_n_sides=row["ci_n_sides"],
-            ci_percent=utils.str_to_num(row["ci_percent"], "float"),
-            ci_lower_limit=utils.str_to_num(row["ci_lower_limit"], "float"),
-            ci_upper_limit=utils.str_to_num(row["ci_upper_limit"], "float"),
+            ci_percent=row["ci_percent"],
+            ci_lower_limit=row["ci_lower_limit"],
+            ci_upper_limit=row["ci_upper_limit"],
             method=row["method"],
         )
 
     @property
     def n_trials(self) -> int:
         """Return the number of trials found."""
-        if self.data.get("studies") is not None:
-            return len(self.data["studies"])
+        if self.tables.get("studies") is not None:
+            return self.tables["studies"].num_rows
         return 0
 
+    @property
+    def n_chunks(self) -> int:
+        """Return the number of study chunks."""
+        return -(-self.n_trials // self.chunk_size)
+
+    def study_versions(self) -> pd.DataFrame:
+        """Return the NCT ID and last update date of every study in the dump."""
+        return self.tables["studies"].select(
+            ["nct_id", "last_update_posted_date"]
+        ).to_pandas()
+
+    def parse_chunks(
+        self, nct_ids: Iterable[str] | None = None
+    ) -> Iterator[list[Trial]]:
+        """Parse the Trials into ORM objects, one list per chunk of NCT-sorted studies.
+
+        If nct_ids is given, only the studies with these NCT IDs are parsed.
+        """
+        studies = self.tables["studies"]
+        if nct_ids is not None:
+            studies = studies.filter(
+                pc.is_in(
+                    studies["nct_id"],
+                    value_set=pa.array(
+                        list(nct_ids), type=studies.schema.field("nct_id").type
+                    ),
+                )
+            )
+        for start in range(0, studies.num_rows, self.chunk_size):
+            chunk = self._join_chunk(studies.slice(start, self.chunk_size).to_pandas())
+            yield [
+                self._row_to_trial(utils.normalize_nulls(row))
+                for row in chunk.to_dict("records")
+            ]
+        self.lookup_dict = {}
+
     def parse(self) -> Iterator[Trial]:
         """Parse the Trials into ORM objects."""
-        self._build_subtable_lookup_dict()
-        for _, row in self.data["studies"].iterrows():
-            yield self._row_to_trial(row)
+        for chunk in self.parse_chunks():
+            yield from chunk
@@ -1,11 +1,19 @@
-"""A module for parsing annotated Pubmed parquet files to ORM objects."""
+"""A module for parsing annotated Pubmed parquet files to ORM objects or per-table DataFrames."""
 
+import functools
 import json
 import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import Manager
 from pathlib import Path
+from queue import Queue
 from typing import Iterator
 
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from tqdm.auto import tqdm
 
 from integration.orm.pubmed import (
@@ -25,6 +33,68 @@ from integration.orm.pubmed import (
 from integration.parsers import Parser, utils
 from integration.umls.normalization import Normalizer
 
+PUBMED_REQUIRED_COLS = [
+    "pmid",
+    "status",
+    "indexing_method",
+    "title",
+    "authors",
+    "abstract_plaintext",
+    "abstract",
+    "year",
+    "month",
+    "num_randomized",
+    "journal",
+    "ftp_fn",
+    "ptyp",
+    "registry_ids",
+    "dois",
+    "population",
+    "interventions",
+    "outcomes",
+    "mesh",
+    "population_umls",
+    "interventions_umls",
+    "outcomes_umls",
+]
+
+# the source file name changes with every update file and is not part of the content
+PUBMED_CONTENT_HASH_COLS = [c for c in PUBMED_REQUIRED_COLS if c != "ftp_fn"]
+
+# the number of parsed batches a worker may be ahead of the DB writes
+QUEUED_BATCHES_PER_WORKER = 2
+
+NCT_PATTERN = r"NCT\d{8}"
+
+MONTH_MAPPING = {
+    "Jan": "1",
+    "Feb": "2",
+    "Mar": "3",
+    "Apr": "4",
+    "May": "5",
+    "Jun": "6",
+    "Jul": "7",
+    "Aug": "8",
+    "Sep": "9",
+    "Oct": "10",
+    "Nov": "11",
+    "Dec": "12",
+}
+
+# relationship attribute of Trial -> ORM class of the child table
+PUBMED_CHILD_RELATIONSHIPS = {
+    "publication_types": PublicationType,
+    "references": Reference,
+    "dois": Doi,
+    "populations": Population,
+    "interventions": Intervention,
+    "outcomes": Outcome,
+    "mesh_terms": MeshTerm,
+    "umls_population": UmlsPopulation,
+    "umls_interventions": UmlsIntervention,
+    "umls_outcomes": UmlsOutcome,
+}
+
 
 class PubmedParser(Parser):
     """A class for handling the parsing of the annotated Pubmed parquet files into Trial objects."""
@@ -41,6 +111,7 @@ class PubmedParser(Parser):
         nct_regex = re.compile(r"(NCT\d{8})")
         for parquet_file in tqdm(self.parquet_files, "Parsing parquet files"):
             df = pd.read_parquet(parquet_file).drop_duplicates(subset='pmid', keep='last')
+            df["content_hash"] = self._content_hash(df)
             month_mapping = {
                 "Jan": 1,
                 "Feb": 2,
@@ -95,6 +166,7 @@ class PubmedParser(Parser):
                     num_randomized=num_randomized,
                     journal=row.journal,
                     ftp_fn=row.ftp_fn,
+                    content_hash=row.content_hash,
                     publication_types=[
                         PublicationType(publication_type=p_type) for p_type in row.ptyp
                     ],
@@ -145,3 +217,249 @@ class PubmedParser(Parser):
                     ],
                     flags=Flags(),
                 )
+
+    @functools.cached_property
+    def mesh_term_to_cui(self) -> pd.Series:
+        """Return the MeSH term to CUI mapping as a Series for vectorized lookups."""
+        return pd.Series(self.normalizer.mapping_mesh_term_to_cui, dtype=object)
+
+    @staticmethod
+    def _explode(column: pd.Series) -> pd.Series:
+        """Explode a list column to one row per element, indexed by trial position."""
+        non_empty = column[column.map(len, na_action="ignore").fillna(0) > 0]
+        return non_empty.explode()
+
+    @classmethod
+    def _explode_umls(cls, column: pd.Series) -> pd.DataFrame:
+        """Explode a column of UMLS annotation lists to a frame of CUIs and mentions."""
+        annotations = cls._explode(column)
+        annotations = annotations[annotations.map(lambda d: isinstance(d, dict))]
+        df = pd.DataFrame(
+            annotations.tolist(),
+            index=annotations.index,
+            columns=["cui", "cui_str", "mention"],
+        )
+        return df.rename(columns={"cui_str": "cui_term"})
+
+    @staticmethod
+    def _with_trial_idx(df: pd.DataFrame | pd.Series, name: str | None = None):
+        """Turn the trial position index into a `trial_idx` column."""
+        if isinstance(df, pd.Series):
+            df = df.to_frame(name)
+        return df.rename_axis("trial_idx").reset_index().astype({"trial_idx": "int64"})
+
+    @staticmethod
+    def _parse_num_randomized(column: pd.Series) -> pd.Series:
+        """Parse sample sizes, discarding implausible values above one billion."""
+        numbers = np.trunc(pd.to_numeric(column, errors="coerce"))
+        return numbers.where(numbers <= 1000000000).astype("Int64")
+
+    @staticmethod
+    def _parse_publication_date(year: pd.Series, month: pd.Series) -> pd.Series:
+        """Parse publication dates from year and (abbreviated or numeric) month strings."""
+        month = month.map(MONTH_MAPPING).fillna(month)
+        return pd.to_datetime(year + "/" + month.astype(str))
+
+    @staticmethod
+    def _format_authors(authors) -> str:
+        """Serialize (at most 100) authors to JSON."""
+        if authors is None or isinstance(authors, float):
+            return json.dumps([])
+        return json.dumps(
+            [
+                {
+                    "LastName": a["LastName"],
+                    "ForeName": a["ForeName"],
+                    "Initials": a["Initials"],
+                }
+                for a in authors[0:100]
+            ]
+        )
+
+    @staticmethod
+    def _content_hash(df: pd.DataFrame) -> pd.Series:
+        """Return a hex digest of each row's content, used to detect changed records."""
+
+        def to_text(value) -> str:
+            return str(value.tolist() if isinstance(value, np.ndarray) else value)
+
+        as_text = df[PUBMED_CONTENT_HASH_COLS].apply(lambda column: column.map(to_text))
+        return pd.util.hash_pandas_object(as_text, index=False).map("{:016x}".format)
+
+    def _df_to_frames(self, df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        """Convert a frame of parquet rows to one DataFrame per table.
+
+        Child rows reference their trial by its position in the batch (`trial_idx`),
+        so that primary keys can be assigned at insert time.
+        """
+        df = df.reset_index(drop=True)
+        trials = pd.DataFrame(
+            {
+                "pm_id": df["pmid"].astype("int64"),
+                "status": df["status"],
+                "indexing_method": df["indexing_method"],
+                "title": df["title"],
+                "authors": df["authors"].map(self._format_authors),
+                "abstract": df["abstract_plaintext"],
+                "abstract_formatted": [json.dumps(list(a)) for a in df["abstract"]],
+                "publication_date": self._parse_publication_date(
+                    df["year"], df["month"]
+                ),
+                "num_randomized": self._parse_num_randomized(df["num_randomized"]),
+                "journal": df["journal"],
+                "ftp_fn": df["ftp_fn"],
+                "content_hash": self._content_hash(df).to_numpy(),
+            }
+        )
+
+        references = self._explode(df["registry_ids"])
+        references = references[
+            references.str.fullmatch(NCT_PATTERN).fillna(False).astype(bool)
+        ]
+        mesh_terms = self._with_trial_idx(self._explode(df["mesh"]), "mesh_term")
+        mesh_terms["cui"] = mesh_terms["mesh_term"].str.lower().map(self.mesh_term_to_cui)
+
+        return {
+            Trial.__tablename__: trials,
+            Flags.__tablename__: pd.DataFrame(
+                {"trial_idx": np.arange(len(df)), "has_significant_finding": None}
+            ),
+            PublicationType.__tablename__: self._with_trial_idx(
+                self._explode(df["ptyp"]), "publication_type"
+            ),
+            Reference.__tablename__: self._with_trial_idx(references, "nct_id"),
+            Doi.__tablename__: self._with_trial_idx(self._explode(df["dois"]), "doi"),
+            Population.__tablename__: self._with_trial_idx(
+                self._explode(df["population"]), "population"
+            ),
+            Intervention.__tablename__: self._with_trial_idx(
+                self._explode(df["interventions"]), "intervention"
+            ),
+            Outcome.__tablename__: self._with_trial_idx(
+                self._explode(df["outcomes"]), "outcome"
+            ),
+            MeshTerm.__tablename__: mesh_terms,
+            UmlsPopulation.__tablename__: self._with_trial_idx(
+                self._explode_umls(df["population_umls"])
+            ),
+            UmlsIntervention.__tablename__: self._with_trial_idx(
+                self._explode_umls(df["interventions_umls"])
+            ),
+            UmlsOutcome.__tablename__: self._with_trial_idx(
+                self._explode_umls(df["outcomes_umls"])
+            ),
+        }
+
+    @staticmethod
+    def _last_occurrence_mask(parquet_file: pq.ParquetFile) -> np.ndarray:
+        """Return a boolean mask marking the last row of each PMID in the file.
+
+        Only the PMID column is read, so the mask can be computed with a small,
+        constant memory footprint per row.
+        """
+        pmids = pc.cast(parquet_file.read(columns=["pmid"]).column("pmid"), "int64")
+        pmids = pmids.to_numpy()
+        _, last_from_end = np.unique(pmids[::-1], return_index=True)
+        mask = np.zeros(len(pmids), dtype=bool)
+        mask[len(pmids) - 1 - last_from_end] = True
+        return mask
+
+    def __getstate__(self) -> dict:
+        """Pickle the parser without the normalizer, which holds the UMLS dataframes."""
+        state = self.__dict__.copy()
+        state["mesh_term_to_cui"] = self.mesh_term_to_cui
+        state["normalizer"] = None
+        return state
+
+    def _iter_batches(self, parquet_file: Path, batch_size: int) -> Iterator[pd.DataFrame]:
+        """Stream a parquet file in bounded batches, keeping only the last row per PMID."""
+        pf = pq.ParquetFile(parquet_file)
+        keep = self._last_occurrence_mask(pf)
+        offset = 0
+        for record_batch in tqdm(
+            pf.iter_batches(batch_size=batch_size, columns=PUBMED_REQUIRED_COLS),
+            desc=f"Parsing {parquet_file}",
+            total=-(-pf.metadata.num_rows // batch_size),
+        ):
+            n_rows = record_batch.num_rows
+            df = record_batch.to_pandas()[keep[offset : offset + n_rows]]
+            offset += n_rows
+            if not df.empty:
+                yield df
+
+    def parse_frames(self, batch_size: int) -> Iterator[dict[str, pd.DataFrame]]:
+        """Parse the parquet files into batches of per-table DataFrames for bulk loading.
+
+        The files are streamed batch by batch, so memory usage is bounded by the
+        batch size rather than by the size of the largest file.
+        """
+        for parquet_file in tqdm(self.parquet_files, "Parsing parquet files"):
+            for df in self._iter_batches(parquet_file, batch_size):
+                yield self._df_to_frames(df)
+
+    def parse_frames_parallel(
+        self, batch_size: int, num_workers: int
+    ) -> Iterator[dict[str, pd.DataFrame]]:
+        """Parse the parquet files in worker processes into per-table DataFrames.
+
+        At most `num_workers` files are parsed at a time. Each worker streams its batches
+        through a queue holding at most QUEUED_BATCHES_PER_WORKER of them, so memory usage
+        is bounded by the batch size rather than by the size of the files. Results are
+        yielded in the order of `parquet_files`, so that newer files still overwrite
+        duplicate PMIDs from older ones when the batches are written.
+        """
+        with Manager() as manager, ProcessPoolExecutor(
+            max_workers=num_workers, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+
+            def submit(parquet_file: Path) -> tuple[Queue, Future]:
+                queue = manager.Queue(maxsize=QUEUED_BATCHES_PER_WORKER)
+                future = executor.submit(
+                    _parse_file_in_worker, parquet_file, batch_size, queue
+                )
+                return queue, future
+
+            pending_files = iter(self.parquet_files)
+            tasks: deque[tuple[Queue, Future]] = deque(
+                submit(parquet_file)
+                for _, parquet_file in zip(range(num_workers), pending_files)
+            )
+            try:
+                for _ in tqdm(self.parquet_files, "Parsing parquet files"):
+                    queue, future = tasks[0]
+                    while (frames := queue.get()) is not None:
+                        yield frames
+                    tasks.popleft()
+                    if parquet_file := next(pending_files, None):
+                        tasks.append(submit(parquet_file))
+                    # raise the worker's exception, if any
+                    future.result()
+            finally:
+                # if stopped early, drain the queues of started files, so no worker blocks
+                for queue, future in tasks:
+                    if not future.cancel():
+                        while queue.get() is not None:
+                            pass
+
+
+_worker_parser: PubmedParser | None = None
+
+
+def _init_worker(parser: PubmedParser) -> None:
+    """Store the parser in the worker process' global state."""
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_file_in_worker(parquet_file: Path, batch_size: int, queue: Queue) -> None:
+    """Parse a single parquet file to per-table DataFrames in a worker process.
+
+    The batches are put into the queue, followed by None once the file is done or failed.
+    """
+    try:
+        for df in _worker_parser._iter_batches(  # type: ignore[union-attr]
+            parquet_file, batch_size
+        ):
+            queue.put(_worker_parser._df_to_frames(df))  # type: ignore[union-attr]
+    finally:
+        queue.put(None)
@@ -1,6 +1,9 @@
 """A module containing useful parsing functions."""
 
-from typing import Literal
+from math import isnan
+from typing import Any, Literal
+
+import pandas as pd
 
 
 def str_to_num(
@@ -17,3 +20,16 @@ def str_to_num(
         except ValueError:
             pass
     return number
+
+
+def is_missing(value: Any) -> bool:
+    """Return whether a scalar value is missing (None, NaN, NaT, NA or an empty string)."""
+    if value is None or (isinstance(value, str) and value == ""):
+        return True
+    return value is pd.NA or value is pd.NaT or (isinstance(value, float) and isnan(value))
+
+
+def normalize_nulls(record: dict) -> dict:
+    """Return a copy of the record with all missing values set to None."""
+    return {k: None if is_missing(v) else v for k, v in record.items()}
+
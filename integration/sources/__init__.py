@@ -5,10 +5,12 @@ from abc import ABC, abstractmethod
 from pathlib import Path
 
 import pooch
+from sqlalchemy import Table
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from datetime import datetime
 from integration.orm.versions import Version
+from integration.staging import STAGING_SCHEMA, StagingArea
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,8 @@ class Source(ABC):
     """An abstract base class for different data sources."""
 
     engine: Engine
+    # the tables written by parse, which are swapped in by a staged load
+    tables: list[Table] = []
 
     def __init__(self, engine: Engine):
         """Create a new Source instance."""
@@ -34,6 +38,25 @@ class Source(ABC):
             session.merge(version)
             session.commit()
 
+    def parse_staged(self, staging_schema: str = STAGING_SCHEMA) -> None:
+        """Parse the data into a staging schema and swap it with the live tables when done.
+
+        The live tables stay untouched and queryable until the swap.
+        """
+        if not self.tables:
+            raise NotImplementedError(
+                f"{type(self).__name__} does not support staged loads"
+            )
+        staging = StagingArea(self.engine, staging_schema)
+        staging.clear_versions()
+        live_engine = self.engine
+        self.engine = staging.staging_engine
+        try:
+            self.parse(drop_existing=True)
+        finally:
+            self.engine = live_engine
+        staging.swap(self.tables)
+
 
 class Download(Source):
     """An abstract base class for data sources involving a download."""
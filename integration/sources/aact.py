@@ -1,28 +1,59 @@
 """A module for parsing the AACT database."""
 
+import datetime
 import logging
 from pathlib import Path
 from typing import Tuple
 
+import pandas as pd
 import pooch
 import requests
 from bs4 import BeautifulSoup
 from pooch import Unzip
-from sqlalchemy.engine import Engine
+from sqlalchemy import delete, select
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import Session
 from tqdm.auto import tqdm
 
-from integration.orm.aact import Trial, create_metadata
+from integration.bulk import insert_frame
+from integration.orm import changes
+from integration.orm.aact import (
+    Condition,
+    Eligibility,
+    Flags,
+    Intervention,
+    MeshCondition,
+    MeshIntervention,
+    Outcome,
+    OutcomeAnalyses,
+    TABLES,
+    Reference,
+    Trial,
+    create_metadata,
+)
+from integration.orm.changes import Change
 from integration.parsers.aact import AACT_REQUIRED_FILES, AactParser
 from integration.sources import Download
 from integration.umls.normalization import Normalizer
 
 logger = logging.getLogger(__name__)
 
+AACT_TRIAL_CHILDREN = [
+    Reference,
+    Eligibility,
+    Condition,
+    Intervention,
+    Outcome,
+    MeshCondition,
+    MeshIntervention,
+]
+
 
 class Aact(Download):
     """A class to handle parsing the AACT data."""
 
+    tables = TABLES
+
     def __init__(
         self,
         url: str,
@@ -32,10 +63,12 @@ class Aact(Download):
         cache_dir: str,
         normalizer: Normalizer,
         engine: Engine,
+        csv_engine: str = "c",
     ) -> None:
         """Initialize a AACT data source instance."""
         super().__init__(url, batch_size, registry, cache_dir, lookup_url, engine)
         self.normalizer = normalizer
+        self.csv_engine = csv_engine
         self._update_registry()
 
     def _remove_annoying_mac_os_files(self) -> None:
@@ -92,6 +125,123 @@ class Aact(Download):
             session.add_all(batch)
             session.commit()
 
+    @staticmethod
+    def _delete_trials(connection: Connection, trial_ids: list[int]) -> None:
+        """Delete trials and all of their child rows, which are not removed by cascades."""
+        outcome_ids = select(Outcome.id).where(Outcome.trial_id.in_(trial_ids))
+        connection.execute(
+            delete(OutcomeAnalyses).where(OutcomeAnalyses.outcome_id.in_(outcome_ids))
+        )
+        for orm_class in AACT_TRIAL_CHILDREN:
+            connection.execute(delete(orm_class).where(orm_class.trial_id.in_(trial_ids)))
+        connection.execute(delete(Flags).where(Flags.source_id.in_(trial_ids)))
+        connection.execute(delete(Trial).where(Trial.id.in_(trial_ids)))
+
+    @staticmethod
+    def _log_changes(
+        connection: Connection, nct_ids: list[str], change_type: str, version: str
+    ) -> None:
+        """Record changed trials in the change log."""
+        insert_frame(
+            connection,
+            Change.__table__,
+            pd.DataFrame(
+                {
+                    "source": "clinicaltrials",
+                    "record_id": nct_ids,
+                    "change_type": change_type,
+                    "version": version,
+                    "changed_at": datetime.datetime.now(),
+                }
+            ),
+        )
+
+    def _diff_versions(self, parser: AactParser) -> pd.DataFrame:
+        """Compare the last update dates of the dump against the DB.
+
+        Returns one row per NCT ID with the existing trial IDs (empty for new trials)
+        and a change type of insert, update, delete or None for unchanged trials.
+        """
+        with self.engine.connect() as connection:
+            existing = pd.DataFrame(
+                connection.execute(
+                    select(Trial.nct_id, Trial.id, Trial.date_last_update)
+                ).all(),
+                columns=["nct_id", "id", "date_last_update"],
+            )
+        existing = existing.groupby("nct_id", as_index=False).agg(
+            ids=("id", list), date_last_update=("date_last_update", "last")
+        )
+        dump = parser.study_versions()
+        diff = dump.merge(existing, on="nct_id", how="outer", indicator=True)
+        new_date = pd.to_datetime(diff["last_update_posted_date"])
+        old_date = pd.to_datetime(diff["date_last_update"])
+        same_date = (new_date == old_date) | (new_date.isna() & old_date.isna())
+        diff["change_type"] = None
+        diff.loc[diff["_merge"] == "left_only", "change_type"] = "insert"
+        diff.loc[(diff["_merge"] == "both") & ~same_date, "change_type"] = "update"
+        diff.loc[diff["_merge"] == "right_only", "change_type"] = "delete"
+        diff["ids"] = diff["ids"].apply(lambda ids: ids if isinstance(ids, list) else [])
+        return diff[["nct_id", "ids", "change_type"]]
+
+    def refresh(self) -> list[str]:
+        """Apply the downloaded dump differentially and return the NCT IDs of changed trials.
+
+        Only trials whose last update date differs from the one stored in the DB are
+        replaced, new trials are inserted and trials missing from the dump are deleted.
+        Each batch is written in its own transaction, so the tables stay queryable
+        during the refresh. Significance flags of replaced trials need to be recomputed.
+        """
+        version = self._parse_date(self.newest_dump_name)
+        create_metadata(self.engine)
+        changes.create_metadata(self.engine)
+        parser = AactParser(
+            self.downloaded_files,
+            normalizer=self.normalizer,
+            csv_engine=self.csv_engine,
+            chunk_size=self.batch_size,
+            arrow_dir=self.download_manager.path / "arrow",
+        )
+        diff = self._diff_versions(parser).set_index("nct_id")
+        upserted = diff.index[diff["change_type"].isin(["insert", "update"])]
+        logger.info(
+            f"{len(upserted)} new or updated trials, "
+            f"{(diff['change_type'] == 'delete').sum()} removed trials"
+        )
+        for batch_id, batch in tqdm(
+            enumerate(parser.parse_chunks(upserted), start=1),
+            desc="Refreshing changed trials in the DB",
+            total=-(-len(upserted) // self.batch_size),
+        ):
+            tqdm.write(f"Writing batch {batch_id} into DB")
+            nct_ids = [trial.nct_id for trial in batch]
+            batch_diff = diff.loc[nct_ids]
+            with Session(self.engine) as session:
+                connection = session.connection()
+                self._delete_trials(
+                    connection, [i for ids in batch_diff["ids"] for i in ids]
+                )
+                session.add_all(batch)
+                for change_type, group in batch_diff.groupby("change_type"):
+                    self._log_changes(
+                        connection, group.index.tolist(), str(change_type), version
+                    )
+                session.commit()
+        deleted = diff[diff["change_type"] == "delete"]
+        for start in range(0, len(deleted), self.batch_size):
+            batch_diff = deleted.iloc[start : start + self.batch_size]
+            with self.engine.begin() as connection:
+                self._delete_trials(
+                    connection, [i for ids in batch_diff["ids"] for i in ids]
+                )
+                self._log_changes(
+                    connection, batch_diff.index.tolist(), "delete", version
+                )
+        self.write_version("clinicaltrials", version)
+        changed_nct_ids = diff.index[diff["change_type"].notna()].tolist()
+        logger.info(f"{len(changed_nct_ids)} trials were inserted, updated or deleted")
+        return changed_nct_ids
+
     def _parse_date(self, dump_name : str):
         date = dump_name.split('_')[0]
         return 'aact_' + date[0:4] + '_' + date[4:6] + '_' + date[6:8]
@@ -103,20 +253,15 @@ class Aact(Download):
         parser = AactParser(
             self.downloaded_files,
             normalizer=self.normalizer,
+            csv_engine=self.csv_engine,
+            chunk_size=self.batch_size,
+            arrow_dir=self.download_manager.path / "arrow",
         )
-        trials = parser.parse()
-        batch = []
-        batch_id = 1
-        for i, trial in tqdm(
-            enumerate(trials),
+        for batch_id, batch in tqdm(
+            enumerate(parser.parse_chunks(), start=1),
             desc="Parsing trials into the DB",
-            total=parser.n_trials,
+            total=parser.n_chunks,
         ):
-            batch.append(trial)
-            if (i > 0 and i % self.batch_size == 0) or (i == parser.n_trials - 1):
-                tqdm.write(f"Writing batch {batch_id} into DB")
-                self._commit_batch(batch)
-                batch = []
-                batch_id += 1
+            tqdm.write(f"Writing batch {batch_id} into DB")
+            self._commit_batch(batch)
         self.write_version("clinicaltrials", version)
-        
\ No newline at end of file
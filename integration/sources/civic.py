@@ -6,7 +6,7 @@ from civicpy import civic
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
-from integration.orm.civic import create_metadata
+from integration.orm.civic import TABLES, create_metadata
 from integration.parsers.civic import CivicParser
 from integration.sources import Source
 from integration.umls.normalization import Normalizer
@@ -17,6 +17,8 @@ logger = logging.getLogger(__name__)
 class Civic(Source):
     """A class to handle parsing the CivicDB data."""
 
+    tables = TABLES
+
     def __init__(self, normalizer: Normalizer, engine: Engine) -> None:
         """Create a new Civic instance."""
         super().__init__(engine)
@@ -13,7 +13,7 @@ from sqlalchemy.orm import Session
 from tqdm.auto import tqdm
 
 from integration.orm import ggponc
-from integration.orm.ggponc import create_metadata
+from integration.orm.ggponc import TABLES, create_metadata
 from integration.parsers.ggponc import GgponcParser
 from integration.sources import Download
 from integration.umls.relationship_mapping import RelationshipMapper
@@ -46,6 +46,7 @@ def parse_max_mapping_depth(max_depth: str | int | None) -> int | None:
 class Ggponc(Download):
     """A class to handle the parsing of the CPG data from GGPONC."""
 
+    tables = TABLES
     ggponc_dir: Path
     relationship_mapper: RelationshipMapper
     topic_yaml_path: Path
@@ -159,7 +160,7 @@ class Ggponc(Download):
         max_depth: int | None = None,
     ) -> None:
         """Map GGPONC entities to broader concepts."""
-        mappable_cuis = set(self.relationship_mapper.df_mrrel_for_narrow2broad.index)
+        mappable_cuis = set(self.relationship_mapper.graph_narrow2broad.source_cuis())
         query = select(ggponc.Entity)
         entities = session.scalars(query).all()
 
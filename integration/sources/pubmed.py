@@ -1,17 +1,23 @@
 """A module for parsing the annotated Pubmed data into the DB."""
 
+import datetime
 import logging
 import os
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import pooch
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.orm import Session
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 from tqdm.auto import tqdm
 
-from integration.orm.pubmed import Trial, create_metadata
-from integration.parsers.pubmed import PubmedParser
+from integration.bulk import insert_frame, next_primary_key, upsert_frame
+from integration.config import parse_config_bool
+from integration.orm.changes import Change
+from integration.orm.pubmed import TABLES, Flags, Trial, create_metadata
+from integration.parsers.pubmed import PUBMED_CHILD_RELATIONSHIPS, PubmedParser
 from integration.sources import Download
 from integration.umls.normalization import Normalizer
 
@@ -20,6 +26,8 @@ logger = logging.getLogger(__name__)
 class Pubmed(Download):
     """A class to handle parsing the annotated Pubmed data."""
 
+    tables = TABLES
+
     def __init__(
         self,
         url: str,
@@ -30,6 +38,8 @@ class Pubmed(Download):
         normalizer: Normalizer,
         local_dir: str | Path = None,
         update_batch_size: int | str = None,
+        bulk_insert: bool | str = True,
+        num_workers: int | str = 1,
     ) -> None:
         """Initialize a Pubmed data source instance."""
         if update_batch_size:
@@ -44,6 +54,8 @@ class Pubmed(Download):
         )
         self.normalizer = normalizer
         self.local_dir = local_dir
+        self.bulk_insert = parse_config_bool(bulk_insert)
+        self.num_workers = int(num_workers)
 
     def download(self) -> None:
         """Download the Pubmed data."""
@@ -70,19 +82,61 @@ class Pubmed(Download):
         """Commit a batch of assembled trials to the DB."""
         with Session(self.engine) as session:
             batch_pmids = [trial.pm_id for trial in batch]
-            result = session.connection().execute(delete(Trial).where(Trial.pm_id.in_(batch_pmids)))
-            n_deleted = result.rowcount
-            if n_deleted > 0:
-                logger.info(f"Updating {n_deleted} existing trials with same PMIDs.")
+            self._delete_existing(session.connection(), batch_pmids)
             session.add_all(batch)
             session.commit()
 
+    @staticmethod
+    def _delete_existing(connection: Connection, pm_ids: list[int]) -> None:
+        """Delete trials (and, through cascades, their children) with the given PMIDs."""
+        result = connection.execute(delete(Trial).where(Trial.pm_id.in_(pm_ids)))
+        if result.rowcount > 0:
+            logger.info(f"Updating {result.rowcount} existing trials with same PMIDs.")
+
+    def _commit_frames(self, frames: dict[str, pd.DataFrame]) -> None:
+        """Commit a batch of per-table DataFrames to the DB using Core bulk INSERTs.
+
+        Trial primary keys are pre-assigned from the current maximum ID, which
+        assumes that only one writer loads the Pubmed tables at a time.
+        """
+        trials = frames[Trial.__tablename__]
+        if trials.empty:
+            return
+        with self.engine.begin() as connection:
+            self._delete_existing(connection, trials["pm_id"].tolist())
+            first_id = next_primary_key(connection, Trial.__table__)
+            trial_ids = first_id + np.arange(len(trials))
+            insert_frame(connection, Trial.__table__, trials.assign(id=trial_ids))
+            for orm_class in PUBMED_CHILD_RELATIONSHIPS.values():
+                children = frames[orm_class.__tablename__]
+                insert_frame(
+                    connection,
+                    orm_class.__table__,
+                    children.assign(trial_id=trial_ids[children["trial_idx"]]),
+                )
+            flags = frames[Flags.__tablename__]
+            insert_frame(
+                connection,
+                Flags.__table__,
+                flags.assign(source_id=trial_ids[flags["trial_idx"]]),
+            )
+
     def parse(self, drop_existing: bool = False) -> None:
-        """Parse the data and insert it into the DB."""        
+        """Parse the data and insert it into the DB."""
         create_metadata(self.engine, drop_existing)
+        tp = PubmedParser(self.downloaded_files, normalizer=self.normalizer)
+        if self.bulk_insert:
+            if self.num_workers > 1:
+                batches = tp.parse_frames_parallel(self.batch_size, self.num_workers)
+            else:
+                batches = tp.parse_frames(self.batch_size)
+            for batch_id, frames in enumerate(batches, 1):
+                tqdm.write(f"Writing batch {batch_id} into DB")
+                self._commit_frames(frames)
+            self.write_version("pubmed", Path(self.downloaded_files[-1]).stem)
+            return
         batch = []
         batch_id = 1
-        tp = PubmedParser(self.downloaded_files, normalizer=self.normalizer)
         for trial in tp.parse():
             batch.append(trial)                
             if len(batch) == self.batch_size:
@@ -93,3 +147,109 @@ class Pubmed(Download):
         tqdm.write("Writing final batch into DB")
         self._commit_batch(batch)
         self.write_version("pubmed", Path(self.downloaded_files[-1]).stem)
+
+    def _upsert_frames(
+        self, frames: dict[str, pd.DataFrame], version: str
+    ) -> pd.DataFrame:
+        """Write only new or changed trials of a batch, leaving unchanged ones untouched.
+
+        Changed trials keep their primary key: the trial row is upserted and its child
+        rows are replaced. Returns the PMIDs and change types of the written trials.
+        """
+        trials = frames[Trial.__tablename__]
+        with self.engine.begin() as connection:
+            existing = pd.DataFrame(
+                connection.execute(
+                    select(Trial.pm_id, Trial.id, Trial.content_hash).where(
+                        Trial.pm_id.in_(trials["pm_id"].tolist())
+                    )
+                ).all(),
+                columns=["pm_id", "id", "content_hash"],
+            ).drop_duplicates(subset="pm_id", keep="last")
+            merged = trials[["pm_id", "content_hash"]].merge(
+                existing, on="pm_id", how="left", suffixes=("", "_existing")
+            )
+            is_new = merged["id"].isna().to_numpy()
+            is_changed = (
+                merged["content_hash"] != merged["content_hash_existing"]
+            ).to_numpy() | is_new
+            changes = pd.DataFrame(
+                {
+                    "pm_id": merged["pm_id"][is_changed],
+                    "change_type": np.where(is_new[is_changed], "insert", "update"),
+                }
+            )
+            if changes.empty:
+                return changes
+
+            trial_ids = merged["id"].fillna(0).to_numpy(dtype="int64")
+            trial_ids[is_new] = next_primary_key(
+                connection, Trial.__table__
+            ) + np.arange(is_new.sum())
+            updated_ids = trial_ids[is_changed & ~is_new].tolist()
+            # remove the children of updated trials and any stale duplicates of their PMIDs
+            for orm_class in PUBMED_CHILD_RELATIONSHIPS.values():
+                connection.execute(
+                    delete(orm_class).where(orm_class.trial_id.in_(updated_ids))
+                )
+            connection.execute(delete(Flags).where(Flags.source_id.in_(updated_ids)))
+            connection.execute(
+                delete(Trial).where(
+                    Trial.pm_id.in_(changes["pm_id"].tolist()),
+                    Trial.id.notin_(trial_ids[is_changed].tolist()),
+                )
+            )
+
+            upsert_frame(
+                connection,
+                Trial.__table__,
+                trials[is_changed].assign(id=trial_ids[is_changed]),
+            )
+            for orm_class in PUBMED_CHILD_RELATIONSHIPS.values():
+                children = frames[orm_class.__tablename__]
+                children = children[is_changed[children["trial_idx"]]]
+                insert_frame(
+                    connection,
+                    orm_class.__table__,
+                    children.assign(trial_id=trial_ids[children["trial_idx"]]),
+                )
+            flags = frames[Flags.__tablename__]
+            flags = flags[is_changed[flags["trial_idx"]]]
+            insert_frame(
+                connection,
+                Flags.__table__,
+                flags.assign(source_id=trial_ids[flags["trial_idx"]]),
+            )
+            insert_frame(
+                connection,
+                Change.__table__,
+                pd.DataFrame(
+                    {
+                        "source": "pubmed",
+                        "record_id": changes["pm_id"].astype(str),
+                        "change_type": changes["change_type"],
+                        "version": version,
+                        "changed_at": datetime.datetime.now(),
+                    }
+                ),
+            )
+        return changes
+
+    def update(self) -> list[int]:
+        """Apply the downloaded update files incrementally and return the PMIDs of changed trials.
+
+        Records whose content hash matches the one stored in the DB are skipped. New and
+        changed records are upserted and logged to the `nge_change` table, so that
+        downstream caches and flags can be refreshed for the affected rows only.
+        """
+        create_metadata(self.engine)
+        version = Path(self.downloaded_files[-1]).stem
+        tp = PubmedParser(self.downloaded_files, normalizer=self.normalizer)
+        changed_pm_ids: list[int] = []
+        for batch_id, frames in enumerate(tp.parse_frames(self.batch_size), 1):
+            changes = self._upsert_frames(frames, version)
+            tqdm.write(f"Batch {batch_id}: {len(changes)} new or changed trials")
+            changed_pm_ids.extend(changes["pm_id"].tolist())
+        self.write_version("pubmed", version)
+        logger.info(f"{len(changed_pm_ids)} trials were inserted or updated")
+        return changed_pm_ids
@@ -10,7 +10,7 @@ from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from tqdm.auto import tqdm
 
-from integration.orm.trialstreamer import Trial, create_metadata
+from integration.orm.trialstreamer import TABLES, Trial, create_metadata
 from integration.parsers.trialstreamer import TrialstreamerParser
 from integration.sources import Download
 
@@ -20,6 +20,8 @@ logger = logging.getLogger(__name__)
 class TrialStreamer(Download):
     """A class to handle parsing the TrialStreamer data."""
 
+    tables = TABLES
+
     def __init__(
         self,
         url: str,
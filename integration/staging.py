@@ -0,0 +1,166 @@
+"""A module for loading sources into a staging schema and swapping them into the live schema."""
+
+import logging
+from pathlib import Path
+
+from sqlalchemy import Table, create_engine, delete, event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import sort_tables
+
+from integration.orm.versions import Version
+
+logger = logging.getLogger(__name__)
+
+STAGING_SCHEMA = "nge_staging"
+
+
+class StagingArea:
+    """A shadow schema next to the live one that sources are loaded into before they go live.
+
+    On MySQL the staging schema is a separate database on the same server and tables are
+    swapped in with a single atomic `RENAME TABLE`. On SQLite it is a database file attached
+    to every connection and tables are copied over within one transaction, see _swap_sqlite.
+    """
+
+    def __init__(self, engine: Engine, schema: str = STAGING_SCHEMA) -> None:
+        """Create the staging schema if it does not exist yet."""
+        self.schema = schema
+        if engine.dialect.name == "mysql":
+            self.engine = engine
+            with engine.begin() as connection:
+                connection.execute(
+                    text(f"CREATE DATABASE IF NOT EXISTS {self._quote(schema)}")
+                )
+        elif engine.dialect.name == "sqlite":
+            self.engine = self._attached_sqlite_engine(engine, schema)
+        else:
+            raise NotImplementedError(
+                f"Staged loads are not implemented for dialect {engine.dialect.name}"
+            )
+        self.staging_engine = self.engine.execution_options(
+            schema_translate_map={None: schema}
+        )
+
+    @staticmethod
+    def _attached_sqlite_engine(engine: Engine, schema: str) -> Engine:
+        """Return an engine on the live SQLite DB with the staging DB attached as schema."""
+        database = engine.url.database
+        if not database or database == ":memory:":
+            raise ValueError("Staged loads require a file-based SQLite DB")
+        live_path = Path(database)
+        staging_path = live_path.with_name(f"{live_path.stem}.{schema}{live_path.suffix}")
+        attached = create_engine(engine.url, future=True)
+
+        @event.listens_for(attached, "connect")
+        def _attach(dbapi_connection, _):
+            # let SQLAlchemy emit BEGIN itself, so that DDL is transactional as well
+            dbapi_connection.isolation_level = None
+            # readers of the live DB keep their snapshot while the swap copies the tables
+            dbapi_connection.execute("PRAGMA main.journal_mode=WAL")
+            dbapi_connection.execute(f"ATTACH DATABASE '{staging_path}' AS \"{schema}\"")
+
+        @event.listens_for(attached, "begin")
+        def _begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+        return attached
+
+    def _quote(self, name: str) -> str:
+        """Quote an identifier for the dialect."""
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def _staged(self, name: str) -> str:
+        """Return the qualified name of a table in the staging schema."""
+        return f"{self._quote(self.schema)}.{self._quote(name)}"
+
+    def clear_versions(self) -> None:
+        """Remove version rows left over from earlier staged loads."""
+        Version.__table__.create(self.staging_engine, checkfirst=True)
+        with self.staging_engine.begin() as connection:
+            connection.execute(delete(Version))
+
+    def _copy_versions(self, connection: Connection) -> None:
+        """Copy the version rows written by the staged load into the live schema."""
+        connection.execute(
+            text(
+                f"REPLACE INTO {self._quote(Version.__tablename__)} "
+                f"SELECT * FROM {self._staged(Version.__tablename__)}"
+            )
+        )
+
+    def _clear_live_versions(self, connection: Connection) -> None:
+        """Delete the live version rows of the sources written by the staged load."""
+        connection.execute(
+            text(
+                f"DELETE FROM {self._quote(Version.__tablename__)} WHERE source IN "
+                f"(SELECT source FROM {self._staged(Version.__tablename__)})"
+            )
+        )
+
+    def swap(self, tables: list[Table]) -> None:
+        """Replace the live tables with their staged counterparts and publish the new versions."""
+        tables = sort_tables(tables)
+        Version.__table__.create(self.engine, checkfirst=True)
+        if self.engine.dialect.name == "mysql":
+            self._swap_mysql(tables)
+        else:
+            self._swap_sqlite(tables)
+        logger.info(f"Swapped {len(tables)} staged tables into the live schema")
+
+    def _swap_mysql(self, tables: list[Table]) -> None:
+        """Swap all tables with one atomic RENAME TABLE statement.
+
+        RENAME TABLE commits implicitly, so the new version rows can only be copied in a
+        separate transaction afterwards. The old version rows are deleted before the rename,
+        so in between, readers see no version for the staged sources and neither use data
+        derived from their old tables nor cache results under their old versions.
+        """
+        with self.engine.connect() as connection:
+            live_tables = set(inspect(connection).get_table_names())
+            renames = []
+            for table in tables:
+                if table.name in live_tables:
+                    renames.append(
+                        f"{self._quote(table.name)} TO {self._staged(table.name + '__old')}"
+                    )
+                renames.append(
+                    f"{self._staged(table.name)} TO {self._quote(table.name)}"
+                )
+            for table in reversed(tables):
+                connection.execute(
+                    text(f"DROP TABLE IF EXISTS {self._staged(table.name + '__old')}")
+                )
+            self._clear_live_versions(connection)
+            connection.commit()
+            connection.execute(text("RENAME TABLE " + ", ".join(renames)))
+            self._copy_versions(connection)
+            connection.commit()
+            for table in reversed(tables):
+                connection.execute(
+                    text(f"DROP TABLE IF EXISTS {self._staged(table.name + '__old')}")
+                )
+            connection.commit()
+
+    def _swap_sqlite(self, tables: list[Table]) -> None:
+        """Replace the live tables with copies of the staged ones within one transaction.
+
+        SQLite cannot rename tables across attached databases, and the live file holds the
+        other sources as well, so the staged tables are copied instead of swapped. This
+        takes time and disk space proportional to the staged data, and blocks other writers
+        meanwhile. The live DB is put into WAL mode, so readers are not blocked: they see
+        the old tables until the copy commits, never an empty or partial table.
+        """
+        with self.engine.begin() as connection:
+            for table in reversed(tables):
+                table.drop(connection, checkfirst=True)
+            for table in tables:
+                table.create(connection)
+                connection.execute(
+                    text(
+                        f"INSERT INTO {self._quote(table.name)} "
+                        f"SELECT * FROM {self._staged(table.name)}"
+                    )
+                )
+            self._copy_versions(connection)
+            for table in reversed(tables):
+                connection.execute(text(f"DROP TABLE {self._staged(table.name)}"))
@@ -0,0 +1,162 @@
+"""A module containing a compiled, memory-mapped cache of UMLS concept texts and semantic types."""
+
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_ARRAYS = (
+    "text_cuis",
+    "text_offsets",
+    "text_blob",
+    "sty_cuis",
+    "sty_offsets",
+    "sty_types",
+)
+ARTIFACT_TYPES_FILE = "semantic_types.json"
+SEMANTIC_TYPE_COLS = ["TUI", "STN", "STY"]
+
+
+class UmlsArtifact:
+    """CUI lookups backed by flat NumPy arrays that worker processes share through the page cache.
+
+    Preferred texts are stored as one UTF-8 blob: the text of text_cuis[i] is
+    text_blob[text_offsets[i]:text_offsets[i + 1]]. The semantic types of sty_cuis[i] are
+    the entries sty_types[sty_offsets[i]:sty_offsets[i + 1]] of the small types table.
+    """
+
+    def __init__(
+        self,
+        text_cuis: np.ndarray,
+        text_offsets: np.ndarray,
+        text_blob: np.ndarray,
+        sty_cuis: np.ndarray,
+        sty_offsets: np.ndarray,
+        sty_types: np.ndarray,
+        semantic_types: list[dict[str, str]],
+    ) -> None:
+        """Create an artifact from its arrays."""
+        self.text_cuis = text_cuis
+        self.text_offsets = text_offsets
+        self.text_blob = text_blob
+        self.sty_cuis = sty_cuis
+        self.sty_offsets = sty_offsets
+        self.sty_types = sty_types
+        self.semantic_types = semantic_types
+
+    @classmethod
+    def build(
+        cls, cui_to_text: dict[str, str], df_mrsty: pd.DataFrame
+    ) -> "UmlsArtifact":
+        """Compile the artifact from the CUI text mapping and the MRSTY.RRF dataframe."""
+        text_cuis = sorted(
+            cui for cui, text in cui_to_text.items() if isinstance(text, str)
+        )
+        texts = [cui_to_text[cui].encode("utf-8") for cui in text_cuis]
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+
+        df = df_mrsty[["CUI"] + SEMANTIC_TYPE_COLS].sort_values("CUI", kind="stable")
+        types = df[SEMANTIC_TYPE_COLS].drop_duplicates().reset_index(drop=True)
+        type_idx = (
+            df.merge(types.reset_index(), on=SEMANTIC_TYPE_COLS, how="left")["index"]
+            .to_numpy()
+            .astype(np.int32)
+        )
+        sty_cuis, sty_starts = np.unique(
+            df["CUI"].to_numpy().astype("S"), return_index=True
+        )
+        sty_offsets = np.append(sty_starts, len(df)).astype(np.int64)
+        return cls(
+            np.asarray(text_cuis, dtype="S"),
+            text_offsets,
+            np.frombuffer(b"".join(texts), dtype=np.uint8),
+            sty_cuis,
+            sty_offsets,
+            type_idx,
+            types.to_dict("records"),
+        )
+
+    def save(self, path: Path) -> None:
+        """Save the artifact to the directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name in ARTIFACT_ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        with open(path / ARTIFACT_TYPES_FILE, "w") as fh:
+            json.dump(self.semantic_types, fh)
+
+    @classmethod
+    def load(cls, path: Path) -> "UmlsArtifact":
+        """Memory-map an artifact saved to the directory."""
+        arrays = [
+            np.load(path / f"{name}.npy", mmap_mode="r") for name in ARTIFACT_ARRAYS
+        ]
+        with open(path / ARTIFACT_TYPES_FILE, "r") as fh:
+            semantic_types = json.load(fh)
+        return cls(*arrays, semantic_types=semantic_types)
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        """Return whether an artifact was saved to the directory."""
+        return (path / ARTIFACT_TYPES_FILE).exists() and all(
+            (path / f"{name}.npy").exists() for name in ARTIFACT_ARRAYS
+        )
+
+    @staticmethod
+    def _position(keys: np.ndarray, cui: str) -> int | None:
+        """Return the position of the CUI in the sorted keys, if present."""
+        key = cui.encode("ascii", errors="replace")
+        i = int(np.searchsorted(keys, key))
+        if i < len(keys) and keys[i] == key:
+            return i
+        return None
+
+    @staticmethod
+    def _positions(keys: np.ndarray, cuis: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Return a mask of the CUIs present in the sorted keys and their positions."""
+        encoded = np.char.encode(np.asarray(cuis, dtype=str), "ascii", errors="replace")
+        if encoded.size == 0 or keys.size == 0:
+            return np.zeros(len(cuis), dtype=bool), np.zeros(len(cuis), dtype=np.int64)
+        idx = np.searchsorted(keys, encoded)
+        idx[idx == len(keys)] = 0
+        return keys[idx] == encoded, idx
+
+    def get_text(self, cui: str) -> str | None:
+        """Return the preferred text of the CUI."""
+        i = self._position(self.text_cuis, cui)
+        if i is None:
+            return None
+        start, end = self.text_offsets[i], self.text_offsets[i + 1]
+        return bytes(self.text_blob[start:end]).decode("utf-8")
+
+    def get_semantic_types(self, cui: str) -> list[dict[str, str]]:
+        """Return the semantic types (TUI, STN, STY) of the CUI."""
+        i = self._position(self.sty_cuis, cui)
+        if i is None:
+            return []
+        start, end = self.sty_offsets[i], self.sty_offsets[i + 1]
+        return [dict(self.semantic_types[t]) for t in self.sty_types[start:end]]
+
+    def get_texts(self, cuis: list[str]) -> dict[str, str]:
+        """Return the preferred texts of all CUIs that have one."""
+        found, idx = self._positions(self.text_cuis, cuis)
+        starts, ends = self.text_offsets[idx], self.text_offsets[idx + 1]
+        return {
+            cui: bytes(self.text_blob[start:end]).decode("utf-8")
+            for cui, is_found, start, end in zip(cuis, found, starts, ends)
+            if is_found
+        }
+
+    def get_semantic_types_many(self, cuis: list[str]) -> dict[str, list[dict[str, str]]]:
+        """Return the semantic types (TUI, STN, STY) of all CUIs that have any."""
+        found, idx = self._positions(self.sty_cuis, cuis)
+        starts, ends = self.sty_offsets[idx], self.sty_offsets[idx + 1]
+        return {
+            cui: [dict(self.semantic_types[t]) for t in self.sty_types[start:end]]
+            for cui, is_found, start, end in zip(cuis, found, starts, ends)
+            if is_found
+        }
@@ -0,0 +1,229 @@
+"""A module containing a compiled, memory-mappable representation of UMLS relationship graphs."""
+
+import logging
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+logger = logging.getLogger(__name__)
+
+GRAPH_FILES = ("cuis", "offsets", "targets")
+
+
+class ConceptGraph:
+    """A directed CUI graph in compressed sparse row (CSR) form.
+
+    CUIs are encoded as positions in a sorted array of byte strings. The targets of the
+    edges leaving CUI i are stored in targets[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(
+        self, cuis: np.ndarray, offsets: np.ndarray, targets: np.ndarray
+    ) -> None:
+        """Create a graph from its CSR arrays."""
+        self.cuis = cuis
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def from_edges(cls, sources: Iterable[str], targets: Iterable[str]) -> "ConceptGraph":
+        """Compile a graph from parallel sequences of source and target CUIs."""
+        sources = np.asarray(sources, dtype="S")
+        targets = np.asarray(targets, dtype="S")
+        cuis = np.unique(np.concatenate([sources, targets]))
+        source_idx = np.searchsorted(cuis, sources).astype(np.int32)
+        target_idx = np.searchsorted(cuis, targets).astype(np.int32)
+        edges = np.unique(np.stack([source_idx, target_idx], axis=1), axis=0)
+        offsets = np.zeros(len(cuis) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edges[:, 0], minlength=len(cuis)), out=offsets[1:])
+        return cls(cuis, offsets, np.ascontiguousarray(edges[:, 1]))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ConceptGraph":
+        """Compile a graph from a MRREL frame indexed by CUI1 with a CUI2 column."""
+        return cls.from_edges(df.index.to_numpy(), df["CUI2"].to_numpy())
+
+    def save(self, path: Path) -> None:
+        """Save the CSR arrays as .npy files to the directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name in GRAPH_FILES:
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, path: Path) -> "ConceptGraph":
+        """Memory-map a graph saved to the directory."""
+        return cls(
+            *(np.load(path / f"{name}.npy", mmap_mode="r") for name in GRAPH_FILES)
+        )
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        """Return whether a graph was saved to the directory."""
+        return all((path / f"{name}.npy").exists() for name in GRAPH_FILES)
+
+    @property
+    def n_cuis(self) -> int:
+        """Return the number of CUIs in the graph."""
+        return len(self.cuis)
+
+    def encode(self, cuis: Iterable[str]) -> np.ndarray:
+        """Return the positions of the CUIs that are part of the graph."""
+        encoded = np.asarray(list(cuis), dtype="S")
+        if encoded.size == 0:
+            return np.array([], dtype=np.int64)
+        idx = np.searchsorted(self.cuis, encoded)
+        idx[idx == self.n_cuis] = 0
+        return idx[self.cuis[idx] == encoded]
+
+    def decode(self, idx: np.ndarray) -> list[str]:
+        """Return the CUIs at the positions."""
+        return np.char.decode(np.asarray(self.cuis[idx]), "ascii").tolist()
+
+    def source_cuis(self) -> list[str]:
+        """Return all CUIs with at least one outgoing edge."""
+        return self.decode(np.flatnonzero(np.diff(self.offsets)))
+
+    def neighbors(self, frontier: np.ndarray) -> np.ndarray:
+        """Return the unique targets of the edges leaving any CUI of the frontier."""
+        starts = self.offsets[frontier]
+        lengths = self.offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.array([], dtype=np.int32)
+        # positions starts[i] .. starts[i] + lengths[i] for every frontier CUI
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.unique(self.targets[shifts + np.arange(total)])
+
+    def _expand(
+        self,
+        frontier: np.ndarray,
+        depths: np.ndarray,
+        max_depth: int | None = None,
+        blocked: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Run a breadth-first expansion from the frontier and return the visited CUIs in order.
+
+        The depth at which each CUI is first visited is written to the zero-initialized
+        depths buffer. Blocked CUIs are never entered.
+        """
+        visited = []
+        depth = 0
+        while frontier.size > 0:
+            referenced = self.neighbors(frontier)
+            unseen = depths[referenced] == 0
+            if blocked is not None:
+                unseen &= ~blocked[referenced]
+            frontier = referenced[unseen]
+            depth += 1
+            depths[frontier] = depth
+            visited.append(frontier)
+            if max_depth is not None and depth == max_depth:
+                break
+        if not visited:
+            return np.array([], dtype=np.int32)
+        return np.sort(np.concatenate(visited))
+
+    def traverse(
+        self,
+        starting_cui: str,
+        max_depth: int | None = None,
+        stop_cuis: Iterable[str] = (),
+    ) -> list[str]:
+        """Return all CUIs reachable from starting_cui by a breadth-first expansion.
+
+        The expansion stops after max_depth levels, stop CUIs are never entered.
+        The starting CUI itself is only part of the result if it lies on a cycle.
+        """
+        blocked = np.zeros(self.n_cuis, dtype=bool)
+        blocked[self.encode(stop_cuis)] = True
+        visited = self._expand(
+            self.encode([starting_cui]),
+            np.zeros(self.n_cuis, dtype=np.uint16),
+            max_depth=max_depth,
+            blocked=blocked,
+        )
+        return self.decode(visited)
+
+
+CLOSURE_FILES = ("offsets", "related", "depths")
+
+
+class ClosureIndex:
+    """Precomputed transitive closures of a ConceptGraph, in CSR form over the graph's CUIs.
+
+    The CUIs reachable from CUI i are related[offsets[i]:offsets[i + 1]] (in CUI order),
+    depths holds the length of the shortest path to each of them.
+    """
+
+    def __init__(
+        self,
+        graph: ConceptGraph,
+        offsets: np.ndarray,
+        related: np.ndarray,
+        depths: np.ndarray,
+    ) -> None:
+        """Create a closure index from its CSR arrays."""
+        self.graph = graph
+        self.offsets = offsets
+        self.related = related
+        self.depths = depths
+
+    @classmethod
+    def build(cls, graph: ConceptGraph) -> "ClosureIndex":
+        """Compute the closure of every CUI with outgoing edges."""
+        counts = np.zeros(graph.n_cuis, dtype=np.int64)
+        related, depths = [], []
+        buffer = np.zeros(graph.n_cuis, dtype=np.uint16)
+        for i in tqdm(
+            np.flatnonzero(np.diff(graph.offsets)), desc="Computing closures"
+        ):
+            visited = graph._expand(np.array([i]), buffer)
+            counts[i] = len(visited)
+            related.append(visited.astype(np.int32))
+            depths.append(buffer[visited])
+            buffer[visited] = 0
+        offsets = np.zeros(graph.n_cuis + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(
+            graph,
+            offsets,
+            np.concatenate(related) if related else np.array([], dtype=np.int32),
+            np.concatenate(depths) if depths else np.array([], dtype=np.uint16),
+        )
+
+    def save(self, path: Path) -> None:
+        """Save the CSR arrays as .npy files to the directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        for name in CLOSURE_FILES:
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, graph: ConceptGraph, path: Path) -> "ClosureIndex":
+        """Memory-map a closure index of the graph saved to the directory."""
+        return cls(
+            graph,
+            *(np.load(path / f"{name}.npy", mmap_mode="r") for name in CLOSURE_FILES),
+        )
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        """Return whether a closure index was saved to the directory."""
+        return all((path / f"{name}.npy").exists() for name in CLOSURE_FILES)
+
+    def lookup(self, starting_cui: str, max_depth: int | None = None) -> list[str]:
+        """Return the CUIs reachable from starting_cui within max_depth levels.
+
+        Matches ConceptGraph.traverse without stop CUIs.
+        """
+        idx = self.graph.encode([starting_cui])
+        if idx.size == 0:
+            return []
+        start, end = self.offsets[idx[0]], self.offsets[idx[0] + 1]
+        related = self.related[start:end]
+        # like the traversal, a max_depth below 1 never stops the expansion
+        if max_depth is not None and max_depth > 0:
+            related = related[self.depths[start:end] <= max_depth]
+        return self.graph.decode(related)
@@ -1,16 +1,17 @@
 """A module that contains parsing logic for the UMLS metathesaurus."""
 
 import functools
+import hashlib
 import logging
 import zipfile
 from pathlib import Path
-from typing import Any, Literal
+from typing import Any, Iterable, Literal
 
-import cachetools
 import pandas as pd
 import umls_downloader
 
 from integration.config import parse_config_list
+from integration.umls.artifact import UmlsArtifact
 
 COLNAMES: dict[str, dict[str, Any]] = {
     "MRCONSO.RRF": {
@@ -181,15 +182,35 @@ class MetaThesaurusParser:
         df = df.drop_duplicates(subset="CUI", keep="first")
         return df.set_index("CUI")["STR"].to_dict()
 
+    @property
+    def path_artifact(self) -> Path:
+        """Return the directory of the compiled artifact for this version and text SABs."""
+        sab_hash = hashlib.sha1(",".join(self.sab_for_text_lookup).encode()).hexdigest()
+        return self.path_base / self.version / "compiled" / f"artifact_{sab_hash[:12]}"
+
+    @functools.cached_property
+    def artifact(self) -> UmlsArtifact:
+        """Memory-map the compiled texts and semantic types, compiling them first if needed."""
+        path = self.path_artifact
+        if not UmlsArtifact.exists(path):
+            logger.info(f"Compiling UMLS texts and semantic types to {path}")
+            UmlsArtifact.build(self.cui_to_text_mapping, self.df_mrsty).save(path)
+        return UmlsArtifact.load(path)
+
     def get_umls_text(self, cui: str) -> str | None:
         """Return the preferred UMLS term associated with the CUI."""
-        return self.cui_to_text_mapping.get(cui)
+        return self.artifact.get_text(cui)
 
-    @cachetools.cached(cachetools.LFUCache(maxsize=200000))
     def get_semantic_types(self, cui: str) -> list[dict[str, str]]:
         """Return a list of semantic types from MRSTY.RRF attached to the CUI."""
-        try:
-            semantic_types = self.df_mrsty_indexed.loc[[cui]].to_dict("records")  # type: ignore
-        except KeyError:
-            semantic_types = []
-        return semantic_types  # type: ignore
+        return self.artifact.get_semantic_types(cui)
+
+    def get_umls_texts(self, cuis: Iterable[str]) -> dict[str, str]:
+        """Return the preferred UMLS terms of all CUIs that have one."""
+        return self.artifact.get_texts(list(cuis))
+
+    def get_semantic_types_many(
+        self, cuis: Iterable[str]
+    ) -> dict[str, list[dict[str, str]]]:
+        """Return the semantic types of all CUIs in one lookup, omitting CUIs without any."""
+        return self.artifact.get_semantic_types_many(list(cuis))
@@ -1,13 +1,17 @@
 """A module for mapping narrow CUIs for broader ones."""
 
 import functools
+import hashlib
+import json
 import logging
+from pathlib import Path
 from typing import Literal
 
 import cachetools
 import pandas as pd
 
 from integration.config import parse_config_list
+from integration.umls.graph import ClosureIndex, ConceptGraph
 from integration.umls.parser import MetaThesaurusParser
 
 logger = logging.getLogger(__name__)
@@ -106,6 +110,84 @@ class RelationshipMapper:
 
         return related_concepts
 
+    @property
+    def path_compiled(self) -> Path:
+        """Return the directory of the compiled graphs for this UMLS version and configuration."""
+        config = json.dumps(
+            [
+                self.relations_for_broad2narrow,
+                self.relations_for_narrow2broad,
+                self.sab_for_broad2narrow,
+                self.sab_for_narrow2broad,
+                self.stns_for_narrow2broad,
+            ]
+        )
+        config_hash = hashlib.sha1(config.encode()).hexdigest()[:12]
+        return (
+            self.umls_parser.path_base
+            / self.umls_parser.version
+            / "compiled"
+            / config_hash
+        )
+
+    def _load_or_compile_graph(
+        self, direction: Literal["broad2narrow", "narrow2broad"]
+    ) -> ConceptGraph:
+        """Memory-map the compiled graph of a direction, compiling it from MRREL first if needed."""
+        path = self.path_compiled / direction
+        if not ConceptGraph.exists(path):
+            logger.info(f"Compiling the {direction} relationship graph to {path}")
+            if direction == "broad2narrow":
+                graph = ConceptGraph.from_frame(self.df_mrrel_for_broad2narrow)
+            else:
+                graph = ConceptGraph.from_frame(self.df_mrrel_for_narrow2broad)
+            graph.save(path)
+        return ConceptGraph.load(path)
+
+    @functools.cached_property
+    def graph_broad2narrow(self) -> ConceptGraph:
+        """Return the compiled graph for broad->narrow relationship mapping."""
+        return self._load_or_compile_graph("broad2narrow")
+
+    @functools.cached_property
+    def graph_narrow2broad(self) -> ConceptGraph:
+        """Return the compiled graph for narrow->broad relationship mapping."""
+        return self._load_or_compile_graph("narrow2broad")
+
+    def _load_closure(
+        self, direction: Literal["broad2narrow", "narrow2broad"]
+    ) -> ClosureIndex | None:
+        """Memory-map the closure index of a direction if it was built."""
+        path = self.path_compiled / f"closure_{direction}"
+        if not ClosureIndex.exists(path):
+            return None
+        if direction == "broad2narrow":
+            return ClosureIndex.load(self.graph_broad2narrow, path)
+        return ClosureIndex.load(self.graph_narrow2broad, path)
+
+    @functools.cached_property
+    def closure_broad2narrow(self) -> ClosureIndex | None:
+        """Return the closure index for broad->narrow relationship mapping, if built."""
+        return self._load_closure("broad2narrow")
+
+    @functools.cached_property
+    def closure_narrow2broad(self) -> ClosureIndex | None:
+        """Return the closure index for narrow->broad relationship mapping, if built."""
+        return self._load_closure("narrow2broad")
+
+    def build_closure_index(self) -> None:
+        """Precompute the transitive closures of both directions and save them to disk."""
+        for direction, graph in (
+            ("broad2narrow", self.graph_broad2narrow),
+            ("narrow2broad", self.graph_narrow2broad),
+        ):
+            path = self.path_compiled / f"closure_{direction}"
+            logger.info(f"Building the {direction} closure index at {path}")
+            ClosureIndex.build(graph).save(path)
+        # reload the new indexes on next access
+        self.__dict__.pop("closure_broad2narrow", None)
+        self.__dict__.pop("closure_narrow2broad", None)
+
     @cachetools.cached(cachetools.LFUCache(maxsize=1000000))
     def get_related_concepts(
         self,
@@ -115,33 +197,18 @@ class RelationshipMapper:
         stop_cuis: tuple[str] | None = (),
     ) -> list[str]:
         """Return all CUIs attached to starting_cui in either narrower or broader direction."""
-        related_cuis: set[str] = set()
-        new_cuis: set[str] = set([starting_cui])
-        stop_cuis : set[str]= set(stop_cuis)
-        depth = 0
-
         if direction == "broad2narrow":
-            mrrel_df = self.df_mrrel_for_broad2narrow
+            graph, closure = self.graph_broad2narrow, self.closure_broad2narrow
         elif direction == "narrow2broad":
-            mrrel_df = self.df_mrrel_for_narrow2broad
+            graph, closure = self.graph_narrow2broad, self.closure_narrow2broad
         else:
             raise NotImplementedError(f"Direction {direction} is not implemented!")
-
-        while len(new_cuis) > 0:
-            referenced_cuis = set(
-                mrrel_df.loc[mrrel_df.index.intersection(list(new_cuis))]["CUI2"]
-            )
-            new_cuis = referenced_cuis - related_cuis - stop_cuis
-
-            # Add the new narrow concepts to the set
-            related_cuis.update(new_cuis)
-
-            depth += 1
-
-            if max_depth is not None and depth == max_depth:
-                break
-
-        return list(related_cuis)
+        # stop CUIs cut paths, which the precomputed closures cannot account for
+        if closure is not None and not stop_cuis:
+            return closure.lookup(starting_cui, max_depth=max_depth)
+        return graph.traverse(
+            starting_cui, max_depth=max_depth, stop_cuis=stop_cuis or ()
+        )
 
     def _get_related_concepts_metrics(
         self,
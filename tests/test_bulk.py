@@ -0,0 +1,59 @@
+"""Tests for the bulk-loading helpers."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+
+from integration.bulk import insert_frame, next_primary_key, upsert_frame
+
+metadata = MetaData()
+table = Table(
+    "item",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(32)),
+    Column("size", Integer, nullable=True),
+)
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        yield connection
+
+
+def test_insert_frame(connection):
+    assert next_primary_key(connection, table) == 1
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "name": ["a", "b", "c"],
+            "size": pd.array([10, None, 30], dtype="Int64"),
+            "trial_idx": [0, 1, 2],
+        }
+    )
+    insert_frame(connection, table, df, chunk_size=2)
+    rows = connection.execute(select(table).order_by(table.c.id)).all()
+    assert [tuple(r) for r in rows] == [(1, "a", 10), (2, "b", None), (3, "c", 30)]
+    assert next_primary_key(connection, table) == 4
+
+
+def test_insert_empty_frame(connection):
+    insert_frame(connection, table, pd.DataFrame(columns=["id", "name"]))
+    assert connection.execute(select(table)).all() == []
+
+
+def test_upsert_frame(connection):
+    insert_frame(connection, table, pd.DataFrame({"id": [1, 2], "name": ["a", "b"]}))
+    upsert_frame(
+        connection,
+        table,
+        pd.DataFrame(
+            {"id": np.array([2, 3]), "name": ["b2", "c"], "size": [np.nan, 5.0]}
+        ),
+    )
+    rows = connection.execute(select(table).order_by(table.c.id)).all()
+    assert [tuple(r) for r in rows] == [(1, "a", None), (2, "b2", None), (3, "c", 5)]
@@ -0,0 +1,97 @@
+"""Tests for the compiled UMLS relationship graphs."""
+
+import random
+
+import pandas as pd
+import pytest
+
+from integration.umls.graph import ClosureIndex, ConceptGraph
+
+
+def bfs(
+    mrrel_df: pd.DataFrame,
+    starting_cui: str,
+    max_depth: int | None = None,
+    stop_cuis: tuple[str, ...] = (),
+) -> list[str]:
+    """Return the related CUIs like the DataFrame-based traversal the graph replaces."""
+    related_cuis: set[str] = set()
+    new_cuis: set[str] = set([starting_cui])
+    depth = 0
+    while len(new_cuis) > 0:
+        referenced_cuis = set(
+            mrrel_df.loc[mrrel_df.index.intersection(list(new_cuis))]["CUI2"]
+        )
+        new_cuis = referenced_cuis - related_cuis - set(stop_cuis)
+        related_cuis.update(new_cuis)
+        depth += 1
+        if max_depth is not None and depth == max_depth:
+            break
+    return sorted(related_cuis)
+
+
+def random_mrrel(seed: int, n_cuis: int = 40, n_edges: int = 80) -> pd.DataFrame:
+    """Return a random MRREL frame indexed by CUI1, with duplicate edges and cycles."""
+    rng = random.Random(seed)
+    cuis = [f"C{i:07d}" for i in range(n_cuis)]
+    edges = [(rng.choice(cuis), rng.choice(cuis)) for _ in range(n_edges)]
+    return (
+        pd.DataFrame(edges, columns=["CUI1", "CUI2"]).set_index("CUI1").sort_index()
+    )
+
+
+@pytest.fixture(params=range(5))
+def mrrel(request) -> pd.DataFrame:
+    return random_mrrel(request.param)
+
+
+@pytest.fixture
+def graph(mrrel, tmp_path) -> ConceptGraph:
+    ConceptGraph.from_frame(mrrel).save(tmp_path / "graph")
+    return ConceptGraph.load(tmp_path / "graph")
+
+
+STARTING_CUIS = ["C0000000", "C0000007", "C0000023", "C0000039", "C9999999"]
+
+
+@pytest.mark.parametrize("max_depth", [None, 0, 1, 2, 3])
+def test_traverse_matches_bfs(mrrel, graph, max_depth):
+    for cui in STARTING_CUIS:
+        assert sorted(graph.traverse(cui, max_depth=max_depth)) == bfs(
+            mrrel, cui, max_depth=max_depth
+        )
+
+
+@pytest.mark.parametrize("max_depth", [None, 2])
+def test_traverse_with_stop_cuis_matches_bfs(mrrel, graph, max_depth):
+    rng = random.Random(0)
+    cuis = sorted(set(mrrel.index) | set(mrrel["CUI2"]))
+    for cui in STARTING_CUIS:
+        stop_cuis = tuple(rng.sample(cuis, 5)) + ("C9999999",)
+        assert sorted(
+            graph.traverse(cui, max_depth=max_depth, stop_cuis=stop_cuis)
+        ) == bfs(mrrel, cui, max_depth=max_depth, stop_cuis=stop_cuis)
+
+
+@pytest.mark.parametrize("max_depth", [None, 0, 1, 2, 3])
+def test_closure_lookup_matches_bfs(mrrel, graph, tmp_path, max_depth):
+    ClosureIndex.build(graph).save(tmp_path / "closure")
+    closure = ClosureIndex.load(graph, tmp_path / "closure")
+    for cui in sorted(set(mrrel.index)) + STARTING_CUIS:
+        assert sorted(closure.lookup(cui, max_depth=max_depth)) == bfs(
+            mrrel, cui, max_depth=max_depth
+        )
+
+
+def test_cycle_includes_starting_cui():
+    graph = ConceptGraph.from_edges(["A", "B", "C"], ["B", "C", "A"])
+    assert graph.traverse("A") == ["A", "B", "C"]
+    assert graph.traverse("A", max_depth=2) == ["B", "C"]
+    assert graph.traverse("A", stop_cuis=["C"]) == ["B"]
+    assert ClosureIndex.build(graph).lookup("A") == ["A", "B", "C"]
+
+
+def test_source_cuis():
+    graph = ConceptGraph.from_edges(["A", "A", "B"], ["B", "C", "C"])
+    assert graph.source_cuis() == ["A", "B"]
+    assert ClosureIndex.build(graph).lookup("C") == []
@@ -0,0 +1,90 @@
+"""Tests for the keyset pagination of the query constructors."""
+
+import datetime
+import random
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from api.queries.utils import apply_keyset, order_newest_first
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class DatedRow(Base):
+    __tablename__ = "dated_row"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    date: Mapped[datetime.date | None]
+    timestamp: Mapped[datetime.datetime | None]
+
+
+@pytest.fixture(scope="module")
+def session():
+    rng = random.Random(0)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i in range(1, 200):
+            # few distinct dates, so that many rows tie and are ordered by ID
+            date = datetime.date(2000 + rng.randint(0, 5), rng.choice([1, 6]), 1)
+            if rng.random() < 0.2:
+                date = None
+            session.add(
+                DatedRow(
+                    id=i,
+                    date=date,
+                    timestamp=datetime.datetime.combine(date, datetime.time(12))
+                    if date is not None
+                    else None,
+                )
+            )
+        session.commit()
+        yield session
+
+
+def round_trip(date: datetime.date | None) -> datetime.datetime | None:
+    """Return the date as decoded from an API cursor, which always holds a datetime."""
+    if date is None:
+        return None
+    return datetime.datetime.fromisoformat(date.isoformat())
+
+
+@pytest.mark.parametrize("column", ["date", "timestamp"])
+@pytest.mark.parametrize("page_size", [1, 7, 50, 500])
+def test_pages_match_full_order(session, column, page_size):
+    date_col = getattr(DatedRow, column)
+    query = select(DatedRow.id, date_col.label("date")).order_by(
+        *order_newest_first(date_col, DatedRow.id)
+    )
+    expected = [row.id for row in session.execute(query)]
+
+    paged, after = [], None
+    while True:
+        page = session.execute(
+            apply_keyset(query, date_col, DatedRow.id, after).limit(page_size)
+        ).all()
+        paged.extend(row.id for row in page)
+        assert len(paged) <= len(expected), "pages overlap"
+        if len(page) < page_size:
+            break
+        after = (round_trip(page[-1].date), page[-1].id)
+    assert paged == expected
+
+
+def test_no_keyset_returns_query(session):
+    query = select(DatedRow.id)
+    assert apply_keyset(query, DatedRow.date, DatedRow.id, None) is query
+
+
+def test_keyset_after_undated_row(session):
+    query = select(DatedRow.id).order_by(
+        *order_newest_first(DatedRow.date, DatedRow.id)
+    )
+    undated = session.scalars(query.where(DatedRow.date.is_(None))).all()
+    following = session.scalars(
+        apply_keyset(query, DatedRow.date, DatedRow.id, (None, undated[2]))
+    ).all()
+    assert following == undated[3:]
@@ -0,0 +1,155 @@
+"""Tests for parsing the annotated Pubmed parquet files."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from integration.orm.pubmed import Flags, Trial
+from integration.parsers.pubmed import PUBMED_CHILD_RELATIONSHIPS, PubmedParser
+
+
+class Normalizer:
+    """A stand-in for the UMLS normalizer with a fixed MeSH mapping."""
+
+    mapping_mesh_term_to_cui = {
+        "humans": "C0086418",
+        "breast neoplasms": "C0006142",
+    }
+
+    def mesh_term_to_cui(self, mesh_term: str) -> str | None:
+        return self.mapping_mesh_term_to_cui.get(mesh_term)
+
+
+def make_parquet(path, pmids: list[int], title_prefix: str = "Title") -> None:
+    """Write an annotated Pubmed parquet file with varied rows for the PMIDs."""
+    rows = []
+    for i, pmid in enumerate(pmids):
+        rows.append(
+            dict(
+                pmid=str(pmid),
+                status="MEDLINE",
+                indexing_method="Automated",
+                title=f"{title_prefix} {pmid}",
+                authors=[{"LastName": "Doe", "ForeName": "Jane", "Initials": "J"}]
+                if i % 3
+                else None,
+                abstract_plaintext=f"Abstract {pmid}",
+                abstract=["Background", "Results"],
+                year="2020",
+                month="Jan" if i % 2 else "3",
+                num_randomized=[None, "120", "n/a", "2000000000"][i % 4],
+                journal="Journal",
+                ftp_fn="pubmed23n0001.xml",
+                ptyp=["Randomized Controlled Trial", "Journal Article"],
+                registry_ids=["NCT01234567", "ISRCTN12345678"] if i % 2 else [],
+                dois=[f"10.1000/{pmid}"],
+                population=["adults"],
+                interventions=["drug", "placebo"] if i % 2 else [],
+                outcomes=["overall survival"],
+                mesh=["Humans", "Breast Neoplasms", "Unmapped Term"],
+                population_umls=[
+                    {"cui": "C0006142", "cui_str": "Breast cancer", "mention": "BC"}
+                ],
+                interventions_umls=[{"cui": "C0013227", "cui_str": None, "mention": "drug"}]
+                if i % 2
+                else [],
+                outcomes_umls=[],
+            )
+        )
+    pd.DataFrame(rows).to_parquet(path)
+
+
+def normalize(value):
+    """Return a comparable representation of a column value."""
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def data_columns(orm_class) -> list[str]:
+    """Return the columns of a table that are neither keys nor references."""
+    return [
+        c.name
+        for c in orm_class.__table__.columns
+        if c.name not in ("id", "trial_id", "source_id")
+    ]
+
+
+def rows_from_trials(trials: list[Trial]) -> dict[str, list[tuple]]:
+    """Return the sorted rows per table of ORM trials, with children keyed by PMID."""
+    tables = {
+        Trial.__tablename__: [
+            tuple(normalize(getattr(t, c)) for c in data_columns(Trial)) for t in trials
+        ],
+        Flags.__tablename__: [
+            (t.pm_id, normalize(t.flags.has_significant_finding)) for t in trials
+        ],
+    }
+    for relationship, orm_class in PUBMED_CHILD_RELATIONSHIPS.items():
+        tables[orm_class.__tablename__] = [
+            (t.pm_id,) + tuple(normalize(getattr(c, n)) for n in data_columns(orm_class))
+            for t in trials
+            for c in getattr(t, relationship)
+        ]
+    return {name: sorted(rows, key=repr) for name, rows in tables.items()}
+
+
+def rows_from_frames(batches: list[dict[str, pd.DataFrame]]) -> dict[str, list[tuple]]:
+    """Return the sorted rows per table of parsed frames, with children keyed by PMID."""
+    tables: dict[str, list[tuple]] = {}
+    for frames in batches:
+        trials = frames[Trial.__tablename__]
+        pm_ids = trials["pm_id"].to_numpy()
+        tables.setdefault(Trial.__tablename__, []).extend(
+            tuple(normalize(v) for v in row)
+            for row in trials[data_columns(Trial)].itertuples(index=False)
+        )
+        flags = frames[Flags.__tablename__]
+        tables.setdefault(Flags.__tablename__, []).extend(
+            (int(pm_ids[i]), normalize(f))
+            for i, f in zip(flags["trial_idx"], flags["has_significant_finding"])
+        )
+        for orm_class in PUBMED_CHILD_RELATIONSHIPS.values():
+            children = frames[orm_class.__tablename__]
+            tables.setdefault(orm_class.__tablename__, []).extend(
+                (int(pm_ids[row[0]]),) + tuple(normalize(v) for v in row[1:])
+                for row in children[
+                    ["trial_idx"] + data_columns(orm_class)
+                ].itertuples(index=False)
+            )
+    return {name: sorted(rows, key=repr) for name, rows in tables.items()}
+
+
+@pytest.fixture
+def parser(tmp_path) -> PubmedParser:
+    # duplicate PMIDs within and across files, the last occurrence wins within a file
+    make_parquet(tmp_path / "pubmed_1.parquet", [1, 2, 3, 4, 5, 2, 6, 7])
+    make_parquet(tmp_path / "pubmed_2.parquet", [5, 8, 9], title_prefix="Update")
+    return PubmedParser(
+        [tmp_path / "pubmed_1.parquet", tmp_path / "pubmed_2.parquet"],
+        normalizer=Normalizer(),
+    )
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 100])
+def test_frames_match_trials(parser, batch_size):
+    expected = rows_from_trials(list(parser.parse()))
+    assert rows_from_frames(list(parser.parse_frames(batch_size))) == expected
+
+
+def test_parallel_frames_match_trials(parser):
+    expected = rows_from_trials(list(parser.parse()))
+    assert rows_from_frames(list(parser.parse_frames_parallel(2, 2))) == expected
+
+
+def test_content_hash_ignores_file_name(parser, tmp_path):
+    make_parquet(tmp_path / "pubmed_3.parquet", [1])
+    df = pd.read_parquet(tmp_path / "pubmed_3.parquet")
+    renamed = df.assign(ftp_fn="pubmed23n0002.xml")
+    changed = df.assign(title="Changed")
+    assert (parser._content_hash(df) == parser._content_hash(renamed)).all()
+    assert (parser._content_hash(df) != parser._content_hash(changed)).all()
@@ -0,0 +1,109 @@
+"""Tests for the caches of evidence IDs."""
+
+import time
+
+import pytest
+
+from api.result_cache import (
+    MemoryResultCache,
+    SqliteResultCache,
+    create_result_cache,
+    make_key,
+)
+
+# 8 bytes per cached ID
+MAX_BYTES = 100
+TTL = 60.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    caches = []
+
+    def make(ttl: float = TTL, touch_interval: float = 60.0):
+        cache = create_result_cache(
+            request.param,
+            MAX_BYTES,
+            ttl,
+            tmp_path / f"results_{len(caches)}.sqlite",
+            touch_interval=touch_interval,
+        )
+        cache.validate("v1")
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_get_returns_cached_ids(make_cache):
+    cache = make_cache()
+    key = make_key("pubmed", ["C0006142"], {"year_range_min": 2000})
+    assert cache.get(key) is None
+    cache.set(key, [3, 1, 2])
+    assert cache.get(key) == [3, 1, 2]
+    cache.set(make_key("empty"), [])
+    assert cache.get(make_key("empty")) == []
+
+
+def test_entries_expire(make_cache):
+    cache = make_cache(ttl=0.2)
+    cache.set("key", [1])
+    assert cache.get("key") == [1]
+    time.sleep(0.3)
+    assert cache.get("key") is None
+
+
+def test_evicts_least_recently_used(make_cache):
+    # refresh the access time on every hit
+    cache = make_cache(touch_interval=0.0)
+    cache.set("a", list(range(5)))
+    time.sleep(0.01)
+    cache.set("b", list(range(5)))
+    time.sleep(0.01)
+    assert cache.get("a") is not None
+    time.sleep(0.01)
+    # 3 * 40 bytes exceed MAX_BYTES
+    cache.set("c", list(range(5)))
+    assert cache.get("a") == list(range(5))
+    assert cache.get("b") is None
+    assert cache.get("c") == list(range(5))
+
+
+def test_skips_values_larger_than_cache(make_cache):
+    cache = make_cache()
+    cache.set("small", [1])
+    cache.set("big", list(range(20)))
+    assert cache.get("big") is None
+    assert cache.get("small") == [1]
+
+
+def test_validate_clears_on_version_change(make_cache):
+    cache = make_cache()
+    cache.set("key", [1])
+    cache.validate("v1")
+    assert cache.get("key") == [1]
+    cache.validate("v2")
+    assert cache.get("key") is None
+
+
+def test_sqlite_cache_is_shared(tmp_path):
+    writer = SqliteResultCache(tmp_path / "results.sqlite", MAX_BYTES, TTL)
+    reader = SqliteResultCache(tmp_path / "results.sqlite", MAX_BYTES, TTL)
+    writer.validate("v1")
+    reader.validate("v1")
+    writer.set("key", [1, 2])
+    assert reader.get("key") == [1, 2]
+    reader.validate("v2")
+    assert writer.get("key") is None
+    writer.close()
+    reader.close()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_result_cache("redis", MAX_BYTES, TTL)
+    with pytest.raises(ValueError):
+        create_result_cache("sqlite", MAX_BYTES, TTL)
+    assert isinstance(create_result_cache("memory", MAX_BYTES, TTL), MemoryResultCache)